@@ -1,3 +1,43 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+
+from .models import User
+
+
+def image_upload(name="id.png", size=(40, 25)):
+    buffer = io.BytesIO()
+    Image.new("L", size, 255).save(buffer, "PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+class KYCSubmissionTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.user = User.objects.create(email="holder@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def submit(self, upload):
+        return self.client.patch(reverse("core:kyc-submit"), {"id_card_image": upload}, format="multipart")
+
+    def test_image_submission_marks_kyc_pending(self):
+        response = self.submit(image_upload())
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.kyc_status, "PENDING")
+
+    def test_non_images_are_refused_before_saving(self):
+        pdf = SimpleUploadedFile("id.png", b"%PDF-1.4\n" + b"0" * 2000, content_type="image/png")
+        response = self.submit(pdf)
+        self.assertEqual(response.status_code, 415)
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.kyc_status, self.user.id_card_image.name or ""), ("UNVERIFIED", ""))
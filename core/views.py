@@ -1,5 +1,6 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
+from wallet.uploads import IMAGE_TYPES, screen_uploads, upload_rejection_response
 from .models import User
 from .serializers import KYCSubmissionSerializer
 
@@ -26,6 +27,13 @@ class KYCSubmissionView(generics.UpdateAPIView):
         Override the update method to set the kyc_status to 'PENDING'
         after a successful document upload.
         """
+        # Screen the ID and selfie while they stream in: images only, within
+        # the size and pixel limits, refused before they are stored.
+        screen_uploads(request, allowed_types=IMAGE_TYPES)
+        rejected = upload_rejection_response(request)
+        if rejected is not None:
+            return rejected
+
         # First, call the parent's update method to handle the file saving.
         response = super().update(request, *args, **kwargs)
 
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Institution, CredentialRecord, InstitutionAPIKey
+from .models import Institution, CredentialRecord, IngestionJob, InstitutionAPIKey
 from rest_framework_api_key.admin import APIKeyModelAdmin
 
 
@@ -22,7 +22,16 @@ class CredentialRecordAdmin(admin.ModelAdmin):
         "status",
         "issued_at",
     )
-    search_fields = ("issuer__name", "credential_hash")
+    search_fields = ("issuer__name", "credential_hash", "lookup__serial")
+
+
+@admin.register(IngestionJob)
+class IngestionJobAdmin(admin.ModelAdmin):
+    # Read-only view for following credential file ingestion.
+    list_display = ("id", "issuer", "format", "status", "byte_offset", "size", "created_count", "created_at")
+    list_filter = ("status", "format")
+    search_fields = ("issuer__name",)
+    readonly_fields = [field.name for field in IngestionJob._meta.fields]
 
 
 @admin.register(InstitutionAPIKey)
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class InstitutionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'institutions'
+
+    def ready(self):
+        # Registers the receiver that drops cached lookups of deleted records,
+        # and the system check of the cache settings.
+        import institutions.record_cache
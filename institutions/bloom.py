@@ -0,0 +1,318 @@
+"""
+Bloom filter prefilter for credential hashes and serial numbers.
+
+Most uploads that end UNVERIFIED pay for database misses: the hash lookup,
+then the serial lookup. `CredentialFilter` keeps a Bloom filter over every
+record's `credential_hash` and normalized serial, so the verify pipeline
+can skip a query whose key is definitely absent. A "maybe" still goes to
+the database; the false-positive rate only decides how often that is wasted.
+
+A Bloom filter never forgets, so it must never miss a key that exists:
+
+- it is built by one streaming pass over the records on first use, or
+  loaded from a file written by `build_credential_filter` (memory-mapped
+  copy-on-write, so a warm start reads only the pages lookups touch);
+- `CredentialRecord.save` adds the record in this process once committed;
+- before a negative answer is given, at most every `refresh_interval`
+  seconds, the filter reads the records above its watermark (the highest id
+  it has read) and the records whose `updated_at` is at most
+  `change_overlap` seconds before its previous refresh. The second set
+  catches what an id watermark misses: records edited in other processes,
+  records committed after a higher id (bulk chunks), and index rows written
+  after their record. A change is missed only if its transaction stays open
+  longer than `change_overlap`, or the clocks of the writing and reading
+  machines differ by more;
+- once the items outgrow the capacity it was sized for, the filter is
+  rebuilt at the next refresh.
+
+Deleted records and changed hashes leave stale positives behind, which cost
+nothing but the query.
+
+Configured by WALLET_CREDENTIAL_FILTER:
+
+    {"enabled": True, "error_rate": 0.01, "capacity": None, "headroom": 2.0,
+     "path": None, "refresh_interval": 1.0, "change_overlap": 60.0}
+
+`capacity` fixes the number of keys the filter is sized for; by default it
+is `headroom` times the keys present at build time. Memory is about
+1.44 * log2(1 / error_rate) bits per key: 1.2 bytes at 1%, 1.8 at 0.1%.
+Each refresh re-reads the records changed in the last `change_overlap`
+seconds, so a long overlap costs more reads while records are being
+ingested.
+"""
+
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .lookup import credential_serial
+from .models import CredentialRecord
+
+# magic, bit count, hash count, items, capacity, target error rate, watermark
+# (max record id), start of the last refresh (POSIX seconds).
+_HEADER = struct.Struct("<8sQIQQdQd")
+_MAGIC = b"SCBLOOM2"
+# Never size below this many keys; small registers grow fast.
+MIN_CAPACITY = 100_000
+# Seconds of changes before the previous refresh that each refresh reads
+# again. Must exceed the longest transaction that writes records.
+DEFAULT_CHANGE_OVERLAP = 60.0
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float, bits=None, items: int = 0):
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be between 0 and 1.")
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.bit_count = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.bit_count / self.capacity * math.log(2)))
+        self.bits = bits if bits is not None else bytearray((self.bit_count + 7) // 8)
+        self.items = items
+
+    def _positions(self, key: str) -> Iterable[int]:
+        # Double hashing: k positions from two 64-bit halves of one digest.
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + index * second) % self.bit_count for index in range(self.hash_count))
+
+    def add(self, key: str):
+        positions = list(self._positions(key))
+        if all(self.bits[position >> 3] & (1 << (position & 7)) for position in positions):
+            return  # Already in (or a false positive); do not count it twice.
+        for position in positions:
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.items += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self.bits)
+
+    def estimated_error_rate(self) -> float:
+        """False-positive rate at the current number of items."""
+        return (1 - math.exp(-self.hash_count * self.items / self.bit_count)) ** self.hash_count
+
+
+def _hash_key(credential_hash: str) -> str:
+    return f"h:{credential_hash}"
+
+
+def _serial_key(serial: str) -> str:
+    return f"s:{serial}"
+
+
+class CredentialFilter:
+    def __init__(
+        self,
+        bloom: BloomFilter,
+        watermark: int = 0,
+        refresh_interval: float = 1.0,
+        headroom: float = 2.0,
+        changed_since: Optional[datetime] = None,
+        change_overlap: float = DEFAULT_CHANGE_OVERLAP,
+    ):
+        self.bloom = bloom
+        self.watermark = watermark
+        self.refresh_interval = refresh_interval
+        self.headroom = headroom
+        # When the last read of the records started; None before any read.
+        self.changed_since = changed_since
+        self.change_overlap = change_overlap
+        self._lock = threading.Lock()
+        self._refreshed_at = time.monotonic()
+        self.checks = self.absent = 0
+
+    @classmethod
+    def build(
+        cls,
+        error_rate: float = 0.01,
+        capacity: Optional[int] = None,
+        headroom: float = 2.0,
+        refresh_interval: float = 1.0,
+        chunk_size: int = 5000,
+        change_overlap: float = DEFAULT_CHANGE_OVERLAP,
+    ) -> "CredentialFilter":
+        """Stream every record into a new filter."""
+        started = timezone.now()
+        keys = 2 * CredentialRecord.objects.count()
+        bloom = BloomFilter(capacity or max(MIN_CAPACITY, int(keys * headroom)), error_rate)
+        credential_filter = cls(bloom, 0, refresh_interval, headroom, started, change_overlap)
+        credential_filter._add_records(CredentialRecord.objects.order_by("id"), chunk_size)
+        return credential_filter
+
+    @classmethod
+    def load(
+        cls,
+        path: str,
+        refresh_interval: float = 1.0,
+        headroom: float = 2.0,
+        change_overlap: float = DEFAULT_CHANGE_OVERLAP,
+    ) -> "CredentialFilter":
+        """Map a file written by `save`, copy-on-write, and catch up with newer and changed records."""
+        with open(path, "rb") as handle:
+            mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_COPY)
+        if len(mapped) < _HEADER.size or mapped[: len(_MAGIC)] != _MAGIC:
+            raise ValueError(f"{path} is not a credential filter file of this version.")
+        _, bit_count, hash_count, items, capacity, error_rate, watermark, changed_since = _HEADER.unpack_from(mapped)
+        bloom = BloomFilter(capacity, error_rate, bits=memoryview(mapped)[_HEADER.size:], items=items)
+        if (bloom.bit_count, bloom.hash_count) != (bit_count, hash_count):
+            raise ValueError(f"{path} was written with different filter parameters.")
+        changed_since = datetime.fromtimestamp(changed_since, dt_timezone.utc)
+        credential_filter = cls(bloom, watermark, refresh_interval, headroom, changed_since, change_overlap)
+        credential_filter.refresh(force=True)
+        return credential_filter
+
+    def save(self, path: str):
+        """Write the filter atomically, for `load`."""
+        bloom = self.bloom
+        header = _HEADER.pack(
+            _MAGIC,
+            bloom.bit_count,
+            bloom.hash_count,
+            bloom.items,
+            bloom.capacity,
+            bloom.error_rate,
+            self.watermark,
+            self.changed_since.timestamp() if self.changed_since else 0.0,
+        )
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as handle:
+            handle.write(header)
+            handle.write(bloom.bits)
+        os.replace(temporary, path)
+
+    def _add_records(self, queryset, chunk_size: int = 5000):
+        # Serials as the lookup index has them: that is where the serial query looks.
+        rows = queryset.values_list("id", "credential_hash", "lookup__serial").iterator(chunk_size=chunk_size)
+        for record_id, credential_hash, serial in rows:
+            self._add(credential_hash, serial)
+            self.watermark = max(self.watermark, record_id)
+
+    def _add(self, credential_hash: str, serial: str):
+        self.bloom.add(_hash_key(credential_hash))
+        if serial:
+            self.bloom.add(_serial_key(serial))
+
+    def add_record(self, record: CredentialRecord):
+        with self._lock:
+            self._add(record.credential_hash, credential_serial(record.credential_data or {}))
+
+    def refresh(self, force: bool = False):
+        """Add records created or changed since the last read, if `refresh_interval` has passed."""
+        if not force and time.monotonic() - self._refreshed_at < self.refresh_interval:
+            return
+        with self._lock:
+            started = timezone.now()
+            changed = Q(id__gt=self.watermark)
+            if self.changed_since is not None:
+                changed |= Q(updated_at__gte=self.changed_since - timedelta(seconds=self.change_overlap))
+            self._add_records(CredentialRecord.objects.filter(changed).order_by("id"))
+            self.changed_since = started
+            self._refreshed_at = time.monotonic()
+            if self.bloom.items > self.bloom.capacity:
+                rebuilt = CredentialFilter.build(
+                    self.bloom.error_rate,
+                    headroom=self.headroom,
+                    refresh_interval=self.refresh_interval,
+                    change_overlap=self.change_overlap,
+                )
+                self.bloom, self.watermark, self.changed_since = rebuilt.bloom, rebuilt.watermark, rebuilt.changed_since
+
+    def _might_contain(self, key: str) -> bool:
+        self.checks += 1
+        if key in self.bloom:
+            return True
+        # Only a negative needs to be current.
+        self.refresh()
+        if key in self.bloom:
+            return True
+        self.absent += 1
+        return False
+
+    def might_have_hash(self, credential_hash: str) -> bool:
+        """False only if no record has this credential hash."""
+        return self._might_contain(_hash_key(credential_hash))
+
+    def might_have_serial(self, serial: str) -> bool:
+        """False only if no record has this normalized serial."""
+        return self._might_contain(_serial_key(serial))
+
+    def snapshot(self) -> Dict[str, float]:
+        bloom = self.bloom
+        return {
+            "items": bloom.items,
+            "capacity": bloom.capacity,
+            "size_bytes": bloom.size_bytes,
+            "hash_count": bloom.hash_count,
+            "target_error_rate": bloom.error_rate,
+            "estimated_error_rate": bloom.estimated_error_rate(),
+            "watermark": self.watermark,
+            "checks": self.checks,
+            "definitely_absent": self.absent,
+        }
+
+
+_FILTER: Optional[CredentialFilter] = None
+_FILTER_LOCK = threading.Lock()
+
+
+def filter_options() -> dict:
+    return dict(getattr(settings, "WALLET_CREDENTIAL_FILTER", {}))
+
+
+def get_filter() -> Optional[CredentialFilter]:
+    """
+    The process-wide filter configured by WALLET_CREDENTIAL_FILTER, loaded or
+    built on first use; None when it is disabled.
+    """
+    global _FILTER
+    if _FILTER is None:
+        options = filter_options()
+        if not options.pop("enabled", True):
+            return None
+        with _FILTER_LOCK:
+            if _FILTER is None:
+                path = options.pop("path", None)
+                if path and os.path.exists(path):
+                    try:
+                        _FILTER = CredentialFilter.load(
+                            path,
+                            options.get("refresh_interval", 1.0),
+                            options.get("headroom", 2.0),
+                            options.get("change_overlap", DEFAULT_CHANGE_OVERLAP),
+                        )
+                    except ValueError:
+                        pass  # Written by an older version: rebuilt below.
+                if _FILTER is None:
+                    _FILTER = CredentialFilter.build(**options)
+                    if path:
+                        _FILTER.save(path)
+    return _FILTER
+
+
+def reset_filter():
+    """Drop the process-wide filter, so the next use reloads or rebuilds it."""
+    global _FILTER
+    with _FILTER_LOCK:
+        _FILTER = None
+
+
+def record_issued(record: CredentialRecord):
+    """Add a saved record to the process-wide filter, if it is built."""
+    if _FILTER is not None:
+        _FILTER.add_record(record)
@@ -0,0 +1,240 @@
+"""
+Streaming ingestion of credential export files (see IngestionJob).
+
+Registrar exports run to gigabytes, so a file is never read whole:
+
+- it is read line by line from the job's `byte_offset`. A CSV record may
+  span lines (quoted newlines); the offset only moves past whole records;
+- every `chunk_size` rows go through institutions.issuance.issue_bulk, and
+  the job's offset and counters are written in the same transaction as the
+  chunk's records. After a crash the job resumes at the first row of the
+  first chunk not committed, so no row is issued or counted twice;
+- memory holds one chunk of rows and at most MAX_ROW_ERRORS row errors,
+  whatever the size of the file.
+
+CSV files start with a header row naming the credential_data fields; empty
+cells are left out of the record. NDJSON lines are shaped like bulk
+issuance rows: {"credential_data": {...}}. Rows are numbered from 1 in the
+order read, not counting the CSV header or blank lines.
+
+Jobs are claimed like wallet.VerificationJob: compare-and-set on the status,
+and every later write conditioned on the claim, so a worker whose lease
+expired cannot write over the worker that took the job over.
+"""
+
+import csv
+import json
+import os
+from datetime import timedelta
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .issuance import DEFAULT_CHUNK_SIZE, INVALID, UnreadableRow, issue_bulk
+from .models import Institution, IngestionJob
+
+# Invalid rows reported on the job; the rest are only counted.
+MAX_ROW_ERRORS = 100
+# A running job whose claim has not been renewed for this long is taken over.
+DEFAULT_LEASE_SECONDS = 300
+
+_FORMATS_BY_SUFFIX = {".csv": IngestionJob.CSV, ".ndjson": IngestionJob.NDJSON, ".jsonl": IngestionJob.NDJSON}
+
+
+class LostClaim(Exception):
+    """Another worker took the job over."""
+
+
+def detect_format(name: str) -> str:
+    """The ingestion format for a file name; raises ValueError for other suffixes."""
+    suffix = os.path.splitext(name)[1].lower()
+    if suffix not in _FORMATS_BY_SUFFIX:
+        raise ValueError(f"Cannot tell the format of {name!r}; expected .csv, .ndjson or .jsonl.")
+    return _FORMATS_BY_SUFFIX[suffix]
+
+
+def create_job(issuer: Institution, upload=None, local_path: str = "", format: str = "") -> IngestionJob:
+    """Queue the ingestion of an uploaded file, or of a file on this machine."""
+    format = format or detect_format(upload.name if upload is not None else local_path)
+    if format not in dict(IngestionJob.FORMAT_CHOICES):
+        raise ValueError(f"Unknown format {format!r}; expected csv or ndjson.")
+    job = IngestionJob(issuer=issuer, format=format, local_path=os.path.abspath(local_path) if local_path else "")
+    if upload is not None:
+        # Copied to storage chunk by chunk.
+        job.source.save(os.path.basename(upload.name), upload, save=False)
+        job.size = upload.size
+    else:
+        job.size = os.path.getsize(job.local_path)
+    job.save()
+    return job
+
+
+def _claimable(lease_seconds: int, include_failed: bool = False) -> Q:
+    stale = Q(status=IngestionJob.RUNNING, claimed_at__lt=timezone.now() - timedelta(seconds=lease_seconds))
+    condition = Q(status=IngestionJob.QUEUED) | stale
+    return (condition | Q(status=IngestionJob.FAILED)) if include_failed else condition
+
+
+def claim_job(job: IngestionJob, worker: str, lease_seconds: int = DEFAULT_LEASE_SECONDS, include_failed=False) -> bool:
+    """
+    Claim `job` for `worker` if it is queued or abandoned (or, with
+    `include_failed`, failed). It resumes from its checkpoint.
+    """
+    now = timezone.now()
+    claimed = IngestionJob.objects.filter(_claimable(lease_seconds, include_failed), pk=job.pk).update(
+        status=IngestionJob.RUNNING,
+        claimed_by=worker,
+        claimed_at=now,
+        attempts=F("attempts") + 1,
+        error="",
+        started_at=Coalesce("started_at", Value(now)),
+        updated_at=now,
+    )
+    job.refresh_from_db()
+    return bool(claimed)
+
+
+def claim_next_job(worker: str, lease_seconds: int = DEFAULT_LEASE_SECONDS) -> Optional[IngestionJob]:
+    """Claim the oldest queued or abandoned job, or return None if there is none."""
+    while True:
+        job = IngestionJob.objects.filter(_claimable(lease_seconds)).order_by("created_at").first()
+        if job is None:
+            return None
+        if claim_job(job, worker, lease_seconds):
+            return job
+        # Another worker won the race for this job; try the next one.
+
+
+def _read_lines(handle, position: List[int]) -> Iterator[str]:
+    # Counts in `position` the bytes read, so callers know where each line ends.
+    first = position[0] == 0
+    for raw in iter(handle.readline, b""):
+        position[0] += len(raw)
+        line = raw.decode("utf-8", "surrogateescape")
+        if first:
+            # Spreadsheet exports often start with a byte order mark.
+            line, first = line.lstrip("\ufeff"), False
+        yield line
+
+
+def _readable(values) -> bool:
+    try:
+        "".join(values).encode("utf-8")
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+def read_csv_header(handle) -> Tuple[List[str], int]:
+    """The header row of a CSV file and the byte offset after it."""
+    handle.seek(0)
+    position = [0]
+    header = next(csv.reader(_read_lines(handle, position)), None)
+    if not header or not _readable(header):
+        raise ValueError("The CSV file has no readable header row.")
+    return [name.strip() for name in header], position[0]
+
+
+def iter_rows(job: IngestionJob, handle) -> Iterator[Tuple[Optional[object], int]]:
+    """
+    (row, byte offset after it) for each line or CSV record from the job's
+    offset; the row is None for blank lines and an UnreadableRow for lines
+    that cannot be read.
+    """
+    handle.seek(job.byte_offset)
+    position = [job.byte_offset]
+    lines = _read_lines(handle, position)
+    if job.format == IngestionJob.NDJSON:
+        for line in lines:
+            if not line.strip():
+                yield None, position[0]
+            elif not _readable(line):
+                yield UnreadableRow("Not UTF-8."), position[0]
+            else:
+                try:
+                    yield json.loads(line), position[0]
+                except ValueError as e:
+                    yield UnreadableRow(f"Not JSON: {e}"), position[0]
+        return
+
+    header = job.csv_header
+    for values in csv.reader(lines):
+        if not values:
+            yield None, position[0]
+        elif len(values) != len(header):
+            yield UnreadableRow(f"Expected {len(header)} columns, found {len(values)}."), position[0]
+        elif not _readable(values):
+            yield UnreadableRow("Not UTF-8."), position[0]
+        else:
+            yield {"credential_data": {name: value for name, value in zip(header, values) if value != ""}}, position[0]
+
+
+def _commit_chunk(job: IngestionJob, owned, rows: list, offset: int):
+    """Issue a chunk of rows and move the checkpoint past them, in one transaction."""
+    with transaction.atomic():
+        result = issue_bulk(job.issuer, rows, chunk_size=max(1, len(rows))) if rows else None
+        if result is not None:
+            room = MAX_ROW_ERRORS - len(job.row_errors)
+            errors = [
+                {"row": job.rows_read + row["row"] + 1, "error": row["error"]}
+                for row in result.rows
+                if row["status"] == INVALID
+            ]
+            job.row_errors = job.row_errors + errors[: max(0, room)]
+            job.rows_read += len(rows)
+            job.created_count += result.created
+            job.duplicate_count += result.duplicates
+            job.invalid_count += result.invalid
+        job.byte_offset = offset
+        now = timezone.now()
+        updated = owned.update(
+            byte_offset=job.byte_offset,
+            rows_read=job.rows_read,
+            created_count=job.created_count,
+            duplicate_count=job.duplicate_count,
+            invalid_count=job.invalid_count,
+            row_errors=job.row_errors,
+            claimed_at=now,
+            updated_at=now,
+        )
+        if not updated:
+            raise LostClaim(f"Ingestion job {job.id} was taken over by another worker.")
+
+
+def run_ingestion(
+    job: IngestionJob,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    on_chunk: Optional[Callable[[IngestionJob], None]] = None,
+) -> IngestionJob:
+    """Ingest a claimed job's file from its checkpoint to the end, and record the outcome."""
+    owned = IngestionJob.objects.filter(pk=job.pk, claimed_by=job.claimed_by, attempts=job.attempts)
+    on_chunk = on_chunk or (lambda job: None)
+    try:
+        with open(job.path, "rb") as handle:
+            if job.format == IngestionJob.CSV and job.csv_header is None:
+                job.csv_header, job.byte_offset = read_csv_header(handle)
+                if not owned.update(csv_header=job.csv_header, byte_offset=job.byte_offset, updated_at=timezone.now()):
+                    raise LostClaim(f"Ingestion job {job.id} was taken over by another worker.")
+            rows, offset = [], job.byte_offset
+            for row, offset in iter_rows(job, handle):
+                if row is not None:
+                    rows.append(row)
+                if len(rows) >= chunk_size:
+                    _commit_chunk(job, owned, rows, offset)
+                    on_chunk(job)
+                    rows = []
+            _commit_chunk(job, owned, rows, offset)
+            on_chunk(job)
+    except LostClaim:
+        pass
+    except Exception as e:
+        now = timezone.now()
+        owned.update(status=IngestionJob.FAILED, error=repr(e), updated_at=now, finished_at=now)
+    else:
+        now = timezone.now()
+        owned.update(status=IngestionJob.DONE, updated_at=now, finished_at=now)
+    job.refresh_from_db()
+    return job
@@ -0,0 +1,176 @@
+"""
+Bulk issuance of credential records.
+
+Issuing through `CredentialIssuanceView` costs a request, an API key lookup
+and about ten queries per record, as `CredentialRecord.save` writes the
+record and its index rows one by one. `issue_bulk` takes a whole archive:
+
+1. every row is validated and hashed up front; a row whose hash an earlier
+   row already has is a duplicate;
+2. the rest are written `chunk_size` at a time. For each chunk, one query
+   finds the hashes already issued, and one transaction bulk-creates the
+   records, their lookup rows and their name keys;
+3. after each chunk, what save() does per record is done for the chunk:
+   cached lookups of the new hashes are invalidated and, once the chunk is
+   committed, the prefilter learns them and credentials_issued is sent so
+   pending documents are matched.
+
+A chunk that loses a race with a concurrent issuance of the same hash is
+rolled back and written again without it.
+"""
+
+import json
+import time
+from typing import Any, List, NamedTuple, Optional, Sequence, Tuple
+
+from django.db import IntegrityError, transaction
+
+from .bloom import record_issued
+from .models import CredentialLookup, CredentialNameKey, CredentialRecord, Institution
+from .record_cache import invalidate
+from .signals import credentials_issued
+
+CREATED = "CREATED"
+DUPLICATE = "DUPLICATE"
+INVALID = "INVALID"
+
+# Records written per transaction.
+DEFAULT_CHUNK_SIZE = 1000
+
+
+class BulkIssueResult(NamedTuple):
+    # One dict per input row, in input order: {"row", "status", ...}.
+    rows: List[dict]
+    created: int
+    duplicates: int
+    invalid: int
+    seconds: float
+
+    @property
+    def records_per_second(self) -> float:
+        return self.created / self.seconds if self.seconds else 0.0
+
+
+class UnreadableRow(NamedTuple):
+    """A row that could not be read; issued as INVALID with `error`."""
+
+    error: str
+
+
+def parse_rows(body: bytes, ndjson: bool = False) -> List[Any]:
+    """
+    The rows of a JSON array body, or of an NDJSON body (one row per line;
+    blank lines are skipped, and a line that is not JSON becomes an invalid
+    row). Raises ValueError when the body as a whole cannot be read.
+    """
+    text = body.decode("utf-8")
+    if not ndjson:
+        rows = json.loads(text)
+        if not isinstance(rows, list):
+            raise ValueError("Expected a JSON array of rows.")
+        return rows
+    rows = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            rows.append(json.loads(line))
+        except ValueError as e:
+            rows.append(UnreadableRow(f"Not JSON: {e}"))
+    return rows
+
+
+def _credential_data(row: Any) -> Tuple[Optional[dict], str]:
+    """A row's credential_data, as the single issuance endpoint takes it, or an error."""
+    if isinstance(row, UnreadableRow):
+        return None, row.error
+    if not isinstance(row, dict) or "credential_data" not in row:
+        return None, "Each row must be an object with credential_data."
+    data = row["credential_data"]
+    if not isinstance(data, dict) or not data:
+        return None, "credential_data must be a non-empty JSON object."
+    return data, ""
+
+
+def issue_bulk(issuer: Institution, rows: Sequence[Any], chunk_size: int = DEFAULT_CHUNK_SIZE) -> BulkIssueResult:
+    """Issue a CredentialRecord for each valid, new row."""
+    started = time.perf_counter()
+    results: List[Optional[dict]] = [None] * len(rows)
+    first_row = {}
+    pending = []
+    for index, row in enumerate(rows):
+        data, error = _credential_data(row)
+        if error:
+            results[index] = {"row": index, "status": INVALID, "error": error}
+            continue
+        credential_hash = CredentialRecord.canonical_hash(data)
+        if credential_hash in first_row:
+            results[index] = {
+                "row": index,
+                "status": DUPLICATE,
+                "credential_hash": credential_hash,
+                "duplicate_of_row": first_row[credential_hash],
+            }
+            continue
+        first_row[credential_hash] = index
+        pending.append((index, data, credential_hash))
+
+    for start in range(0, len(pending), chunk_size):
+        _issue_chunk(issuer, pending[start:start + chunk_size], results)
+
+    statuses = [result["status"] for result in results]
+    return BulkIssueResult(
+        results,
+        statuses.count(CREATED),
+        statuses.count(DUPLICATE),
+        statuses.count(INVALID),
+        time.perf_counter() - started,
+    )
+
+
+def _issue_chunk(issuer: Institution, chunk, results: List[Optional[dict]], retry: bool = True):
+    issued = dict(
+        CredentialRecord.objects.filter(credential_hash__in=[row[2] for row in chunk]).values_list(
+            "credential_hash", "id"
+        )
+    )
+    records, indexes = [], []
+    for index, data, credential_hash in chunk:
+        if credential_hash in issued:
+            results[index] = {
+                "row": index,
+                "status": DUPLICATE,
+                "credential_hash": credential_hash,
+                "id": issued[credential_hash],
+            }
+            continue
+        record = CredentialRecord(issuer=issuer, credential_data=data, credential_hash=credential_hash)
+        record.refresh_digests()
+        records.append(record)
+        indexes.append(index)
+    if not records:
+        return
+
+    try:
+        with transaction.atomic():
+            CredentialRecord.objects.bulk_create(records)
+            CredentialLookup.objects.bulk_create([CredentialLookup.build(record) for record in records])
+            CredentialNameKey.objects.bulk_create([key for record in records for key in CredentialNameKey.build(record)])
+    except IntegrityError:
+        if not retry:
+            raise
+        # Another request issued one of these hashes since we looked.
+        _issue_chunk(issuer, chunk, results, retry=False)
+        return
+
+    for index, record in zip(indexes, records):
+        results[index] = {"row": index, "status": CREATED, "id": record.id, "credential_hash": record.credential_hash}
+    # What CredentialRecord.save does for one record, for the chunk.
+    invalidate(*(record.credential_hash for record in records))
+    transaction.on_commit(lambda: _announce(records))
+
+
+def _announce(records: List[CredentialRecord]):
+    for record in records:
+        record_issued(record)
+    credentials_issued.send(sender=CredentialRecord, records=records)
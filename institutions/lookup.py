@@ -0,0 +1,208 @@
+"""
+Normalization for the credential lookup index (`CredentialLookup`).
+
+Issuers and OCR write the same serial or name in different ways
+("AAU-2023/CS0042" vs "aau 2023 cs0042", "Abebe  KEBEDE" vs "abebe kebede"),
+so both sides are reduced to one key form before they are compared. The
+index stores the keys; the verify pipeline normalizes parsed fields the same
+way and queries by equality or by prefix range.
+
+Names also get blocking keys for fuzzy search (`name_keys`), which tolerate
+the spelling drift of transliterated Ethiopian names: doubled letters
+(Kebbede/Kebede), vowel choices (Tesfaye/Tesfay/Tesfaie, Haile/Hayle) and
+common digraphs (Shiferaw/Xiferaw, Mekonnen/Mekonen), and of the usual OCR
+misreadings (Hailemariam/Hailernariam, Tesfaye/Tcsfaye). Names in Ge'ez script
+are keyed by consonant, ignoring the vowel order of each syllable and
+merging homophone letters (ሀ/ሐ/ኀ, ሰ/ሠ, አ/ዐ, ጸ/ፀ).
+"""
+
+import hashlib
+import json
+import re
+import unicodedata
+from datetime import date
+from itertools import combinations
+from typing import Dict, List, Optional
+
+from wallet.parser import normalize_date
+
+# credential_data keys the index reads, in order of preference.
+SERIAL_KEYS = ("credential_id", "serial_number")
+NAME_KEYS = ("full_name",)
+DATE_KEYS = ("issued_date", "issue_date", "date_issued")
+
+# Name tokens keyed; later ones (long compound names) add keys but little recall.
+MAX_NAME_TOKENS = 4
+
+_NOT_ALNUM = re.compile(r"[\W_]+")
+_SERIAL_CONFUSIONS = str.maketrans("OISB", "0158")
+
+# Sorts after every character, for prefix queries as a plain index range.
+_MAX_CHAR = "\U0010ffff"
+
+
+def _fold(value: str) -> str:
+    # Drop accents and compatibility forms, then case-fold.
+    decomposed = unicodedata.normalize("NFKD", value)
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def normalize_serial(value) -> str:
+    """Upper-case alphanumerics only: separators vary between issuers and OCR."""
+    return _NOT_ALNUM.sub("", _fold(str(value or ""))).upper()
+
+
+def serial_shape(value) -> str:
+    """
+    A normalized serial with the characters OCR confuses read as one (O and
+    0, I and 1, S and 5, B and 8), for comparing a misread serial to a record's.
+    """
+    return normalize_serial(value).translate(_SERIAL_CONFUSIONS)
+
+
+def normalize_name(value) -> str:
+    """Case-folded words separated by single spaces, punctuation dropped."""
+    return " ".join(_NOT_ALNUM.sub(" ", _fold(str(value or ""))).split())
+
+
+def normalize_issue_date(value) -> Optional[date]:
+    if isinstance(value, date):
+        return value
+    normalized = normalize_date(str(value)) if value else None
+    try:
+        return date.fromisoformat(normalized) if normalized else None
+    except ValueError:
+        return None
+
+
+def _first(data: dict, keys) -> Optional[str]:
+    return next((data[key] for key in keys if data.get(key)), None)
+
+
+def credential_serial(data: dict) -> str:
+    """The normalized serial of a credential_data (or parsed fields) dict; "" if none."""
+    return normalize_serial(_first(data, SERIAL_KEYS))
+
+
+def lookup_keys(data: dict) -> Dict[str, object]:
+    """The index columns for a credential_data (or parsed fields) dict."""
+    return {
+        "serial": credential_serial(data),
+        "full_name": normalize_name(_first(data, NAME_KEYS)),
+        "issued_date": normalize_issue_date(_first(data, DATE_KEYS)),
+    }
+
+
+# Digest columns on CredentialRecord and the lookup keys each one covers,
+# strongest match first.
+SUBSET_DIGESTS = {
+    "name_serial_digest": ("full_name", "serial"),
+    "name_date_digest": ("full_name", "issued_date"),
+}
+
+
+def subset_digests(data: dict) -> Dict[str, str]:
+    """
+    SHA-256 of each field subset in SUBSET_DIGESTS, over the normalized keys
+    of a credential_data (or parsed fields) dict; "" where a field is missing.
+    """
+    keys = lookup_keys(data)
+    digests = {}
+    for column, fields in SUBSET_DIGESTS.items():
+        values = {field: str(keys[field]) for field in fields if keys[field]}
+        canonical = json.dumps(values, sort_keys=True)
+        digests[column] = hashlib.sha256(canonical.encode("utf-8")).hexdigest() if len(values) == len(fields) else ""
+    return digests
+
+
+def prefix_range(field: str, prefix: str) -> Dict[str, str]:
+    """
+    Filter kwargs matching values that start with `prefix`, as a range
+    (>= prefix, < prefix + max char). Unlike `__startswith` this is a plain
+    B-tree range on every backend: no LIKE, no pattern operator class.
+    """
+    return {f"{field}__gte": prefix, f"{field}__lt": prefix + _MAX_CHAR}
+
+
+# Letters Tesseract misreads in names, read back as the likelier letter. A lone
+# "c" is rare in transliterated Ethiopian names ("ch" is kept), but a common
+# misreading of "e".
+_OCR_CONFUSIONS = (("rn", "m"), ("0", "o"), ("1", "l"), ("5", "s"), ("8", "b"))
+_LONE_C = re.compile(r"c(?![hk])")
+# Transliteration variants reduced to one spelling before the skeleton is taken.
+_DIGRAPHS = (("ph", "f"), ("sh", "x"), ("ch", "c"), ("kh", "k"), ("gh", "g"), ("ck", "k"), ("q", "k"), ("v", "b"))
+_LATIN_VOWELS = frozenset("aeiouyhw")
+_DOUBLED = re.compile(r"(.)\1+")
+
+_ETHIOPIC_START, _ETHIOPIC_END = 0x1200, 0x137F
+# Syllable families sharing a sound, keyed by their first-order code point.
+_ETHIOPIC_HOMOPHONES = {0x1210: 0x1200, 0x1280: 0x1200, 0x1220: 0x1230, 0x12D0: 0x12A0, 0x1340: 0x1338}
+_ETHIOPIC_GLOTTAL = 0x12A0  # አ carries a bare vowel.
+
+
+def _ethiopic_family(char: str) -> Optional[int]:
+    code = ord(char)
+    if not _ETHIOPIC_START <= code <= _ETHIOPIC_END:
+        return None
+    # Each consonant has its vowel orders in a run of 8 code points.
+    base = _ETHIOPIC_START + (code - _ETHIOPIC_START) // 8 * 8
+    return _ETHIOPIC_HOMOPHONES.get(base, base)
+
+
+def _latin_spelling(token: str) -> str:
+    for confusion, replacement in _OCR_CONFUSIONS:
+        token = token.replace(confusion, replacement)
+    token = _LONE_C.sub("e", token)
+    for digraph, replacement in _DIGRAPHS:
+        token = token.replace(digraph, replacement)
+    return _DOUBLED.sub(r"\1", token)
+
+
+def spelling_key(name: str) -> str:
+    """
+    A normalized name in one canonical spelling: common OCR misreadings
+    undone, digraphs folded and doubled letters collapsed, vowels kept.
+    Fuzzy scores on this form measure real differences, not spelling ones.
+    """
+    return " ".join(
+        token if _ethiopic_family(token[0]) is not None else _latin_spelling(token) for token in name.split()
+    )
+
+
+def phonetic_key(token: str) -> str:
+    """
+    A spelling-tolerant key for one name token: the first letter and then
+    the consonant skeleton, upper-cased, with doubled letters collapsed and
+    common OCR misreadings undone.
+    """
+    if not token:
+        return ""
+    if _ethiopic_family(token[0]) is not None:
+        families = [_ethiopic_family(char) for char in token]
+        families = [family for family in families if family is not None]
+        skeleton = families[:1] + [family for family in families[1:] if family != _ETHIOPIC_GLOTTAL]
+        collapsed = [family for index, family in enumerate(skeleton) if index == 0 or family != skeleton[index - 1]]
+        return "".join(chr(family) for family in collapsed)
+    token = _latin_spelling(token)
+    skeleton = token[0] + "".join(char for char in token[1:] if char not in _LATIN_VOWELS)
+    return _DOUBLED.sub(r"\1", skeleton).upper()
+
+
+def name_keys(name: str) -> List[str]:
+    """
+    Blocking keys for a normalized name: "1:" plus each token's phonetic key,
+    and "2:" plus the keys of each pair of tokens, in name order. Ethiopian
+    names are given name, father's name, grandfather's name, so a pair key is
+    far more selective than any single common name; pairs that skip a token
+    still match when OCR drops or garbles the one in between.
+    """
+    tokens = [phonetic_key(token) for token in name.split()][:MAX_NAME_TOKENS]
+    tokens = [token for token in tokens if token]
+    keys = {f"1:{token}" for token in tokens}
+    keys.update(f"2:{first} {second}" for first, second in combinations(tokens, 2))
+    return sorted(key[:64] for key in keys)
+
+
+def holder_name_keys(data: dict) -> List[str]:
+    """The blocking keys of the holder name in a credential_data dict."""
+    return name_keys(normalize_name(_first(data, NAME_KEYS)))
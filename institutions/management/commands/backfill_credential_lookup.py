@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from institutions.lookup import SUBSET_DIGESTS
+from institutions.models import CredentialLookup, CredentialNameKey, CredentialRecord
+
+
+class Command(BaseCommand):
+    help = (
+        "Builds the normalized credential lookup index, the name blocking keys "
+        "and the field-subset digests for existing credential records. By "
+        "default only records without an index row are processed; --rebuild "
+        "recomputes every row (after a change to the normalization, or once "
+        "after the digest columns are added). "
+        "Walks records in id order in batches, so an interrupted run can resume."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Records read and written per batch.")
+        parser.add_argument(
+            "--start-after",
+            type=int,
+            default=0,
+            metavar="ID",
+            help="Skip records with an id up to and including ID (resume point printed by a previous run).",
+        )
+        parser.add_argument("--rebuild", action="store_true", help="Recompute rows that already exist.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        queryset = CredentialRecord.objects.only("id", "issuer_id", "credential_data").order_by("id")
+        if not options["rebuild"]:
+            queryset = queryset.filter(lookup__isnull=True)
+
+        last_id = options["start_after"]
+        written = 0
+        while True:
+            # Keyset pagination, as in reparse_documents.
+            batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            # One transaction per batch: a record never has a lookup row without its keys.
+            with transaction.atomic():
+                CredentialLookup.objects.bulk_create(
+                    [CredentialLookup.build(record) for record in batch],
+                    update_conflicts=True,
+                    unique_fields=["record"],
+                    update_fields=["issuer", "serial", "full_name", "issued_date"],
+                )
+                CredentialNameKey.refresh(batch)
+                now = timezone.now()
+                for record in batch:
+                    record.refresh_digests()
+                    # Index rows changed: the prefilter re-reads the record.
+                    record.updated_at = now
+                CredentialRecord.objects.bulk_update(batch, [*SUBSET_DIGESTS, "updated_at"])
+            written += len(batch)
+            self.stdout.write(f"  up to id {last_id}: {written} indexed")
+
+        self.stdout.write(self.style.SUCCESS(f"{written} credential record(s) indexed; last id {last_id}."))
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from institutions.bloom import DEFAULT_CHANGE_OVERLAP, CredentialFilter, filter_options
+
+
+class Command(BaseCommand):
+    help = (
+        "Builds the Bloom filter of credential hashes and serials in one streaming "
+        "pass over the records and writes it to a file that processes memory-map "
+        "at start-up (WALLET_CREDENTIAL_FILTER['path']). Reports its size and "
+        "false-positive rate. Run it periodically; processes catch up with newer "
+        "records themselves."
+    )
+
+    def add_arguments(self, parser):
+        options = filter_options()
+        parser.add_argument("--path", default=options.get("path"), help="Output file.")
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=options.get("error_rate", 0.01),
+            help="Target false-positive rate at capacity.",
+        )
+        parser.add_argument(
+            "--capacity",
+            type=int,
+            default=options.get("capacity"),
+            help="Keys to size the filter for (default: headroom x the keys present).",
+        )
+        parser.add_argument("--headroom", type=float, default=options.get("headroom", 2.0))
+
+    def handle(self, *args, **options):
+        if not options["path"]:
+            raise CommandError("Give --path or set WALLET_CREDENTIAL_FILTER['path'].")
+        try:
+            credential_filter = CredentialFilter.build(
+                options["error_rate"],
+                options["capacity"],
+                options["headroom"],
+                change_overlap=filter_options().get("change_overlap", DEFAULT_CHANGE_OVERLAP),
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        credential_filter.save(options["path"])
+
+        report = credential_filter.snapshot()
+        self.stdout.write(
+            f"  keys {report['items']} of capacity {report['capacity']}, up to record id {report['watermark']}\n"
+            f"  {report['size_bytes'] / 1024:.1f} KiB, {report['hash_count']} hash functions\n"
+            f"  false-positive rate {report['estimated_error_rate']:.4%} now, "
+            f"{report['target_error_rate']:.2%} at capacity"
+        )
+        self.stdout.write(self.style.SUCCESS(f"Credential filter written to {options['path']}."))
@@ -0,0 +1,89 @@
+import os
+import socket
+
+from django.core.management.base import BaseCommand, CommandError
+
+from institutions.ingestion import DEFAULT_LEASE_SECONDS, claim_job, claim_next_job, create_job, run_ingestion
+from institutions.issuance import DEFAULT_CHUNK_SIZE
+from institutions.models import IngestionJob, Institution
+
+
+class Command(BaseCommand):
+    help = (
+        "Loads credential export files (CSV with a header row, or NDJSON) into the "
+        "register, reading them as a stream and committing in chunks with a byte-offset "
+        "checkpoint, so memory stays flat and an interrupted job resumes where it "
+        "stopped. Give a local file and --institution, --resume a job, or run the "
+        "jobs uploaded through the API (and abandoned ones) with --queued."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", help="Local CSV or NDJSON file to ingest.")
+        parser.add_argument("--institution", help="Id or name of the issuing institution, with a path.")
+        parser.add_argument("--format", choices=[IngestionJob.CSV, IngestionJob.NDJSON], default="", help="Default: from the file suffix.")
+        parser.add_argument("--resume", metavar="JOB_ID", help="Resume an interrupted or failed job from its checkpoint.")
+        parser.add_argument("--queued", action="store_true", help="Run queued and abandoned jobs until none are left.")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows committed per transaction.")
+        parser.add_argument(
+            "--lease-seconds",
+            type=int,
+            default=DEFAULT_LEASE_SECONDS,
+            help="A running job not heard from for this long is treated as abandoned and taken over.",
+        )
+        parser.add_argument("--name", default=f"{socket.gethostname()}:{os.getpid()}", help="Worker name recorded on claims.")
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be at least 1.")
+        if sum(bool(options[mode]) for mode in ("path", "resume", "queued")) != 1:
+            raise CommandError("Give exactly one of a path, --resume or --queued.")
+        worker = options["name"]
+
+        if options["queued"]:
+            ran = 0
+            while True:
+                job = claim_next_job(worker, options["lease_seconds"])
+                if job is None:
+                    break
+                self.run(job, options["chunk_size"])
+                ran += 1
+            self.stdout.write(f"No ingestion jobs left after {ran}.")
+            return
+
+        if options["resume"]:
+            try:
+                job = IngestionJob.objects.get(id=options["resume"])
+            except (IngestionJob.DoesNotExist, ValueError):
+                raise CommandError(f"No ingestion job {options['resume']}.")
+        else:
+            job = create_job(self.institution(options["institution"]), local_path=options["path"], format=options["format"])
+            self.stdout.write(f"Created ingestion job {job.id}.")
+        if not claim_job(job, worker, options["lease_seconds"], include_failed=True):
+            raise CommandError(f"Ingestion job {job.id} is {job.status} and held by {job.claimed_by or 'nobody'}.")
+        job = self.run(job, options["chunk_size"])
+        if job.status != IngestionJob.DONE:
+            raise CommandError(f"Ingestion job {job.id} {job.status}: {job.error}; continue with --resume {job.id}.")
+
+    def institution(self, value):
+        if not value:
+            raise CommandError("Give --institution with a path.")
+        lookup = {"id": int(value)} if value.isdigit() else {"name": value}
+        try:
+            return Institution.objects.get(**lookup)
+        except Institution.DoesNotExist:
+            raise CommandError(f"No institution {value!r}.")
+
+    def report(self, job):
+        self.stdout.write(
+            f"  {job.byte_offset}/{job.size} bytes ({job.progress:.1%}): {job.rows_read} rows, "
+            f"{job.created_count} created, {job.duplicate_count} duplicate, {job.invalid_count} invalid"
+        )
+
+    def run(self, job, chunk_size):
+        self.stdout.write(f"Ingesting {job.path} ({job.format}) from byte {job.byte_offset} for {job.issuer}.")
+        job = run_ingestion(job, chunk_size, on_chunk=self.report)
+        line = f"Ingestion job {job.id}: {job.status}."
+        self.stdout.write(self.style.SUCCESS(line) if job.status == IngestionJob.DONE else self.style.ERROR(line))
+        for error in job.row_errors[:10]:
+            self.stdout.write(f"  row {error['row']}: {error['error']}")
+        return job
@@ -0,0 +1,130 @@
+"""
+Fuzzy search for credential records by holder name.
+
+When OCR garbles the serial, the serial lookup finds nothing and the holder
+name is all there is to search by. Scoring every record would be linear in
+the number of records, so the search runs in two steps:
+
+1. Blocking: `name_candidates` reads the OCRed name's blocking keys
+   (institutions.lookup.name_keys) from the `CredentialNameKey` index and
+   keeps the top-k records by the number of keys they share, token-pair keys
+   first. The cost grows with the size of the key posting lists it reads, not
+   with the number of records.
+2. Scoring: `score_candidates` scores those k records in one batch on name
+   (in canonical spelling, institutions.lookup.spelling_key), issue date and
+   title, and combines the scores with `FIELD_WEIGHTS`.
+
+`wallet.benchmarks.name_matching` measures recall, precision and latency.
+"""
+
+from datetime import date
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from django.db.models import Case, Count, Max, When
+from thefuzz import fuzz, process
+
+from .lookup import name_keys, normalize_issue_date, normalize_name, spelling_key
+from .models import CredentialLookup, CredentialNameKey, CredentialRecord
+
+# Records scored per search.
+MAX_NAME_CANDIDATES = 50
+
+# Relative weight of each field in the combined score. Fields missing on
+# either side are left out and the remaining weights rescaled.
+FIELD_WEIGHTS = {"full_name": 0.6, "issued_date": 0.2, "certificate_title": 0.2}
+
+
+class ScoredCandidate(NamedTuple):
+    """A record and its 0-100 scores; a field score is None when it could not be compared."""
+
+    record: CredentialRecord
+    score: float
+    name_score: float
+    date_score: Optional[float]
+    title_score: Optional[float]
+
+
+def _ranked(keys: Sequence[str], k: int, issuer=None, issued_date: Optional[date] = None) -> List[int]:
+    postings = CredentialNameKey.objects.filter(key__in=keys)
+    if issuer is not None:
+        postings = postings.filter(record__issuer=issuer)
+    ranked = postings.values("record").annotate(hits=Count("key"))
+    order = ["-hits", "record"]
+    if issued_date is not None:
+        # Common names share their keys with many records; among those, the
+        # ones issued on the same date come first.
+        ranked = ranked.annotate(
+            same_date=Max(Case(When(record__lookup__issued_date=issued_date, then=1), default=0))
+        )
+        order.insert(1, "-same_date")
+    return [row["record"] for row in ranked.order_by(*order)[:k]]
+
+
+def name_candidates(name: str, k: int = MAX_NAME_CANDIDATES, issuer=None, issued_date=None) -> List[int]:
+    """
+    Ids of up to `k` records whose holder name shares the most blocking keys
+    with `name`, best first, ties going to records with `issued_date`. Pair
+    keys are tried first; single-token keys only when no pair matches (a
+    one-word name, or every pair broken by OCR).
+    """
+    keys = name_keys(normalize_name(name))
+    issued_date = normalize_issue_date(issued_date)
+    pair_keys = [key for key in keys if key.startswith("2:")]
+    candidates = _ranked(pair_keys, k, issuer, issued_date) if pair_keys else []
+    if not candidates:
+        candidates = _ranked([key for key in keys if key.startswith("1:")], k, issuer, issued_date)
+    return candidates
+
+
+def _scores(query: str, choices: Dict[int, str], scorer) -> Dict[int, float]:
+    if not query:
+        return {}
+    return {key: score for _, score, key in process.extract(query, choices, scorer=scorer, processor=None, limit=None)}
+
+
+def score_candidates(fields: dict, record_ids: Sequence[int]) -> List[ScoredCandidate]:
+    """Score records against parsed fields, best first."""
+    lookups = {
+        lookup.record_id: lookup
+        for lookup in CredentialLookup.objects.filter(record_id__in=record_ids).select_related("record")
+    }
+    if not lookups:
+        return []
+    names = _scores(
+        spelling_key(normalize_name(fields.get("full_name"))),
+        {record_id: spelling_key(lookup.full_name) for record_id, lookup in lookups.items()},
+        fuzz.token_sort_ratio,
+    )
+    titles = _scores(
+        normalize_name(fields.get("certificate_title")),
+        {
+            record_id: normalize_name(lookup.record.credential_data.get("certificate_title"))
+            for record_id, lookup in lookups.items()
+        },
+        fuzz.token_set_ratio,
+    )
+    issued_date = normalize_issue_date(fields.get("issued_date"))
+
+    scored = []
+    for record_id, lookup in lookups.items():
+        date_score = None
+        if issued_date and lookup.issued_date:
+            date_score = 100.0 if issued_date == lookup.issued_date else 0.0
+        title_score = titles.get(record_id) if lookup.record.credential_data.get("certificate_title") else None
+        parts = {
+            "full_name": names.get(record_id, 0),
+            "issued_date": date_score,
+            "certificate_title": title_score,
+        }
+        weights = {field: FIELD_WEIGHTS[field] for field, score in parts.items() if score is not None}
+        score = sum(parts[field] * weight for field, weight in weights.items()) / sum(weights.values())
+        scored.append(ScoredCandidate(lookup.record, score, parts["full_name"], date_score, title_score))
+    scored.sort(key=lambda candidate: (-candidate.score, candidate.record.id))
+    return scored
+
+
+def search_by_name(fields: dict, k: int = MAX_NAME_CANDIDATES, issuer=None) -> List[ScoredCandidate]:
+    """Blocking then scoring: the best records for parsed fields, searched by holder name."""
+    if not fields.get("full_name"):
+        return []
+    return score_candidates(fields, name_candidates(fields["full_name"], k, issuer, fields.get("issued_date")))
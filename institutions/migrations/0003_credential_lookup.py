@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('institutions', '0002_institutionapikey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CredentialLookup',
+            fields=[
+                ('record', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='lookup', serialize=False, to='institutions.credentialrecord')),
+                ('serial', models.CharField(blank=True, default='', max_length=128)),
+                ('full_name', models.CharField(blank=True, default='', max_length=255)),
+                ('issued_date', models.DateField(blank=True, null=True)),
+                ('issuer', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='institutions.institution')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['serial'], name='credlookup_serial_idx'), models.Index(fields=['full_name'], name='credlookup_name_idx'), models.Index(fields=['issuer', 'issued_date'], name='credlookup_issuer_date_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('institutions', '0003_credential_lookup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CredentialNameKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64)),
+                ('record', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='name_keys', to='institutions.credentialrecord')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['key', 'record'], name='credname_key_record_idx')],
+            },
+        ),
+    ]
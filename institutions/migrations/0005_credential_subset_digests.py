@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('institutions', '0004_credential_name_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='credentialrecord',
+            name='name_date_digest',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='credentialrecord',
+            name='name_serial_digest',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:47
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('institutions', '0005_credential_subset_digests'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestionJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('source', models.FileField(blank=True, upload_to='credential_imports/')),
+                ('local_path', models.CharField(blank=True, default='', max_length=1024)),
+                ('format', models.CharField(choices=[('csv', 'CSV, one credential_data field per column'), ('ndjson', 'NDJSON, one row per line')], max_length=10)),
+                ('status', models.CharField(choices=[('QUEUED', 'Queued'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='QUEUED', max_length=10)),
+                ('size', models.BigIntegerField(default=0)),
+                ('byte_offset', models.BigIntegerField(default=0)),
+                ('csv_header', models.JSONField(blank=True, null=True)),
+                ('rows_read', models.BigIntegerField(default=0)),
+                ('created_count', models.BigIntegerField(default=0)),
+                ('duplicate_count', models.BigIntegerField(default=0)),
+                ('invalid_count', models.BigIntegerField(default=0)),
+                ('row_errors', models.JSONField(blank=True, default=list)),
+                ('error', models.TextField(blank=True, default='')),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('claimed_by', models.CharField(blank=True, default='', max_length=100)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('issuer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ingestion_jobs', to='institutions.institution')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='institution_status_4961dd_idx')],
+            },
+        ),
+    ]
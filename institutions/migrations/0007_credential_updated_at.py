@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('institutions', '0006_ingestion_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='credentialrecord',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -3,14 +3,17 @@ import hashlib
 
 # json is a library for working with JSON data, which we'll use for hashing.
 import json
+import uuid
 
 # models is the core of Django's database functionality.
-from django.db import models
+from django.db import models, transaction
 
 # settings allows us to refer to our custom User model easily (AUTH_USER_MODEL).
 from django.conf import settings
 from rest_framework_api_key.models import AbstractAPIKey
 
+from .signals import credentials_issued
+
 
 class Institution(models.Model):
     """
@@ -90,11 +93,20 @@ class CredentialRecord(models.Model):
         db_index=True,
     )
 
+    # Digests of normalized field subsets (see institutions.lookup.SUBSET_DIGESTS),
+    # so a scan whose other fields differ can still be matched exactly on these.
+    # Empty when the record lacks one of the fields.
+    name_serial_digest = models.CharField(max_length=64, blank=True, default="", db_index=True)
+    name_date_digest = models.CharField(max_length=64, blank=True, default="", db_index=True)
+
     # The current status of the credential.
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="ACTIVE")
 
     # A timestamp that is automatically set when the record is first created.
     issued_at = models.DateTimeField(auto_now_add=True)
+    # Set on every write of the record or its index rows; the prefilter
+    # re-reads records changed since its last refresh by this column.
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         # We try to find a 'full_name' in the JSON data to create a nice, readable name.
@@ -108,26 +120,131 @@ class CredentialRecord(models.Model):
         every time a CredentialRecord is saved to the database.
         """
         # We call our custom method to generate the hash before the data is saved.
+        created = self._state.adding
+        previous_hash = self.credential_hash
         self.credential_hash = self._generate_hash()
-        # After setting the hash, we call the original, default save method to save the object.
-        super().save(*args, **kwargs)
+        self.refresh_digests()
+        # The record and its index rows are written together or not at all.
+        with transaction.atomic():
+            # After setting the hash, we call the original, default save method to save the object.
+            super().save(*args, **kwargs)
+            # Keep the lookup index in step with the data it was built from.
+            CredentialLookup.objects.update_or_create(record=self, defaults=CredentialLookup.fields_for(self))
+            CredentialNameKey.refresh([self])
+        # Cached lookups must not outlive a revocation or a change of data,
+        # and the prefilter must know the record exists.
+        from .bloom import record_issued
+        from .record_cache import invalidate
+
+        invalidate(previous_hash, self.credential_hash)
+        # Only once committed: other processes cannot see the record before.
+        transaction.on_commit(lambda: record_issued(self))
+        # Documents uploaded before this record may now match it.
+        if created:
+            transaction.on_commit(lambda: credentials_issued.send(sender=CredentialRecord, records=[self]))
+
+    def refresh_digests(self):
+        """Recompute the field-subset digests from credential_data (bulk_create skips save)."""
+        from .lookup import subset_digests
+
+        for column, digest in subset_digests(self.credential_data or {}).items():
+            setattr(self, column, digest)
 
     def _generate_hash(self):
         """
         Generates a consistent and deterministic SHA-256 hash from the credential_data JSON.
         'Deterministic' means the same input will ALWAYS produce the same output.
         """
+        return self.canonical_hash(self.credential_data)
+
+    @staticmethod
+    def canonical_hash(data) -> str:
+        """The credential_hash of a credential_data dict (or of parsed fields, to match one)."""
         # We convert the Python dictionary (credential_data) into a JSON string.
         # `sort_keys=True` is the most critical part. It guarantees that the JSON's keys
         # are always in the same alphabetical order. This ensures that a dictionary with a
         # different key order will still produce the exact same hash.
-        canonical_string = json.dumps(self.credential_data, sort_keys=True)
+        canonical_string = json.dumps(data, sort_keys=True)
 
         # The hashing function requires a byte string, so we encode our string into UTF-8 bytes.
         # We then create the SHA-256 hash and get its hexadecimal string representation.
         return hashlib.sha256(canonical_string.encode("utf-8")).hexdigest()
 
 
+class CredentialLookup(models.Model):
+    """
+    Normalized lookup keys for one CredentialRecord: serial number, holder
+    name, issue date and issuer, each indexed. The verify pipeline finds
+    candidate records here by equality or prefix range instead of scanning
+    the `credential_data` JSON. Maintained by `CredentialRecord.save`;
+    `backfill_credential_lookup` builds it for records saved without it
+    (e.g. through `bulk_create`). See institutions.lookup for the key forms.
+    """
+
+    record = models.OneToOneField(
+        CredentialRecord, on_delete=models.CASCADE, primary_key=True, related_name="lookup"
+    )
+    # Copied from the record so a lookup can be narrowed by issuer without a join.
+    issuer = models.ForeignKey(Institution, on_delete=models.CASCADE, related_name="+", db_index=False)
+    serial = models.CharField(max_length=128, blank=True, default="")
+    full_name = models.CharField(max_length=255, blank=True, default="")
+    issued_date = models.DateField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["serial"], name="credlookup_serial_idx"),
+            models.Index(fields=["full_name"], name="credlookup_name_idx"),
+            models.Index(fields=["issuer", "issued_date"], name="credlookup_issuer_date_idx"),
+        ]
+
+    @staticmethod
+    def fields_for(record: CredentialRecord) -> dict:
+        from .lookup import lookup_keys
+
+        return {"issuer_id": record.issuer_id, **lookup_keys(record.credential_data or {})}
+
+    @classmethod
+    def build(cls, record: CredentialRecord) -> "CredentialLookup":
+        """An unsaved index row for `record`, for bulk_create."""
+        return cls(record=record, **cls.fields_for(record))
+
+    def __str__(self):
+        return f"Lookup {self.serial or '-'} / {self.full_name or '-'}"
+
+
+class CredentialNameKey(models.Model):
+    """
+    One blocking key of a CredentialRecord's holder name (see
+    institutions.lookup.name_keys). Fuzzy name search looks up the keys of
+    the OCRed name and ranks the records by how many keys they share, so it
+    reads a few short index ranges instead of scoring every record.
+    Maintained alongside CredentialLookup.
+    """
+
+    record = models.ForeignKey(CredentialRecord, on_delete=models.CASCADE, related_name="name_keys")
+    key = models.CharField(max_length=64)
+
+    class Meta:
+        # Covering: the candidate query reads (key, record) from the index alone.
+        indexes = [models.Index(fields=["key", "record"], name="credname_key_record_idx")]
+
+    @staticmethod
+    def build(record: CredentialRecord) -> list:
+        """Unsaved key rows for `record`, for bulk_create."""
+        from .lookup import holder_name_keys
+
+        return [CredentialNameKey(record=record, key=key) for key in holder_name_keys(record.credential_data or {})]
+
+    @classmethod
+    def refresh(cls, records) -> None:
+        """Replace the key rows of `records`."""
+        cls.objects.filter(record__in=records).delete()
+        cls.objects.bulk_create([row for record in records for row in cls.build(record)])
+
+    def __str__(self):
+        return self.key
+
+
 class InstitutionAPIKey(AbstractAPIKey):
     """
     A custom API Key model that links a key directly to an Institution.
@@ -138,3 +255,71 @@ class InstitutionAPIKey(AbstractAPIKey):
         on_delete=models.CASCADE,
         related_name="api_keys",
     )
+
+
+class IngestionJob(models.Model):
+    """
+    The load of one credential export file (CSV or NDJSON) into the register,
+    for archives too large for one bulk issuance request. The file is read as
+    a stream and issued in chunks; `byte_offset` is committed with each chunk,
+    so a job interrupted by a crash resumes after the last committed chunk.
+    Run by the `ingest_credentials` command; see institutions.ingestion.
+    """
+
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+    STATUS_CHOICES = [(QUEUED, "Queued"), (RUNNING, "Running"), (DONE, "Done"), (FAILED, "Failed")]
+
+    CSV = "csv"
+    NDJSON = "ndjson"
+    FORMAT_CHOICES = [(CSV, "CSV, one credential_data field per column"), (NDJSON, "NDJSON, one row per line")]
+
+    # The id handed to the institution. A UUID, so job ids cannot be enumerated.
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    issuer = models.ForeignKey(Institution, on_delete=models.CASCADE, related_name="ingestion_jobs")
+    # An uploaded file, or the path of a local file given to the command.
+    source = models.FileField(upload_to="credential_imports/", blank=True)
+    local_path = models.CharField(max_length=1024, blank=True, default="")
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+
+    # Progress, committed with each chunk: the file is read up to `byte_offset`.
+    size = models.BigIntegerField(default=0)
+    byte_offset = models.BigIntegerField(default=0)
+    # The CSV header row, read once so a resumed job can start mid-file.
+    csv_header = models.JSONField(blank=True, null=True)
+    rows_read = models.BigIntegerField(default=0)
+    created_count = models.BigIntegerField(default=0)
+    duplicate_count = models.BigIntegerField(default=0)
+    invalid_count = models.BigIntegerField(default=0)
+    # The first invalid rows, {"row": n, "error": ...}; capped, however many there are.
+    row_errors = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True, default="")
+
+    # Claim bookkeeping, as for wallet.VerificationJob: a running job whose
+    # claim is older than the lease is taken over and resumed.
+    attempts = models.PositiveSmallIntegerField(default=0)
+    claimed_by = models.CharField(max_length=100, blank=True, default="")
+    claimed_at = models.DateTimeField(blank=True, null=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "created_at"])]
+
+    @property
+    def path(self) -> str:
+        return self.source.path if self.source else self.local_path
+
+    @property
+    def progress(self) -> float:
+        """Share of the file read and committed, 0 to 1."""
+        return min(1.0, self.byte_offset / self.size) if self.size else float(self.status == self.DONE)
+
+    def __str__(self):
+        return f"Ingestion job {self.id} ({self.status})"
@@ -0,0 +1,12 @@
+from rest_framework_api_key.permissions import BaseHasAPIKey
+
+from .models import InstitutionAPIKey
+
+
+class HasInstitutionAPIKey(BaseHasAPIKey):
+    """
+    Grants access to requests carrying a valid Institution API Key. The stock
+    HasAPIKey checks the generic APIKey model, which institutions have no keys in.
+    """
+
+    model = InstitutionAPIKey
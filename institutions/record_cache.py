@@ -0,0 +1,260 @@
+"""
+In-process cache of credential record lookups by credential hash.
+
+Verifiers re-check popular credentials over and over, each time an indexed
+query for the same hash. `CredentialHashCache` keeps the latest results in a
+bounded LRU, each for `ttl` seconds. Misses (no record has the hash) are
+kept too, for only `negative_ttl` seconds.
+
+Invalidation is immediate in the process that changes a record:
+`CredentialRecord.save` drops its old and new hash (status changes such as
+REVOKED or EXPIRED go through save), and a post_delete receiver drops the
+hash of a deleted record. Both run again on commit, so a lookup that read
+the old row while the change was in flight is not cached past it.
+`QuerySet.update` bypasses both; call `invalidate` after one.
+
+Other processes learn of changes through the optional shared backend: with
+"backend" naming a CACHES alias (memcached, or a file or database cache on
+the box), entries are also stored there, and every invalidation bumps a
+generation counter there that each process checks before trusting its own
+LRU. Without a backend, other processes serve a changed record for at most
+`ttl` seconds, so `ttl` defaults to LOCAL_TTL there. Verification runs in
+worker processes (WALLET_ASYNC_VERIFICATION), where records are changed by
+other processes (the admin, issuance), so a system check refuses a longer
+`ttl` without a backend. Hits are trusted as they are; the verify pipeline
+links a record with a statement that re-checks it, at no extra query.
+
+Configured by WALLET_CREDENTIAL_CACHE:
+
+    {"enabled": True, "max_entries": 10000, "ttl": 300 (LOCAL_TTL without
+     a backend), "negative_ttl": 5, "backend": None}
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import CredentialRecord
+
+_GENERATION_KEY = "credential-hash:generation"
+# Stored in the shared backend for "no such record"; None there means "not cached".
+_NO_RECORD = "-"
+# Seconds records are cached without a shared backend, the longest another
+# process may serve a changed record.
+LOCAL_TTL = 5.0
+
+
+class CredentialHashCache:
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        ttl: Optional[float] = None,
+        negative_ttl: float = 5.0,
+        backend: Optional[str] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1.")
+        self.max_entries = max_entries
+        self.ttl = ttl if ttl is not None else 300.0 if backend else LOCAL_TTL
+        self.negative_ttl = negative_ttl
+        self.backend = caches[backend] if backend else None
+        self._clock = clock
+        self._lock = threading.Lock()
+        # credential hash -> (expires at, record or None), least recently used first.
+        self._entries: "OrderedDict[str, Tuple[float, Optional[CredentialRecord]]]" = OrderedDict()
+        # Bumped by every invalidation; a lookup only stores its result if no
+        # invalidation happened while it was reading the database.
+        self._epoch = 0
+        self._generation = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.negative_hits = self.backend_hits = self.misses = 0
+            self.evictions = self.expirations = self.invalidations = 0
+
+    def get(self, credential_hash: str) -> Optional[CredentialRecord]:
+        """The record with this credential hash, or None; from the cache when possible."""
+        self._sync_generation()
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(credential_hash)
+            if entry is not None:
+                expires_at, record = entry
+                if expires_at > now:
+                    self._entries.move_to_end(credential_hash)
+                    if record is None:
+                        self.negative_hits += 1
+                    else:
+                        self.hits += 1
+                    return copy.deepcopy(record)
+                del self._entries[credential_hash]
+                self.expirations += 1
+            epoch = self._epoch
+
+        found, record = self._backend_get(credential_hash)
+        if found:
+            with self._lock:
+                self.backend_hits += 1
+        else:
+            with self._lock:
+                self.misses += 1
+            record = CredentialRecord.objects.filter(credential_hash=credential_hash).first()
+            # Not if some process invalidated while we read: the row may be stale.
+            self._sync_generation()
+            if epoch == self._epoch:
+                self._backend_set(credential_hash, record)
+        self._store(credential_hash, record, epoch)
+        return copy.deepcopy(record)
+
+    def _store(self, credential_hash: str, record: Optional[CredentialRecord], epoch: int):
+        ttl = self.ttl if record is not None else self.negative_ttl
+        with self._lock:
+            if epoch != self._epoch:
+                return
+            self._entries[credential_hash] = (self._clock() + ttl, record)
+            self._entries.move_to_end(credential_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *credential_hashes: str):
+        """Drop these hashes here and, with a shared backend, in every process."""
+        credential_hashes = [credential_hash for credential_hash in credential_hashes if credential_hash]
+        with self._lock:
+            self._epoch += 1
+            for credential_hash in credential_hashes:
+                if self._entries.pop(credential_hash, None) is not None:
+                    self.invalidations += 1
+        if self.backend is not None and credential_hashes:
+            self.backend.delete_many([self._backend_key(credential_hash) for credential_hash in credential_hashes])
+            self.backend.add(_GENERATION_KEY, 0, timeout=None)
+            self._generation = self.backend.incr(_GENERATION_KEY)
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+
+    def _sync_generation(self):
+        if self.backend is None:
+            return
+        generation = self.backend.get(_GENERATION_KEY, 0)
+        if generation != self._generation:
+            # Another process changed some record; we do not know which.
+            self.clear()
+            self._generation = generation
+
+    @staticmethod
+    def _backend_key(credential_hash: str) -> str:
+        return f"credential-hash:{credential_hash}"
+
+    def _backend_get(self, credential_hash: str) -> Tuple[bool, Optional[CredentialRecord]]:
+        if self.backend is None:
+            return False, None
+        value = self.backend.get(self._backend_key(credential_hash))
+        if value is None:
+            return False, None
+        return True, None if value == _NO_RECORD else value
+
+    def _backend_set(self, credential_hash: str, record: Optional[CredentialRecord]):
+        if self.backend is not None:
+            value, ttl = (record, self.ttl) if record is not None else (_NO_RECORD, self.negative_ttl)
+            self.backend.set(self._backend_key(credential_hash), value, timeout=ttl)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.backend_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "backend_hits": self.backend_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "hit_rate": (self.hits + self.negative_hits + self.backend_hits) / lookups if lookups else 0.0,
+            }
+
+
+_CACHE: Optional[CredentialHashCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def _options() -> dict:
+    return dict(getattr(settings, "WALLET_CREDENTIAL_CACHE", {}))
+
+
+def get_cache() -> Optional[CredentialHashCache]:
+    """The process-wide cache configured by WALLET_CREDENTIAL_CACHE, or None when it is disabled."""
+    global _CACHE
+    if _CACHE is None:
+        options = _options()
+        if not options.pop("enabled", True):
+            return None
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                _CACHE = CredentialHashCache(**options)
+    return _CACHE
+
+
+def reset_cache():
+    """Drop the process-wide cache, so the next use rebuilds it from settings."""
+    global _CACHE
+    with _CACHE_LOCK:
+        _CACHE = None
+
+
+def record_by_hash(credential_hash: str) -> Optional[CredentialRecord]:
+    """The record with this credential hash, or None."""
+    cache = get_cache()
+    if cache is None:
+        return CredentialRecord.objects.filter(credential_hash=credential_hash).first()
+    return cache.get(credential_hash)
+
+
+def invalidate(*credential_hashes: str):
+    """Drop cached lookups of these hashes now and again when the transaction commits."""
+    cache = get_cache()
+    if cache is None:
+        return
+    cache.invalidate(*credential_hashes)
+    transaction.on_commit(lambda: cache.invalidate(*credential_hashes))
+
+
+@checks.register(checks.Tags.caches)
+def check_cache_options(app_configs, **kwargs):
+    """Refuse at start-up a ttl that lets worker processes serve changed records for long."""
+    options = _options()
+    if (
+        options.get("enabled", True)
+        and getattr(settings, "WALLET_ASYNC_VERIFICATION", True)
+        and not options.get("backend")
+        and (options.get("ttl") or 0) > LOCAL_TTL
+    ):
+        return [
+            checks.Error(
+                f"WALLET_CREDENTIAL_CACHE: a ttl over {LOCAL_TTL:g} seconds needs a shared 'backend'.",
+                hint="Verification runs in worker processes, which would serve changed records that long. "
+                "Name a CACHES alias as 'backend', or lower the ttl.",
+                id="institutions.E001",
+            )
+        ]
+    return []
+
+
+@receiver(post_delete, sender=CredentialRecord)
+def invalidate_deleted_record(sender, instance, **kwargs):
+    invalidate(instance.credential_hash)
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Institution, CredentialRecord
+from .models import Institution, CredentialRecord, IngestionJob
 
 
 class InstitutionRegistrationSerializer(serializers.ModelSerializer):
@@ -27,3 +27,43 @@ class CredentialRecordSerializer(serializers.ModelSerializer):
         # The 'issuer' is set in the view from the API key.
         fields = ["id", "credential_data", "credential_hash", "status", "issued_at"]
         read_only_fields = ["id", "credential_hash", "status", "issued_at"]
+
+
+class IngestionJobSerializer(serializers.ModelSerializer):
+    """
+    Read-only view of an ingestion job for the status endpoint: how much of
+    the file is committed and what became of its rows.
+    """
+
+    job_id = serializers.UUIDField(source="id")
+    progress = serializers.FloatField()
+    records_per_second = serializers.SerializerMethodField()
+
+    class Meta:
+        model = IngestionJob
+        fields = [
+            "job_id",
+            "status",
+            "format",
+            "size",
+            "byte_offset",
+            "progress",
+            "rows_read",
+            "created_count",
+            "duplicate_count",
+            "invalid_count",
+            "records_per_second",
+            "row_errors",
+            "error",
+            "created_at",
+            "started_at",
+            "updated_at",
+            "finished_at",
+        ]
+        read_only_fields = fields
+
+    def get_records_per_second(self, job):
+        if job.started_at is None:
+            return None
+        seconds = ((job.finished_at or job.updated_at) - job.started_at).total_seconds()
+        return round(job.created_count / seconds, 1) if seconds > 0 else None
@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+# Sent with `records`, a list of saved CredentialRecords, whenever credentials
+# are issued: by CredentialRecord.save for a new record, and once per batch by
+# bulk issuance. Receivers run in the issuing request.
+credentials_issued = Signal()
@@ -1,3 +1,497 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from datetime import date
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings, tag
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .bloom import BloomFilter, CredentialFilter
+from .ingestion import claim_job, run_ingestion
+from .issuance import CREATED, DUPLICATE, INVALID
+from .lookup import name_keys, normalize_name, normalize_serial, prefix_range, subset_digests
+from .matching import name_candidates, search_by_name
+from .models import CredentialLookup, CredentialNameKey, CredentialRecord, IngestionJob, Institution, InstitutionAPIKey
+from .record_cache import LOCAL_TTL, CredentialHashCache, check_cache_options, record_by_hash, reset_cache
+
+
+class CredentialLookupTests(TestCase):
+    def setUp(self):
+        self.issuer = Institution.objects.create(name="Addis Ababa University", status="APPROVED")
+
+    def issue(self, **data):
+        return CredentialRecord.objects.create(issuer=self.issuer, credential_data=data)
+
+    def test_normalization(self):
+        self.assertEqual(normalize_serial("aau-2023/cs 0042"), "AAU2023CS0042")
+        self.assertEqual(normalize_name("  Abebe  KEBEDE-Tesfayé "), "abebe kebede tesfaye")
+
+    def test_index_is_maintained_on_save(self):
+        record = self.issue(full_name="Abebe Kebede", credential_id="AAU-2023-CS0042", issued_date="15/07/2023")
+        lookup = CredentialLookup.objects.get(record=record)
+        self.assertEqual(
+            (lookup.serial, lookup.full_name, lookup.issued_date, lookup.issuer_id),
+            ("AAU2023CS0042", "abebe kebede", date(2023, 7, 15), self.issuer.id),
+        )
+        record.credential_data["full_name"] = "Abebe Kebede Tesfaye"
+        record.save()
+        self.assertEqual(CredentialLookup.objects.get(record=record).full_name, "abebe kebede tesfaye")
+        self.assertTrue(
+            CredentialLookup.objects.filter(**prefix_range("full_name", "abebe keb")).filter(record=record).exists()
+        )
+
+    def test_record_and_index_rows_are_written_together(self):
+        with mock.patch.object(CredentialNameKey, "refresh", side_effect=DatabaseError("disk full")):
+            with self.assertRaises(DatabaseError):
+                self.issue(full_name="Abebe Kebede", credential_id="AAU-2023-CS0042")
+        self.assertFalse(CredentialRecord.objects.exists())
+        self.assertFalse(CredentialLookup.objects.exists())
+
+    def test_subset_digests_ignore_formatting(self):
+        record = self.issue(full_name="Abebe Kebede", credential_id="AAU-2023-CS0042", issued_date="15/07/2023")
+        scanned = subset_digests(
+            {"full_name": "ABEBE  KEBEDE", "serial_number": "AAU 2023/CS0042", "issued_date": "2023-07-15", "x": 1}
+        )
+        self.assertEqual(scanned["name_serial_digest"], record.name_serial_digest)
+        self.assertEqual(scanned["name_date_digest"], record.name_date_digest)
+        self.assertNotEqual(record.name_serial_digest, record.name_date_digest)
+        self.assertEqual(subset_digests({"full_name": "Abebe Kebede"}), {"name_serial_digest": "", "name_date_digest": ""})
+
+    def test_backfill_indexes_records_saved_without_it(self):
+        CredentialRecord.objects.bulk_create(
+            [
+                CredentialRecord(issuer=self.issuer, credential_data={"serial_number": f"S-{i}"}, credential_hash=str(i))
+                for i in range(5)
+            ]
+        )
+        call_command("backfill_credential_lookup", "--batch-size", "2", stdout=StringIO())
+        self.assertEqual(
+            sorted(CredentialLookup.objects.values_list("serial", flat=True)), [f"S{i}" for i in range(5)]
+        )
+        self.assertFalse(CredentialNameKey.objects.exists())  # No names to key.
+
+        CredentialRecord.objects.bulk_create(
+            [CredentialRecord(issuer=self.issuer, credential_data={"full_name": "Abebe", "serial_number": "S-9"})]
+        )
+        call_command("backfill_credential_lookup", stdout=StringIO())
+        record = CredentialRecord.objects.get(credential_data__serial_number="S-9")
+        self.assertEqual(record.name_serial_digest, subset_digests(record.credential_data)["name_serial_digest"])
+        self.assertEqual(list(record.name_keys.values_list("key", flat=True)), ["1:AB"])
+        out = StringIO()
+        call_command("backfill_credential_lookup", stdout=out)
+        self.assertIn("0 credential record(s) indexed", out.getvalue())
+
+    @tag("slow")
+    def test_query_plans_use_the_indexes_at_a_million_records(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("Reads SQLite's EXPLAIN QUERY PLAN output.")
+        table = CredentialLookup._meta.db_table
+        with connection.cursor() as cursor:
+            # Rows are generated in SQL; they reference no real records, so
+            # they are deleted again before the test's constraint check.
+            cursor.execute(
+                f"""
+                WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 1000000)
+                INSERT INTO {table} (record_id, issuer_id, serial, full_name, issued_date)
+                SELECT i, %s, printf('SER%%08d', i), printf('holder %%d name %%d', i %% 99991, i),
+                       date('2000-01-01', printf('+%%d days', i %% 9000))
+                FROM n
+                """,
+                [self.issuer.id],
+            )
+            cursor.execute("ANALYZE")
+            try:
+                queries = {
+                    "credlookup_serial_idx": CredentialLookup.objects.filter(serial="SER00012345"),
+                    "credlookup_name_idx": CredentialLookup.objects.filter(**prefix_range("full_name", "holder 42 ")),
+                    "credlookup_issuer_date_idx": CredentialLookup.objects.filter(
+                        issuer=self.issuer, issued_date=date(2010, 1, 1)
+                    ),
+                }
+                for index, queryset in queries.items():
+                    sql, params = queryset.query.sql_with_params()
+                    cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+                    plan = " ".join(row[-1] for row in cursor.fetchall())
+                    self.assertIn(f"USING INDEX {index}", plan)
+                self.assertEqual(queries["credlookup_serial_idx"].count(), 1)
+            finally:
+                cursor.execute(f"DELETE FROM {table}")
+
+
+class NameSearchTests(TestCase):
+    def setUp(self):
+        self.issuer = Institution.objects.create(name="Addis Ababa University", status="APPROVED")
+
+    def issue(self, full_name, **data):
+        return CredentialRecord.objects.create(issuer=self.issuer, credential_data={"full_name": full_name, **data})
+
+    def test_keys_tolerate_transliteration_and_ocr_variants(self):
+        keys = name_keys(normalize_name("Abebe Kebede Tesfaye"))
+        self.assertEqual(keys, ["1:AB", "1:KBD", "1:TSF", "2:AB KBD", "2:AB TSF", "2:KBD TSF"])
+        for variant in ("Abbebe Kebbede Tesfay", "ABEBE KEBEDE TESFAIE", "Abcbe Kebede Tesfaye"):
+            self.assertEqual(name_keys(normalize_name(variant)), keys, variant)
+        self.assertEqual(name_keys("shiferaw mekonnen"), name_keys("xiferaw mekonen"))
+        self.assertEqual(name_keys("hailemariam"), name_keys("hailernariam"))
+        # Ge'ez: vowel orders and homophone letters share a key.
+        self.assertEqual(name_keys("ሀይሌ ገብረ"), name_keys("ኃይሌ ገብሬ"))
+        self.assertNotEqual(name_keys("abebe kebede"), name_keys("abebe girma"))
+
+    def test_keys_are_maintained_on_save(self):
+        record = self.issue("Abebe Kebede")
+        self.assertEqual(sorted(record.name_keys.values_list("key", flat=True)), ["1:AB", "1:KBD", "2:AB KBD"])
+        record.credential_data["full_name"] = "Almaz Tadesse"
+        record.save()
+        self.assertEqual(sorted(record.name_keys.values_list("key", flat=True)), ["1:ALMZ", "1:TDS", "2:ALMZ TDS"])
+
+    def test_blocking_ranks_by_shared_keys(self):
+        full = self.issue("Abebe Kebede Tesfaye")
+        partial = self.issue("Abebe Kebede Girma")
+        other = self.issue("Almaz Tadesse Bekele")
+        self.assertEqual(name_candidates("Abbebe Kebede Tesfay"), [full.id, partial.id])
+        self.assertEqual(name_candidates("Abbebe Kebede Tesfay", k=1), [full.id])
+        # OCR dropped the father's name: the skipping pair still matches.
+        self.assertEqual(name_candidates("Abebe Tesfaye"), [full.id])
+        # A single name falls back to single-token keys.
+        self.assertEqual(name_candidates("Tadesse"), [other.id])
+        self.assertEqual(name_candidates("Yonas Haile Desta"), [])
+
+    def test_scores_combine_name_date_and_title(self):
+        namesake = self.issue("Abebe Kebede", issued_date="2019-07-01", certificate_title="BSc Civil Engineering")
+        holder = self.issue("Abebe Kebede", issued_date="2023-07-15", certificate_title="BSc Computer Science")
+        scored = search_by_name(
+            {"full_name": "Abebe Kebbede", "issued_date": "15/07/2023", "certificate_title": "BSc Computer Science"}
+        )
+        self.assertEqual([candidate.record for candidate in scored], [holder, namesake])
+        self.assertEqual((scored[0].name_score, scored[0].date_score, scored[0].title_score), (100, 100, 100))
+        self.assertEqual(scored[1].date_score, 0)
+        self.assertLess(scored[1].score, 85)
+        # Missing fields leave the score to the name alone.
+        self.assertEqual(search_by_name({"full_name": "Abebe Kebede"})[0].score, 100)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CredentialHashCacheTests(TestCase):
+    def setUp(self):
+        self.issuer = Institution.objects.create(name="Addis Ababa University", status="APPROVED")
+        reset_cache()
+        self.addCleanup(reset_cache)
+
+    def issue(self, serial):
+        return CredentialRecord.objects.create(issuer=self.issuer, credential_data={"serial_number": serial})
+
+    def test_lru_with_negative_entries(self):
+        clock = FakeClock()
+        cache = CredentialHashCache(max_entries=2, ttl=60, negative_ttl=5, clock=clock)
+        first, second, third = self.issue("S-1"), self.issue("S-2"), self.issue("S-3")
+        self.assertEqual(cache.get(first.credential_hash), first)
+        self.assertIsNone(cache.get("0" * 64))
+        with self.assertNumQueries(0):
+            self.assertEqual(cache.get(first.credential_hash).id, first.id)
+            self.assertIsNone(cache.get("0" * 64))
+        clock.now = 6  # The miss expires long before the record.
+        with self.assertNumQueries(0):
+            cache.get(first.credential_hash)
+        cache.get("0" * 64)
+        cache.get(second.credential_hash)  # Evicts the miss, now least recently used.
+        cache.get(third.credential_hash)  # Evicts the first record.
+        stats = cache.snapshot()
+        self.assertEqual(
+            {key: stats[key] for key in ("size", "hits", "negative_hits", "misses", "evictions", "expirations")},
+            {"size": 2, "hits": 2, "negative_hits": 1, "misses": 5, "evictions": 2, "expirations": 1},
+        )
+
+    def test_revocation_and_deletion_invalidate(self):
+        record = self.issue("S-1")
+        record_by_hash(record.credential_hash)
+        with self.assertNumQueries(0):
+            self.assertEqual(record_by_hash(record.credential_hash).status, "ACTIVE")
+        record.status = "REVOKED"
+        record.save()
+        self.assertEqual(record_by_hash(record.credential_hash).status, "REVOKED")
+
+        missing = record_by_hash(CredentialRecord(credential_data={"serial_number": "S-2"})._generate_hash())
+        self.assertIsNone(missing)
+        reissued = self.issue("S-2")  # A cached miss must not hide a new record.
+        self.assertEqual(record_by_hash(reissued.credential_hash), reissued)
+
+        record.delete()
+        self.assertIsNone(record_by_hash(record.credential_hash))
+
+    @override_settings(
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+            "credentials": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "credentials"},
+        }
+    )
+    def test_shared_backend_invalidates_other_processes(self):
+        record = self.issue("S-1")
+        # Two caches standing in for two processes on one box.
+        web, worker = CredentialHashCache(backend="credentials"), CredentialHashCache(backend="credentials")
+        web.get(record.credential_hash)
+        with self.assertNumQueries(0):
+            self.assertEqual(worker.get(record.credential_hash), record)
+        self.assertEqual(worker.snapshot()["backend_hits"], 1)
+
+        web.invalidate(record.credential_hash)
+        with self.assertNumQueries(1):
+            worker.get(record.credential_hash)
+
+    def test_without_a_backend_other_processes_are_short_lived(self):
+        clock = FakeClock()
+        record = self.issue("S-1")
+        # A worker process: changes made elsewhere never reach its cache.
+        worker = CredentialHashCache(clock=clock)
+        self.assertEqual(worker.ttl, LOCAL_TTL)
+        worker.get(record.credential_hash)
+        CredentialRecord.objects.filter(pk=record.pk).delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(worker.get(record.credential_hash), record)
+        clock.now = LOCAL_TTL + 1
+        self.assertIsNone(worker.get(record.credential_hash))
+
+    def test_long_ttl_without_a_backend_fails_the_system_check(self):
+        self.assertEqual(check_cache_options(None), [])
+        with override_settings(WALLET_CREDENTIAL_CACHE={"ttl": 300}):
+            self.assertEqual([error.id for error in check_cache_options(None)], ["institutions.E001"])
+            with override_settings(WALLET_ASYNC_VERIFICATION=False):
+                self.assertEqual(check_cache_options(None), [])
+
+
+class CredentialFilterTests(TestCase):
+    def setUp(self):
+        self.issuer = Institution.objects.create(name="Addis Ababa University", status="APPROVED")
+
+    def issue(self, serial):
+        return CredentialRecord.objects.create(issuer=self.issuer, credential_data={"serial_number": serial})
+
+    def test_false_positive_rate_is_near_target(self):
+        bloom = BloomFilter(10000, 0.01)
+        for index in range(10000):
+            bloom.add(f"present-{index}")
+        self.assertTrue(all(f"present-{index}" in bloom for index in range(10000)))
+        false_positives = sum(f"absent-{index}" in bloom for index in range(20000))
+        self.assertLess(false_positives / 20000, 0.02)
+        self.assertAlmostEqual(bloom.estimated_error_rate(), 0.01, delta=0.002)
+        self.assertEqual(bloom.size_bytes, 11982)  # About 1.2 bytes per key at 1%.
+
+    def test_no_false_negatives_for_records_issued_later(self):
+        first = self.issue("AAU-1")
+        credential_filter = CredentialFilter.build(refresh_interval=0)
+        self.assertTrue(credential_filter.might_have_hash(first.credential_hash))
+        self.assertTrue(credential_filter.might_have_serial("AAU1"))
+        self.assertFalse(credential_filter.might_have_serial("AAU2"))
+
+        # Created behind the filter's back, as by another process.
+        CredentialRecord.objects.bulk_create(
+            [CredentialRecord(issuer=self.issuer, credential_data={"serial_number": "AAU-2"}, credential_hash="f" * 64)]
+        )
+        call_command("backfill_credential_lookup", stdout=StringIO())
+        self.assertTrue(credential_filter.might_have_hash("f" * 64))
+        self.assertTrue(credential_filter.might_have_serial("AAU2"))
+        self.assertFalse(credential_filter.might_have_hash("0" * 64))
+
+    def test_no_false_negatives_for_records_changed_below_the_watermark(self):
+        # Written without their lookup rows, as by bulk_create before a backfill.
+        records = CredentialRecord.objects.bulk_create(
+            [
+                CredentialRecord(
+                    issuer=self.issuer, credential_data={"serial_number": f"S-{index}"}, credential_hash=f"{index:064x}"
+                )
+                for index in range(150)
+            ]
+        )
+        self.issue("AAU-1")
+        credential_filter = CredentialFilter.build(refresh_interval=0)
+        self.assertFalse(credential_filter.might_have_serial("S5"))
+
+        # Edited more than 100 ids below the watermark by another process (the admin).
+        edited = CredentialRecord.objects.get(id=records[0].id)
+        edited.credential_data = {"serial_number": "AAU-9"}
+        edited.save()
+        self.assertTrue(credential_filter.might_have_hash(edited.credential_hash))
+        self.assertTrue(credential_filter.might_have_serial("AAU9"))
+
+        call_command("backfill_credential_lookup", stdout=StringIO())
+        self.assertTrue(credential_filter.might_have_serial("S5"))
+
+    def test_file_round_trip(self):
+        self.issue("AAU-1")
+        path = os.path.join(tempfile.mkdtemp(), "credentials.bloom")
+        self.addCleanup(os.remove, path)
+        out = StringIO()
+        call_command("build_credential_filter", "--path", path, "--error-rate", "0.001", stdout=out)
+        self.assertIn("false-positive rate", out.getvalue())
+
+        later = self.issue("AAU-2")
+        loaded = CredentialFilter.load(path, refresh_interval=60)
+        self.assertEqual(loaded.bloom.error_rate, 0.001)
+        self.assertTrue(loaded.might_have_serial("AAU1"))
+        self.assertTrue(loaded.might_have_hash(later.credential_hash))  # Caught up on load.
+        self.assertFalse(loaded.might_have_serial("AAU3"))
+
+
+class BulkIssuanceTests(TestCase):
+    def setUp(self):
+        self.issuer = Institution.objects.create(name="Addis Ababa University", status="APPROVED")
+        _, key = InstitutionAPIKey.objects.create_key(name="registrar", institution=self.issuer)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Api-Key {key}")
+        reset_cache()
+        self.addCleanup(reset_cache)
+
+    def post(self, body, content_type="application/json"):
+        return self.client.generic("POST", reverse("credential-issue-bulk"), body, content_type=content_type)
+
+    def test_json_array_with_duplicates_and_invalid_rows(self):
+        existing = CredentialRecord.objects.create(issuer=self.issuer, credential_data={"serial_number": "S-0"})
+        new = {"full_name": "Abebe Kebede", "serial_number": "AAU-1"}
+        # Cached as missing before it is issued.
+        self.assertIsNone(record_by_hash(CredentialRecord.canonical_hash(new)))
+
+        rows = [{"credential_data": new}, {"credential_data": dict(new)}, {"credential_data": existing.credential_data}]
+        rows += [{"credential_data": []}, "not a row"]
+        response = self.post(json.dumps(rows))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["created"], response.data["duplicates"], response.data["invalid"]), (1, 2, 2))
+        results = response.data["results"]
+        self.assertEqual([result["status"] for result in results], [CREATED, DUPLICATE, DUPLICATE, INVALID, INVALID])
+        self.assertEqual(results[1]["duplicate_of_row"], 0)
+        self.assertEqual(results[2]["id"], existing.id)
+
+        # Written as save() would have written it, and no longer cached as missing.
+        record = CredentialRecord.objects.get(id=results[0]["id"])
+        self.assertEqual(record.credential_hash, results[0]["credential_hash"])
+        self.assertEqual(record.issuer, self.issuer)
+        self.assertEqual(record.lookup.serial, "AAU1")
+        self.assertEqual(sorted(record.name_keys.values_list("key", flat=True)), name_keys("abebe kebede"))
+        self.assertEqual(record.name_serial_digest, subset_digests(new)["name_serial_digest"])
+        self.assertEqual(record_by_hash(record.credential_hash), record)
+
+    @override_settings(WALLET_BULK_ISSUE_CHUNK_SIZE=2)
+    def test_ndjson_in_chunks(self):
+        lines = [json.dumps({"credential_data": {"serial_number": f"S-{index}"}}) for index in range(5)]
+        lines.insert(2, "{not json")
+        response = self.post("\n".join(lines) + "\n\n", content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result["status"] for result in response.data["results"]], [CREATED] * 2 + [INVALID] + [CREATED] * 3)
+        self.assertEqual(CredentialRecord.objects.count(), 5)
+        self.assertEqual(CredentialLookup.objects.count(), 5)
+
+    @override_settings(WALLET_BULK_ISSUE_MAX_ROWS=1)
+    def test_rejects_unreadable_and_oversized_bodies(self):
+        self.assertEqual(self.post("{").status_code, 400)
+        self.assertEqual(self.post(json.dumps({"credential_data": {}})).status_code, 400)
+        self.assertEqual(self.post(json.dumps([{"credential_data": {"a": 1}}] * 2)).status_code, 413)
+        self.assertFalse(CredentialRecord.objects.exists())
+
+
+class IngestionTests(TestCase):
+    CSV = (
+        "\ufefffull_name,serial_number,certificate_title\n"
+        "Abebe Kebede,AAU-1,BSc\n"
+        '"Tigist\nHaile",AAU-2,BSc\n'  # A quoted newline: one record over two lines.
+        "Abebe Kebede,AAU-1,BSc\n"
+        "too,few\n"
+        "\n"
+        "Sara Tesfaye,AAU-3,\n"
+    )
+
+    def setUp(self):
+        self.issuer = Institution.objects.create(name="Addis Ababa University", status="APPROVED")
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=self.directory))
+        reset_cache()
+        self.addCleanup(reset_cache)
+
+    def export(self, text, name="export.csv"):
+        path = os.path.join(self.directory, name)
+        with open(path, "w", encoding="utf-8", newline="") as handle:
+            handle.write(text)
+        return path
+
+    def ingest(self, *args):
+        call_command("ingest_credentials", *args, stdout=StringIO())
+
+    def test_streams_a_csv_file_in_chunks(self):
+        self.ingest(self.export(self.CSV), "--institution", self.issuer.name, "--chunk-size", "2")
+        job = IngestionJob.objects.get()
+        self.assertEqual(job.status, IngestionJob.DONE)
+        self.assertEqual((job.byte_offset, job.progress), (len(self.CSV.encode("utf-8")), 1.0))
+        self.assertEqual((job.rows_read, job.created_count, job.duplicate_count, job.invalid_count), (5, 3, 1, 1))
+        self.assertEqual(job.row_errors, [{"row": 4, "error": "Expected 3 columns, found 2."}])
+        self.assertEqual(job.csv_header, ["full_name", "serial_number", "certificate_title"])
+        self.assertEqual(
+            sorted(record.credential_data["full_name"] for record in CredentialRecord.objects.all()),
+            ["Abebe Kebede", "Sara Tesfaye", "Tigist\nHaile"],
+        )
+        # Empty cells are left out; index rows are written as save() writes them.
+        sara = CredentialRecord.objects.get(lookup__serial="AAU3")
+        self.assertEqual(sara.credential_data, {"full_name": "Sara Tesfaye", "serial_number": "AAU-3"})
+
+    def test_resumes_from_the_checkpoint_after_a_crash(self):
+        lines = [json.dumps({"credential_data": {"serial_number": f"S-{index}"}}) for index in range(7)]
+        path = self.export("\n".join(lines) + "\n", name="export.ndjson")
+        job = IngestionJob.objects.create(
+            issuer=self.issuer, format=IngestionJob.NDJSON, local_path=path, size=os.path.getsize(path)
+        )
+
+        def crash_after_first_chunk(job):
+            raise KeyboardInterrupt
+
+        self.assertTrue(claim_job(job, "worker-1"))
+        with self.assertRaises(KeyboardInterrupt):
+            run_ingestion(job, chunk_size=3, on_chunk=crash_after_first_chunk)
+        job.refresh_from_db()
+        # The first chunk is committed with its checkpoint; the job still looks RUNNING.
+        self.assertEqual((job.status, job.rows_read, CredentialRecord.objects.count()), (IngestionJob.RUNNING, 3, 3))
+        self.assertEqual(job.byte_offset, len("\n".join(lines[:3])) + 1)
+
+        # Not taken over while its lease runs; then resumed by another worker.
+        self.assertFalse(claim_job(job, "worker-2"))
+        IngestionJob.objects.filter(pk=job.pk).update(claimed_at=timezone.now() - timedelta(hours=1))
+        self.ingest("--queued", "--chunk-size", "3", "--name", "worker-2")
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.claimed_by, job.attempts), (IngestionJob.DONE, "worker-2", 2))
+        self.assertEqual((job.rows_read, job.created_count, job.duplicate_count), (7, 7, 0))
+        self.assertEqual(CredentialRecord.objects.count(), 7)
+
+    def test_upload_then_poll_status(self):
+        _, key = InstitutionAPIKey.objects.create_key(name="registrar", institution=self.issuer)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Api-Key {key}")
+        body = "".join(json.dumps({"credential_data": {"serial_number": f"S-{index}"}}) + "\n" for index in range(3))
+        response = client.post(
+            reverse("credential-ingestion"),
+            {"file": SimpleUploadedFile("graduates.ndjson", body.encode("utf-8"))},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, 202)
+        status_url = response["Location"]
+        self.assertEqual(client.get(status_url).data["status"], IngestionJob.QUEUED)
+
+        self.ingest("--queued")
+        report = client.get(status_url).data
+        self.assertEqual((report["status"], report["progress"], report["created_count"]), (IngestionJob.DONE, 1.0, 3))
+
+        # Other institutions cannot see the job.
+        other = Institution.objects.create(name="Jimma University", status="APPROVED")
+        _, other_key = InstitutionAPIKey.objects.create_key(name="registrar", institution=other)
+        client.credentials(HTTP_AUTHORIZATION=f"Api-Key {other_key}")
+        self.assertEqual(client.get(status_url).status_code, 404)
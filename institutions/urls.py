@@ -2,6 +2,9 @@ from django.urls import path
 from .views import (
     InstitutionRegistrationView,
     CredentialIssuanceView,
+    BulkCredentialIssuanceView,
+    CredentialIngestionView,
+    CredentialIngestionStatusView,
     InstitutionCredentialListView,
 )
 
@@ -13,6 +16,15 @@ urlpatterns = [
     ),
     # Secure endpoint for approved institutions to issue new credentials.
     path("issue/", CredentialIssuanceView.as_view(), name="credential-issue"),
+    # Secure endpoint for issuing many credentials at once (JSON array or NDJSON).
+    path("issue/bulk/", BulkCredentialIssuanceView.as_view(), name="credential-issue-bulk"),
+    # Secure endpoints for uploading a large export file and polling its ingestion.
+    path("ingest/", CredentialIngestionView.as_view(), name="credential-ingestion"),
+    path(
+        "ingest/<uuid:job_id>/",
+        CredentialIngestionStatusView.as_view(),
+        name="credential-ingestion-job",
+    ),
     # Secure endpoint for an institution to view their issued credentials.
     path(
         "credentials/",
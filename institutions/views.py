@@ -1,13 +1,28 @@
-from rest_framework import generics, permissions
+from django.conf import settings
+from django.urls import reverse
+from rest_framework import generics, permissions, status
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_api_key.permissions import HasAPIKey
-from .models import CredentialRecord, Institution, InstitutionAPIKey
+from .ingestion import create_job
+from .issuance import DEFAULT_CHUNK_SIZE, issue_bulk, parse_rows
+from .models import CredentialRecord, IngestionJob, Institution, InstitutionAPIKey
+from .permissions import HasInstitutionAPIKey
 from .serializers import (
     CredentialRecordSerializer,
+    IngestionJobSerializer,
     InstitutionRegistrationSerializer,
 )
 
+# Content types read as one JSON row per line.
+NDJSON_CONTENT_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+
+
+def requesting_institution(request) -> Institution:
+    """The institution whose API key authenticated the request."""
+    key = request.META["HTTP_AUTHORIZATION"].split()[1]
+    return InstitutionAPIKey.objects.get_from_key(key).institution
+
 
 class InstitutionRegistrationView(generics.CreateAPIView):
     """
@@ -28,15 +43,112 @@ class CredentialIssuanceView(generics.CreateAPIView):
 
     queryset = CredentialRecord.objects.all()
     serializer_class = CredentialRecordSerializer
-    permission_classes = [HasAPIKey]  # Enforce API Key authentication.
+    permission_classes = [HasInstitutionAPIKey]  # Enforce API Key authentication.
 
     def perform_create(self, serializer):
-        # Identify the institution from the provided API key.
-        key = self.request.META["HTTP_AUTHORIZATION"].split()[1]
-        api_key_object = InstitutionAPIKey.objects.get_from_key(key)
-        requesting_institution = api_key_object.institution
-        # Save the new credential, linking it to the correct institution.
-        serializer.save(issuer=requesting_institution)
+        # Save the new credential, linking it to the institution of the API key.
+        serializer.save(issuer=requesting_institution(self.request))
+
+
+class BulkCredentialIssuanceView(APIView):
+    """
+    API endpoint for an approved institution to issue many credentials in one
+    request, e.g. a graduate archive. The body is a JSON array, or NDJSON
+    (Content-Type application/x-ndjson), of rows shaped like the body of the
+    single issuance endpoint: {"credential_data": {...}}.
+
+    Rows are validated and hashed, duplicates (of an earlier row or of an
+    issued record) are skipped, and the rest are written in chunked
+    transactions (see institutions.issuance). The response has one result
+    per row, in order, and the throughput in records per second.
+    Requires a valid Institution API Key.
+    """
+
+    permission_classes = [HasInstitutionAPIKey]
+
+    def post(self, request, *args, **kwargs):
+        issuer = requesting_institution(request)
+        max_bytes = getattr(settings, "WALLET_BULK_ISSUE_MAX_BYTES", 64 * 1024 * 1024)
+        max_rows = getattr(settings, "WALLET_BULK_ISSUE_MAX_ROWS", 100_000)
+
+        # Read the stream ourselves: request.body is capped far lower.
+        body = request.stream.read(max_bytes + 1) if request.stream is not None else b""
+        if len(body) > max_bytes:
+            return Response(
+                {"error": f"The body is larger than {max_bytes} bytes; split the upload."},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+        content_type = (request.content_type or "").split(";")[0].strip().lower()
+        try:
+            rows = parse_rows(body, ndjson=content_type in NDJSON_CONTENT_TYPES)
+        except ValueError as e:
+            return Response({"error": f"Could not read the rows: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > max_rows:
+            return Response(
+                {"error": f"At most {max_rows} rows per request; split the upload."},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+
+        result = issue_bulk(
+            issuer, rows, getattr(settings, "WALLET_BULK_ISSUE_CHUNK_SIZE", DEFAULT_CHUNK_SIZE)
+        )
+        return Response(
+            {
+                "created": result.created,
+                "duplicates": result.duplicates,
+                "invalid": result.invalid,
+                "seconds": round(result.seconds, 3),
+                "records_per_second": round(result.records_per_second, 1),
+                "results": result.rows,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class CredentialIngestionView(APIView):
+    """
+    API endpoint for an approved institution to upload a credential export
+    file (CSV with a header row, or NDJSON of bulk issuance rows) of any size.
+    The file is stored and queued: the response is 202 Accepted with a job id,
+    and `ingest_credentials --queued` loads it in resumable chunks. Poll the
+    job's status URL for progress. Requires a valid Institution API Key.
+    """
+
+    permission_classes = [HasInstitutionAPIKey]
+    # Uploads stream to a temporary file, not into memory.
+    parser_classes = [MultiPartParser]
+
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"error": "Upload the export as 'file'."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            job = create_job(requesting_institution(request), upload=upload, format=request.data.get("format", ""))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        status_url = reverse("credential-ingestion-job", kwargs={"job_id": job.id})
+        return Response(
+            {"job_id": str(job.id), "status": job.status, "status_url": request.build_absolute_uri(status_url)},
+            status=status.HTTP_202_ACCEPTED,
+            headers={"Location": status_url},
+        )
+
+
+class CredentialIngestionStatusView(APIView):
+    """
+    Reports the progress of an ingestion job: bytes committed, rows created,
+    duplicated and invalid, and the first invalid rows. Only the institution
+    that uploaded the file can see it.
+    """
+
+    permission_classes = [HasInstitutionAPIKey]
+
+    def get(self, request, job_id, *args, **kwargs):
+        try:
+            job = IngestionJob.objects.get(id=job_id, issuer=requesting_institution(request))
+        except IngestionJob.DoesNotExist:
+            return Response({"error": "Ingestion job not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(IngestionJobSerializer(job).data, status=status.HTTP_200_OK)
 
 
 class InstitutionCredentialListView(generics.ListAPIView):
@@ -46,11 +158,8 @@ class InstitutionCredentialListView(generics.ListAPIView):
     """
 
     serializer_class = CredentialRecordSerializer
-    permission_classes = [HasAPIKey]
+    permission_classes = [HasInstitutionAPIKey]
 
     def get_queryset(self):
-        # Identify the institution from the API key.
-        key = self.request.META["HTTP_AUTHORIZATION"].split()[1]
-        api_key_object = InstitutionAPIKey.objects.get_from_key(key)
-        # Return only the credentials issued by that specific institution.
-        return CredentialRecord.objects.filter(issuer=api_key_object.institution)
+        # Return only the credentials issued by the institution of the API key.
+        return CredentialRecord.objects.filter(issuer=requesting_institution(self.request))
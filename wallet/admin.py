@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Document
+from .models import Document, OCRCacheEntry, VerificationJob
 
 
 @admin.register(Document)
@@ -8,25 +8,70 @@ class DocumentAdmin(admin.ModelAdmin):
     Custom admin view for the Document model, which represents a user's upload attempt.
     """
 
-    list_display = ("id", "user", "verified_credential", "uploaded_at")
-    list_filter = ("user",)
-    search_fields = ("user__email",)
+    list_display = ("id", "user", "verified_credential", "ocr_tier", "uploaded_at")
+    list_filter = ("user", "ocr_tier")
+    search_fields = ("user__email", "content_hash")
     readonly_fields = (
         "user",
         "document_file",
+        "content_hash",
+        "content_type",
         "extracted_text",
         "uploaded_at",
         "verified_credential",
+        "parsed_fields",
+        "document_profile",
+        "parser_version",
+        "text_digest",
+        "ocr_tier",
+        "ocr_passes",
     )
 
     fieldsets = (
-        ("Document Info", {"fields": ("user", "document_file")}),
+        ("Document Info", {"fields": ("user", "document_file", "content_hash", "content_type")}),
         (
             "Verification Status",
-            {"fields": ("verified_credential", "extracted_text")},
+            {"fields": ("verified_credential", "extracted_text", "ocr_tier", "ocr_passes")},
+        ),
+        (
+            "Parse Result",
+            {"fields": ("parsed_fields", "document_profile", "parser_version", "text_digest")},
         ),
         ("Timestamps", {"fields": ("uploaded_at",)}),
     )
 
 
+@admin.register(VerificationJob)
+class VerificationJobAdmin(admin.ModelAdmin):
+    """
+    Queued and finished verification jobs, for watching the worker queue.
+    """
+
+    list_display = ("id", "document", "status", "attempts", "claimed_by", "created_at", "finished_at")
+    list_filter = ("status",)
+    readonly_fields = (
+        "document",
+        "result",
+        "result_code",
+        "error",
+        "attempts",
+        "claimed_by",
+        "claimed_at",
+        "created_at",
+        "updated_at",
+        "finished_at",
+    )
+
+
+@admin.register(OCRCacheEntry)
+class OCRCacheEntryAdmin(admin.ModelAdmin):
+    """
+    Cached OCR output by upload content hash.
+    """
+
+    list_display = ("content_hash", "engine_version", "status", "hit_count", "created_at", "last_used_at")
+    list_filter = ("status", "engine_version")
+    search_fields = ("content_hash",)
+
+
 # The VerifiableCredential model has been removed and replaced by CredentialRecord.
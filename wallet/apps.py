@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class WalletConfig(AppConfig):
@@ -7,3 +8,10 @@ class WalletConfig(AppConfig):
 
     def ready(self):
         import wallet.signals
+
+        # Opt-in per-pattern counters for the credential parser; read them
+        # back with wallet.parser.parser_stats().
+        if getattr(settings, "WALLET_PARSER_INSTRUMENTATION", False):
+            from wallet.parser import enable_instrumentation
+
+            enable_instrumentation()
@@ -0,0 +1,6 @@
+"""
+Local benchmark helpers for the wallet app.
+
+Nothing in here is imported by the request path; the modules are driven by
+the `benchmark_*` management commands.
+"""
@@ -0,0 +1,63 @@
+"""
+Throughput of credential issuance, in records per second: bulk issuance
+(institutions.issuance) against one CredentialRecord.save per record, as the
+single issuance endpoint does. Rows are synthetic register records (see
+wallet.benchmarks.name_matching), with a share repeated to exercise
+duplicate detection. Everything is written inside a transaction that is
+rolled back at the end.
+"""
+
+import random
+import time
+from typing import NamedTuple
+
+from django.db import transaction
+
+from institutions.issuance import DEFAULT_CHUNK_SIZE, issue_bulk
+from institutions.models import CredentialRecord, Institution
+
+from .name_matching import credential_data
+
+
+class IssuanceReport(NamedTuple):
+    rows: int
+    created: int
+    duplicates: int
+    chunk_size: int
+    bulk_records_per_second: float
+    # Measured on `save_sample` records, not all rows.
+    save_sample: int
+    save_records_per_second: float
+
+    @property
+    def speedup(self) -> float:
+        return self.bulk_records_per_second / self.save_records_per_second if self.save_records_per_second else 0.0
+
+
+def run_benchmark(
+    rows: int = 10000, chunk_size: int = DEFAULT_CHUNK_SIZE, save_sample: int = 500, duplicate_share: float = 0.02, seed: int = 0
+) -> IssuanceReport:
+    rng = random.Random(seed)
+    data = [credential_data(rng, index) for index in range(rows)]
+    body = [{"credential_data": row} for row in data]
+    body += [rng.choice(body) for _ in range(int(rows * duplicate_share))]
+    with transaction.atomic():
+        issuer, _ = Institution.objects.get_or_create(name="Benchmark Registry", defaults={"status": "APPROVED"})
+        result = issue_bulk(issuer, body, chunk_size)
+
+        sample = [credential_data(rng, rows + index) for index in range(save_sample)]
+        started = time.perf_counter()
+        for row in sample:
+            CredentialRecord.objects.create(issuer=issuer, credential_data=row)
+        save_seconds = time.perf_counter() - started
+        transaction.set_rollback(True)
+
+    return IssuanceReport(
+        rows=len(body),
+        created=result.created,
+        duplicates=result.duplicates,
+        chunk_size=chunk_size,
+        bulk_records_per_second=result.records_per_second,
+        save_sample=save_sample,
+        save_records_per_second=save_sample / save_seconds if save_seconds else 0.0,
+    )
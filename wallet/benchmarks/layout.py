@@ -0,0 +1,137 @@
+"""
+Regex path vs layout path: end-to-end parse latency, hit rate and agreement.
+
+Synthetic documents are turned into Tesseract-shaped word boxes so both paths
+can be compared without an OCR engine; `ocr_word_data` does the same for real
+images when Tesseract is installed.
+"""
+
+import random
+import time
+from typing import Dict, List, NamedTuple, Sequence
+
+from .. import parser
+from ..layout import OCRLayout, parse_credential_from_layout
+from .corpus import CorpusDocument
+
+CHAR_WIDTH = 9
+LINE_HEIGHT = 18
+TITLE_HEIGHT = 30
+WORD_GAP = 6
+COLUMN_GAP = 120
+
+
+class PathResult(NamedTuple):
+    path: str
+    docs_per_second: float
+    mean_ms: float
+    hit_rate: float
+
+
+class LayoutComparison(NamedTuple):
+    regex: PathResult
+    layout: PathResult
+    # Share of documents on which both paths return the same value, per field.
+    field_agreement: Dict[str, float]
+    hit_rate_by_kind: Dict[str, Dict[str, float]]
+
+
+FIELDS = ("full_name", "serial_number", "issued_date", "certificate_title")
+
+
+WORD_DATA_KEYS = ("page_num", "block_num", "par_num", "line_num", "left", "top", "width", "height", "conf", "text")
+
+
+def synthetic_word_data(text: str, seed: int = 0, gap_share: float = 0.3) -> Dict[str, list]:
+    """
+    Tesseract `image_to_data` DICT output for `text`, one OCR line per text
+    line. About `gap_share` of the "Label: value" lines are laid out as two
+    columns without the colon, like printed forms.
+    """
+    rng = random.Random(seed)
+    data: Dict[str, list] = {key: [] for key in WORD_DATA_KEYS}
+    top = 20
+    for line_num, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        height = TITLE_HEIGHT if line.isupper() or line.lower().startswith(("certificate", "ethiopian")) else LINE_HEIGHT
+        label, colon, value = line.partition(":")
+        if colon and value.strip() and rng.random() < gap_share:
+            chunks = [(label.split(), 40), (value.split(), 40 + COLUMN_GAP + len(label) * CHAR_WIDTH)]
+        else:
+            chunks = [(line.split(), 40)]
+        for words, left in chunks:
+            for word in words:
+                width = len(word) * CHAR_WIDTH
+                row = (1, 1, 1, line_num, left, top, width, height, 90.0, word)
+                for key, cell in zip(WORD_DATA_KEYS, row):
+                    data[key].append(cell)
+                left += width + WORD_GAP
+        top += height + LINE_HEIGHT // 2
+    return data
+
+
+def ocr_word_data(path: str) -> Dict[str, list]:
+    """Real `image_to_data` output for an image file; needs Tesseract installed."""
+    import pytesseract
+    from PIL import Image
+
+    return pytesseract.image_to_data(Image.open(path), output_type=pytesseract.Output.DICT)
+
+
+def _time_path(name: str, func, inputs: Sequence, repeat: int):
+    best, results = float("inf"), []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [func(item) for item in inputs]
+        best = min(best, time.perf_counter() - start)
+    hits = sum(1 for result in results if result)
+    count = len(inputs) or 1
+    return (
+        PathResult(name, len(inputs) / best if best else 0.0, best / count * 1e3, hits / count),
+        results,
+    )
+
+
+def compare_paths(word_data: Sequence[Dict[str, list]], kinds: Sequence[str], repeat: int = 3) -> LayoutComparison:
+    """
+    Time both paths from the same word boxes. The regex path pays for
+    flattening the boxes into text, the layout path for building the index,
+    so the comparison is end to end from OCR output to fields.
+    """
+    regex, regex_fields = _time_path(
+        "regex",
+        lambda data: parser.parse_credential_from_text(OCRLayout.from_data(data).text),
+        word_data,
+        repeat,
+    )
+    layout, layout_fields = _time_path(
+        "layout",
+        lambda data: parse_credential_from_layout(OCRLayout.from_data(data)),
+        word_data,
+        repeat,
+    )
+    count = len(word_data) or 1
+    field_agreement = {
+        field: sum(
+            (left or {}).get(field) == (right or {}).get(field)
+            for left, right in zip(regex_fields, layout_fields)
+        )
+        / count
+        for field in FIELDS
+    }
+    hits: Dict[str, Dict[str, List[bool]]] = {}
+    for kind, left, right in zip(kinds, regex_fields, layout_fields):
+        by_path = hits.setdefault(kind, {"regex": [], "layout": []})
+        by_path["regex"].append(bool(left))
+        by_path["layout"].append(bool(right))
+    hit_rate_by_kind = {
+        kind: {path: sum(rows) / len(rows) for path, rows in by_path.items()}
+        for kind, by_path in sorted(hits.items())
+    }
+    return LayoutComparison(regex, layout, field_agreement, hit_rate_by_kind)
+
+
+def compare_corpus(corpus: Sequence[CorpusDocument], repeat: int = 3, seed: int = 0) -> LayoutComparison:
+    word_data = [synthetic_word_data(doc.text, seed=seed + index) for index, doc in enumerate(corpus)]
+    return compare_paths(word_data, [doc.kind for doc in corpus], repeat=repeat)
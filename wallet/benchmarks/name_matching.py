@@ -0,0 +1,191 @@
+"""
+Recall, precision and latency of the holder-name search
+(institutions.matching) on a synthetic register of credential records.
+
+Records get Ethiopian three-part names. Each query is a record as the OCR
+might read it: transliteration variants of the name (Kebbede, Tesfay,
+Xiferaw), an OCR confusion or two, sometimes the grandfather's name missing,
+and the serial left out so that only the name search can find it. Impostor
+queries use name combinations that are not in the register, and must not be
+accepted. The register is written inside a transaction that is rolled back
+at the end.
+"""
+
+import random
+import time
+from datetime import date, timedelta
+from typing import List, NamedTuple, Sequence
+
+from django.db import transaction
+
+from institutions.lookup import normalize_name
+from institutions.matching import name_candidates, score_candidates
+from institutions.models import CredentialLookup, CredentialNameKey, CredentialRecord, Institution
+
+from ..verification import hash_parsed_fields, name_search_accepts
+from .corpus import FATHER_NAMES, FIRST_NAMES, OCR_CONFUSIONS, PROGRAMS
+
+GIVEN_NAMES = FIRST_NAMES + [
+    "Abel", "Alemayehu", "Amanuel", "Aster", "Bethlehem", "Biniam", "Birtukan", "Chaltu",
+    "Daniel", "Ephrem", "Eskinder", "Fasika", "Genet", "Hiwot", "Kidist", "Lemlem",
+    "Mahlet", "Mulu", "Natnael", "Rediet", "Ruth", "Sara", "Shewit", "Solomon",
+    "Tewodros", "Tsion", "Wubet", "Yared", "Yohannes", "Zewditu",
+]
+FAMILY_NAMES = FATHER_NAMES + [
+    "Abera", "Asfaw", "Berhane", "Demissie", "Fikre", "Gebremedhin", "Gebreyes", "Hailemariam",
+    "Kebede", "Lemma", "Mekonnen", "Mengistu", "Shiferaw", "Tekle", "Tilahun", "Woldemichael",
+    "Worku", "Yirga", "Zeleke", "Gemechu", "Tsegaye", "Birhanu", "Amare", "Belay",
+]
+
+# Spellings that alternate in transliterated names.
+TRANSLITERATIONS = [
+    ("e", "ie"), ("ye", "y"), ("ay", "ai"), ("sh", "x"), ("ts", "tz"), ("ph", "f"),
+    ("q", "k"), ("o", "e"), ("kk", "k"), ("ss", "s"), ("nn", "n"),
+]
+
+
+class NameMatchingReport(NamedTuple):
+    records: int
+    queries: int
+    k: int
+    # Share of queries whose record is among the k blocked candidates.
+    recall_at_k: float
+    # Share of queries whose record is ranked first by the combined score.
+    precision_at_1: float
+    # Share of queries accepted as a confirmation suggestion, and of those
+    # the share suggesting the right record.
+    accept_rate: float
+    accept_precision: float
+    # Share of impostor queries accepted.
+    false_accept_rate: float
+    mean_candidates: float
+    blocking_p50_ms: float
+    blocking_p95_ms: float
+    scoring_p50_ms: float
+    scoring_p95_ms: float
+
+
+def credential_data(rng: random.Random, index: int) -> dict:
+    name = " ".join([rng.choice(GIVEN_NAMES), rng.choice(FAMILY_NAMES), rng.choice(FAMILY_NAMES)])
+    issued = date(1995, 1, 1) + timedelta(days=rng.randrange(30 * 365))
+    return {
+        "full_name": name,
+        "credential_id": f"REG-{index:08d}",
+        "issued_date": issued.isoformat(),
+        "certificate_title": f"Bachelor of Science in {rng.choice(PROGRAMS)}",
+    }
+
+
+def transliterate(token: str, rng: random.Random) -> str:
+    variants = [(source, target) for source, target in TRANSLITERATIONS if source in token.lower()]
+    variants += [(target, source) for source, target in TRANSLITERATIONS if target in token.lower()]
+    if not variants:
+        return token
+    source, target = rng.choice(variants)
+    lowered = token.lower()
+    at = lowered.rfind(source) if rng.random() < 0.5 else lowered.find(source)
+    return token[:at] + target + token[at + len(source):]
+
+
+def ocr_noise(text: str, rng: random.Random) -> str:
+    confusions = [(source, target) for source, target in OCR_CONFUSIONS.items() if source in text]
+    if not confusions:
+        return text
+    source, target = rng.choice(confusions)
+    return text.replace(source, target, 1)
+
+
+def noisy_query(data: dict, rng: random.Random) -> dict:
+    tokens = data["full_name"].split()
+    tokens = [transliterate(token, rng) if rng.random() < 0.5 else token for token in tokens]
+    if rng.random() < 0.15:
+        tokens = tokens[:2]
+    name = " ".join(tokens)
+    if rng.random() < 0.3:
+        name = ocr_noise(name, rng)
+    issued = date.fromisoformat(data["issued_date"])
+    return {
+        "full_name": name,
+        "issued_date": issued.strftime("%d/%m/%Y"),
+        "certificate_title": data["certificate_title"],
+    }
+
+
+def impostor_query(rng: random.Random, registered: set) -> dict:
+    while True:
+        data = credential_data(rng, 0)
+        if normalize_name(data["full_name"]) not in registered:
+            return noisy_query(data, rng)
+
+
+def seed_register(rows: Sequence[dict], batch_size: int = 5000) -> List[CredentialRecord]:
+    """Write records with their lookup rows and name keys, in bulk."""
+    issuer, _ = Institution.objects.get_or_create(name="Benchmark Registry", defaults={"status": "APPROVED"})
+    records = []
+    for start in range(0, len(rows), batch_size):
+        batch = CredentialRecord.objects.bulk_create(
+            [
+                CredentialRecord(issuer=issuer, credential_data=data, credential_hash=hash_parsed_fields(data))
+                for data in rows[start:start + batch_size]
+            ]
+        )
+        CredentialLookup.objects.bulk_create([CredentialLookup.build(record) for record in batch])
+        CredentialNameKey.objects.bulk_create([key for record in batch for key in CredentialNameKey.build(record)])
+        records.extend(batch)
+    return records
+
+
+def percentile(values: Sequence[float], share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))] if ordered else 0.0
+
+
+def run_benchmark(records: int = 10000, queries: int = 500, k: int = 50, seed: int = 0) -> NameMatchingReport:
+    rng = random.Random(seed)
+    with transaction.atomic():
+        register = seed_register([credential_data(rng, index) for index in range(records)])
+        registered = {normalize_name(record.credential_data["full_name"]) for record in register}
+
+        blocking, scoring, candidate_counts = [], [], []
+        in_candidates = ranked_first = accepted = accepted_right = 0
+        for record in rng.sample(register, min(queries, len(register))):
+            query = noisy_query(record.credential_data, rng)
+            started = time.perf_counter()
+            candidates = name_candidates(query["full_name"], k, issued_date=query["issued_date"])
+            blocked = time.perf_counter()
+            scored = score_candidates(query, candidates)
+            blocking.append(blocked - started)
+            scoring.append(time.perf_counter() - blocked)
+            candidate_counts.append(len(candidates))
+
+            in_candidates += record.id in candidates
+            if scored and scored[0].record.id == record.id:
+                ranked_first += 1
+            if scored and name_search_accepts(query, scored[0]):
+                accepted += 1
+                accepted_right += scored[0].record.id == record.id
+
+        impostors = max(1, queries // 5)
+        false_accepts = 0
+        for _ in range(impostors):
+            query = impostor_query(rng, registered)
+            scored = score_candidates(query, name_candidates(query["full_name"], k, issued_date=query["issued_date"]))
+            false_accepts += bool(scored and name_search_accepts(query, scored[0]))
+        transaction.set_rollback(True)
+
+    measured = len(candidate_counts)
+    return NameMatchingReport(
+        records=records,
+        queries=measured,
+        k=k,
+        recall_at_k=in_candidates / measured,
+        precision_at_1=ranked_first / measured,
+        accept_rate=accepted / measured,
+        accept_precision=accepted_right / accepted if accepted else 0.0,
+        false_accept_rate=false_accepts / impostors,
+        mean_candidates=sum(candidate_counts) / measured,
+        blocking_p50_ms=percentile(blocking, 0.5) * 1e3,
+        blocking_p95_ms=percentile(blocking, 0.95) * 1e3,
+        scoring_p50_ms=percentile(scoring, 0.5) * 1e3,
+        scoring_p95_ms=percentile(scoring, 0.95) * 1e3,
+    )
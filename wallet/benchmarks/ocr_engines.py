@@ -0,0 +1,49 @@
+"""
+Per-document OCR latency for the subprocess engine and the warm worker pool.
+"""
+
+import io
+import time
+from typing import List, NamedTuple, Sequence
+
+from PIL import Image
+
+from ..ocr_engines import OCREngine
+from ..preprocessing import preprocess
+
+
+class EngineLatency(NamedTuple):
+    engine: str
+    first_ms: float
+    p50_ms: float
+    p95_ms: float
+    mean_ms: float
+
+
+def _percentile(values: Sequence[float], share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+def prepare_images(images: Sequence[bytes]) -> List[Image.Image]:
+    """Preprocess once up front, so only OCR is timed."""
+    return [preprocess(io.BytesIO(data)).image for data in images]
+
+
+def engine_latency(name: str, engine: OCREngine, images: Sequence[Image.Image]) -> EngineLatency:
+    """
+    OCR every image once, in order. `first_ms` is the first document, which
+    for a fresh pool includes starting the worker and loading the model.
+    """
+    latencies = []
+    for image in images:
+        started = time.perf_counter()
+        engine.image_to_string(image)
+        latencies.append((time.perf_counter() - started) * 1e3)
+    return EngineLatency(
+        name,
+        latencies[0],
+        _percentile(latencies, 0.5),
+        _percentile(latencies, 0.95),
+        sum(latencies) / len(latencies),
+    )
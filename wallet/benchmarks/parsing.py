@@ -0,0 +1,145 @@
+"""
+Throughput, per-pattern worst-case and backtracking-growth measurements for
+`wallet.parser`.
+"""
+
+import math
+import time
+from typing import Callable, Dict, List, NamedTuple, Sequence
+
+from .. import parser
+from .corpus import CorpusDocument, pathological_inputs
+
+EXTRACTORS: Dict[str, Callable] = {
+    "extract_name": parser.extract_name,
+    "extract_date": parser.extract_date,
+    "extract_serial_number": parser.extract_serial_number,
+    "extract_certificate_title": parser.extract_certificate_title,
+    "parse_credential_from_text": parser.parse_credential_from_text,
+}
+
+PATTERN_GROUPS = {
+    "name": parser.NAME_PATTERNS,
+    "date": parser.DATE_PATTERNS,
+    "serial": parser.SERIAL_PATTERNS,
+    "title": parser.TITLE_PATTERNS,
+}
+
+
+class ExtractorThroughput(NamedTuple):
+    extractor: str
+    docs_per_second: float
+    megabytes_per_second: float
+    hit_rate: float
+
+
+class PatternWorstCase(NamedTuple):
+    pattern: str
+    worst_seconds: float
+    mean_seconds: float
+    worst_kind: str
+
+
+class PatternGrowth(NamedTuple):
+    pattern: str
+    seconds_by_size: Dict[int, float]
+    exponent: float
+    worst_input: str
+    superlinear: bool
+
+
+def iter_patterns():
+    """Yield (`field.pattern_name`, FieldPattern) for every extraction pattern."""
+    for field, patterns in PATTERN_GROUPS.items():
+        for pattern in patterns:
+            yield f"{field}.{pattern.name}", pattern
+
+
+def best_of(func: Callable, repeat: int) -> float:
+    """Minimum wall time of `repeat` calls, the least noisy single estimate."""
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def extractor_throughput(corpus: Sequence[CorpusDocument], repeat: int = 3) -> List[ExtractorThroughput]:
+    texts = [parser.normalize_text(doc.text) for doc in corpus]
+    megabytes = sum(len(text.encode("utf-8")) for text in texts) / 1e6
+    rows = []
+    for name, extractor in EXTRACTORS.items():
+        elapsed = best_of(lambda: [extractor(text) for text in texts], repeat)
+        hits = sum(1 for text in texts if extractor(text))
+        rows.append(
+            ExtractorThroughput(
+                name,
+                len(texts) / elapsed,
+                megabytes / elapsed,
+                hits / len(texts) if texts else 0.0,
+            )
+        )
+    return rows
+
+
+def pattern_worst_case(corpus: Sequence[CorpusDocument], repeat: int = 3) -> List[PatternWorstCase]:
+    """Time every pattern against every document, ungated, and keep the slowest."""
+    texts = [(doc.kind, parser.normalize_text(doc.text)) for doc in corpus]
+    rows = []
+    for label, pattern in iter_patterns():
+        search = pattern.regex.search
+        timings = [(best_of(lambda: search(text), repeat), kind) for kind, text in texts]
+        worst, worst_kind = max(timings)
+        rows.append(
+            PatternWorstCase(label, worst, sum(t for t, _ in timings) / len(timings), worst_kind)
+        )
+    return sorted(rows, key=lambda row: row.worst_seconds, reverse=True)
+
+
+def growth_exponent(seconds_by_size: Dict[int, float]) -> float:
+    """Least-squares slope of log(time) against log(size): ~1 linear, ~2 quadratic."""
+    points = [(math.log(size), math.log(max(seconds, 1e-9))) for size, seconds in seconds_by_size.items()]
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    if not spread:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / spread
+
+
+def pattern_growth(
+    sizes: Sequence[int] = (2000, 4000, 8000, 16000, 32000),
+    repeat: int = 3,
+    threshold: float = 1.5,
+    floor_seconds: float = 0.0005,
+) -> List[PatternGrowth]:
+    """
+    Measure how each pattern's search time scales with input length on the
+    pathological inputs, keeping the input family with the steepest growth.
+
+    A pattern is flagged as superlinear when that exponent exceeds `threshold`
+    and its time at the largest size is above `floor_seconds`; below the
+    floor, timer noise dominates and the exponent is meaningless.
+    """
+    inputs = {size: list(pathological_inputs(size)) for size in sizes}
+    families = [doc.kind for doc in inputs[sizes[0]]]
+    largest = max(sizes)
+    rows = []
+    for label, pattern in iter_patterns():
+        search = pattern.regex.search
+        measured = []
+        for index, family in enumerate(families):
+            seconds_by_size = {
+                size: best_of(lambda: search(inputs[size][index].text), repeat) for size in sizes
+            }
+            measured.append((seconds_by_size, growth_exponent(seconds_by_size), family))
+        # Only families slow enough to time reliably compete on exponent.
+        reliable = [row for row in measured if row[0][largest] > floor_seconds]
+        if reliable:
+            seconds_by_size, exponent, family = max(reliable, key=lambda row: row[1])
+        else:
+            seconds_by_size, exponent, family = max(measured, key=lambda row: row[0][largest])
+        superlinear = exponent > threshold and seconds_by_size[largest] > floor_seconds
+        rows.append(PatternGrowth(label, seconds_by_size, exponent, family, superlinear))
+    return sorted(rows, key=lambda row: (row.superlinear, row.exponent), reverse=True)
@@ -0,0 +1,108 @@
+"""
+What each preprocessing step costs and saves: preprocessing time, pixels
+handed to Tesseract, OCR latency and parse success rate, for a ladder of
+configurations that switches the steps on one at a time.
+
+Sample images come from a directory of real scans or are rendered from the
+synthetic corpus as phone-photo-sized JPEGs (colour, high DPI, slightly
+rotated, sometimes with an EXIF orientation tag).
+"""
+
+import io
+import random
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from PIL import Image, ImageDraw, ImageFont
+
+from .. import parser
+from ..preprocessing import STEPS, PreprocessConfig, preprocess
+from .corpus import generate_corpus
+
+EXIF_ORIENTATION = 0x0112
+
+
+def step_ladder() -> List[tuple]:
+    """(label, config) pairs: nothing, then each step switched on in turn."""
+    ladder = [("none", PreprocessConfig.disabled())]
+    enabled = {}
+    for step in STEPS:
+        enabled[step] = True
+        ladder.append((f"+{step}", PreprocessConfig.disabled()._replace(**enabled)))
+    return ladder
+
+
+def render_document(text: str, rng: random.Random, size=(4032, 3024)) -> bytes:
+    """A JPEG that looks to the pipeline like a phone photo of `text`."""
+    image = Image.new("RGB", size, (rng.randint(215, 245), rng.randint(210, 240), rng.randint(200, 235)))
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=size[0] // 45)
+    top = size[1] // 10
+    for line in text.splitlines():
+        draw.text((size[0] // 12, top), line, fill=(30, 30, 40), font=font)
+        top += size[0] // 30
+    image = image.rotate(rng.uniform(-3, 3), resample=Image.Resampling.BICUBIC, fillcolor=(235, 230, 220))
+    exif = Image.Exif()
+    if rng.random() < 0.3:
+        # Stored sideways, with the tag telling viewers to turn it upright.
+        image = image.transpose(Image.Transpose.ROTATE_90)
+        exif[EXIF_ORIENTATION] = 6
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=90, dpi=(600, 600), exif=exif)
+    return buffer.getvalue()
+
+
+def synthetic_images(count: int, seed: int = 0) -> List[tuple]:
+    rng = random.Random(seed)
+    corpus = generate_corpus(count, seed=seed, noise_share=0.0)
+    return [(doc.kind, render_document(doc.text, rng)) for doc in corpus]
+
+
+class StepResult(NamedTuple):
+    label: str
+    preprocess_ms: float
+    step_ms: Dict[str, float]
+    bitmap_megabytes: float
+    ocr_ms: Optional[float]
+    parse_rate: Optional[float]
+
+
+def benchmark_steps(
+    images: Sequence[bytes],
+    ocr: Optional[Callable[[Image.Image], str]] = None,
+    ladder: Optional[List[tuple]] = None,
+) -> List[StepResult]:
+    """
+    Run every configuration of the ladder over `images` (encoded file bytes).
+    With `ocr` (image -> text), OCR latency and the share of documents the
+    parser can read are measured too.
+    """
+    rows = []
+    count = len(images) or 1
+    for label, config in ladder or step_ladder():
+        preprocess_seconds = ocr_seconds = 0.0
+        steps: Dict[str, float] = {}
+        bitmap_bytes = parsed = 0
+        for data in images:
+            started = time.perf_counter()
+            result = preprocess(io.BytesIO(data), config)
+            preprocess_seconds += time.perf_counter() - started
+            for step, seconds in result.timings.items():
+                steps[step] = steps.get(step, 0.0) + seconds
+            bitmap_bytes += result.bitmap_bytes
+            if ocr is not None:
+                started = time.perf_counter()
+                text = ocr(result.image)
+                ocr_seconds += time.perf_counter() - started
+                parsed += parser.parse_credential_from_text(text) is not None
+        rows.append(
+            StepResult(
+                label,
+                preprocess_seconds / count * 1e3,
+                {step: seconds / count * 1e3 for step, seconds in steps.items()},
+                bitmap_bytes / count / 1e6,
+                ocr_seconds / count * 1e3 if ocr is not None else None,
+                parsed / count if ocr is not None else None,
+            )
+        )
+    return rows
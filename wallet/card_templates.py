@@ -0,0 +1,172 @@
+"""
+Region-of-interest OCR for fixed-layout ID cards.
+
+The Ethiopian national ID, driver licence and AAU student ID print every
+field at the same place on the card. Reading the whole card means OCRing
+the photo, hologram and background pattern as well, and then recovering the
+fields with regexes. Instead, each `CardTemplate` lists the card's field
+regions as fractions of its width and height. `read_card`:
+
+1. rejects images that are not card-shaped (ID-1, 85.6 x 54 mm), at no OCR cost;
+2. OCRs the header strip and classifies it with the parser's document
+   profiles to pick the template;
+3. crops the field regions and OCRs them in parallel as single text lines
+   (`--psm 7`), each crop holding its own governor slot;
+4. cleans each value with the layout parser's cleaners and applies the
+   usual required-field contract. The template's title stands in for a
+   missing `certificate_title` only when a region read something besides
+   the name, so a name alone never ends OCR early.
+
+When the card is not recognised or its regions do not give the required
+fields, the caller OCRs the whole page instead. Regions are approximate
+boxes taken from the layout of each card, for a flat scan of the card
+alone; a photo of a card on a desk is not card-shaped and takes the generic
+path. A redesign needs its own template.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple, Optional, Sequence, Tuple
+
+from django.conf import settings
+from PIL import Image
+
+from .layout import clean_field_value
+from .parser import GENERIC_PROFILE, ParseResult, classify_document, finalize_fields
+
+# (left, top, right, bottom) as fractions of the card's width and height.
+Box = Tuple[float, float, float, float]
+
+ID1_ASPECT_RATIO = 85.6 / 54
+# Every supported card names its issuer and type across the top.
+HEADER_BOX: Box = (0.0, 0.0, 1.0, 0.2)
+
+
+class FieldRegion(NamedTuple):
+    field: str
+    box: Box
+    # How the value is labelled in the text we store, so the text parser can
+    # reparse it (see wallet.ocr_cache).
+    label: str
+    config: str = "--psm 7"
+
+
+class CardTemplate(NamedTuple):
+    """A card layout. `name` is the parser document profile it corresponds to."""
+
+    name: str
+    title: str
+    regions: Tuple[FieldRegion, ...]
+    aspect_ratio: float = ID1_ASPECT_RATIO
+
+    @property
+    def ocr_area(self) -> float:
+        """Share of the card's pixels OCRed when reading it with this template."""
+        boxes = (HEADER_BOX,) + tuple(region.box for region in self.regions)
+        return sum((right - left) * (bottom - top) for left, top, right, bottom in boxes)
+
+
+CARD_TEMPLATES = (
+    CardTemplate(
+        "national_id",
+        "Ethiopian National ID Card",
+        (
+            FieldRegion("full_name", (0.32, 0.30, 0.97, 0.42), "Name"),
+            FieldRegion("issued_date", (0.32, 0.50, 0.70, 0.60), "Date of Birth"),
+            FieldRegion("serial_number", (0.32, 0.80, 0.97, 0.92), "ID Number"),
+        ),
+    ),
+    CardTemplate(
+        "driver_license",
+        "Ethiopian Driver License",
+        (
+            FieldRegion("full_name", (0.32, 0.28, 0.97, 0.38), "Name"),
+            FieldRegion("serial_number", (0.32, 0.40, 0.75, 0.50), "License No"),
+            FieldRegion("issued_date", (0.32, 0.64, 0.75, 0.74), "Date of Issue"),
+        ),
+    ),
+    CardTemplate(
+        "student_id",
+        "Student Identification",
+        (
+            FieldRegion("full_name", (0.32, 0.30, 0.97, 0.40), "Name"),
+            FieldRegion("serial_number", (0.32, 0.44, 0.80, 0.54), "ID No"),
+            FieldRegion("certificate_title", (0.32, 0.58, 0.97, 0.68), "Program"),
+        ),
+    ),
+)
+
+
+class CardRead(NamedTuple):
+    """
+    The outcome of a template read. `template` is None when the header
+    matched no template; `parsed.fields` is None when the regions did not
+    give the required fields. `passes` counts OCR rounds: the header, then
+    the fields as one parallel batch.
+    """
+
+    template: Optional[CardTemplate]
+    text: str
+    parsed: ParseResult
+    passes: int
+
+
+def templates_enabled() -> bool:
+    return getattr(settings, "WALLET_OCR_TEMPLATES", True)
+
+
+def crop(image: Image.Image, box: Box) -> Image.Image:
+    left, top, right, bottom = box
+    return image.crop(
+        (round(left * image.width), round(top * image.height), round(right * image.width), round(bottom * image.height))
+    )
+
+
+def is_card_shaped(
+    image: Image.Image, templates: Sequence[CardTemplate] = CARD_TEMPLATES, tolerance: float = 0.08
+) -> bool:
+    ratio = image.width / image.height
+    return any(abs(ratio / template.aspect_ratio - 1) <= tolerance for template in templates)
+
+
+def detect_template(header_text: str, templates: Sequence[CardTemplate] = CARD_TEMPLATES) -> Optional[CardTemplate]:
+    """The template whose parser profile the header text classifies as, if any."""
+    profile = classify_document(header_text)
+    return next((template for template in templates if template.name == profile), None)
+
+
+def read_card(
+    image: Image.Image,
+    ocr: Callable[[Image.Image, str], str],
+    templates: Sequence[CardTemplate] = CARD_TEMPLATES,
+) -> Optional[CardRead]:
+    """
+    Read a card with its template. `ocr(image, config)` returns the text of
+    one image and is called from several threads at once. Returns None,
+    without running OCR, when the image is not card-shaped.
+    """
+    if not is_card_shaped(image, templates):
+        return None
+    header_text = ocr(crop(image, HEADER_BOX), "--psm 6").strip()
+    template = detect_template(header_text, templates)
+    if template is None:
+        return CardRead(None, header_text, ParseResult(None, GENERIC_PROFILE), 1)
+
+    regions = template.regions
+    with ThreadPoolExecutor(max_workers=len(regions)) as executor:
+        values = list(executor.map(lambda region: ocr(crop(image, region.box), region.config), regions))
+
+    extracted_data = dict.fromkeys(("full_name", "serial_number", "issued_date", "certificate_title"))
+    lines = []
+    for region, value in zip(regions, values):
+        value = " ".join(value.split())
+        lines.append(f"{region.label}: {value}")
+        extracted_data[region.field] = clean_field_value(region.field, value) if value else None
+    # The title makes a parse complete on a name alone; only lend it to a
+    # read that corroborates the header with another field.
+    if not extracted_data["certificate_title"] and (extracted_data["serial_number"] or extracted_data["issued_date"]):
+        extracted_data["certificate_title"] = template.title
+    # Name last in the stored text, so that a label regex cannot run on from
+    # it into the next field when the text is reparsed.
+    lines.sort(key=lambda line: line.startswith("Name:"))
+    text = "\n".join([header_text] + lines)
+    return CardRead(template, text, ParseResult(finalize_fields(extracted_data), template.name), 2)
@@ -0,0 +1,117 @@
+"""
+Database-backed queue for verification jobs.
+
+There is no broker: `VerificationJob` rows are the queue, and workers
+(`manage.py run_verification_worker`) claim them with a row lock where the
+database supports `SELECT ... FOR UPDATE SKIP LOCKED` (Postgres) plus a
+compare-and-set on the status column, which is what keeps claims exclusive
+on SQLite. Every later write is conditioned on the claim (worker name and
+attempt number), so a worker whose lease expired cannot overwrite the job
+after another worker has taken it over.
+"""
+
+from datetime import timedelta
+from typing import Optional
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Document, VerificationJob
+from .ocr_governor import OCRBusy
+from .verification import OCRError, verify_document
+
+
+def enqueue_verification(document: Document) -> VerificationJob:
+    return VerificationJob.objects.create(document=document)
+
+
+def claim_next_job(worker: str) -> Optional[VerificationJob]:
+    """Claim the oldest queued job for `worker`, or return None if the queue is empty."""
+    while True:
+        with transaction.atomic():
+            queued = VerificationJob.objects.filter(status=VerificationJob.QUEUED).order_by("created_at")
+            if connection.features.has_select_for_update_skip_locked:
+                queued = queued.select_for_update(skip_locked=True)
+            job = queued.first()
+            if job is None:
+                return None
+            now = timezone.now()
+            claimed = VerificationJob.objects.filter(pk=job.pk, status=VerificationJob.QUEUED).update(
+                status=VerificationJob.OCR,
+                claimed_by=worker,
+                claimed_at=now,
+                attempts=F("attempts") + 1,
+                updated_at=now,
+            )
+        if claimed:
+            job.refresh_from_db()
+            return job
+        # Another worker won the race for this row; try the next one.
+
+
+def requeue_abandoned_jobs(lease_seconds: int, max_attempts: int) -> int:
+    """
+    Put running jobs whose claim is older than `lease_seconds` back in the
+    queue, or fail them once they have used `max_attempts`. Returns the number
+    of jobs requeued.
+    """
+    now = timezone.now()
+    abandoned = VerificationJob.objects.filter(
+        status__in=VerificationJob.RUNNING, claimed_at__lt=now - timedelta(seconds=lease_seconds)
+    )
+    abandoned.filter(attempts__gte=max_attempts).update(
+        status=VerificationJob.FAILED,
+        error=f"Abandoned by its worker {max_attempts} time(s).",
+        updated_at=now,
+        finished_at=now,
+    )
+    return abandoned.filter(attempts__lt=max_attempts).update(
+        status=VerificationJob.QUEUED, claimed_by="", claimed_at=None, updated_at=now
+    )
+
+
+def run_job(job: VerificationJob) -> VerificationJob:
+    """Run the verification pipeline for a claimed job and record the outcome."""
+    owned = VerificationJob.objects.filter(pk=job.pk, claimed_by=job.claimed_by, attempts=job.attempts)
+
+    def on_stage(stage):
+        # Each stage also renews the claim, so slow OCR does not look abandoned.
+        now = timezone.now()
+        owned.update(status=stage.upper(), claimed_at=now, updated_at=now)
+
+    try:
+        outcome = verify_document(job.document, on_stage=on_stage)
+    except OCRBusy:
+        # Not the job's fault: give the claim back without using up an attempt.
+        owned.update(
+            status=VerificationJob.QUEUED,
+            claimed_by="",
+            claimed_at=None,
+            attempts=F("attempts") - 1,
+            updated_at=timezone.now(),
+        )
+    except OCRError as e:
+        now = timezone.now()
+        owned.update(
+            status=VerificationJob.FAILED,
+            error=f"OCR processing failed: {e}",
+            result={"error": f"OCR processing failed: {e}"},
+            result_code=500,
+            updated_at=now,
+            finished_at=now,
+        )
+    except Exception as e:
+        now = timezone.now()
+        owned.update(status=VerificationJob.FAILED, error=repr(e), updated_at=now, finished_at=now)
+    else:
+        now = timezone.now()
+        owned.update(
+            status=VerificationJob.DONE,
+            result=outcome.body,
+            result_code=outcome.http_status,
+            updated_at=now,
+            finished_at=now,
+        )
+    job.refresh_from_db()
+    return job
@@ -0,0 +1,347 @@
+"""
+Layout-aware credential extraction from Tesseract word boxes.
+
+`pytesseract.image_to_data` returns every recognised word with its block,
+paragraph and line numbers and its bounding box. Instead of flattening that
+into a string and rebuilding the structure with regexes, this module groups
+the words into lines once, splits each line into a label and a value (on a
+colon, or on a wide horizontal gap), and indexes the result as a
+label -> value map. Field extraction is then a dictionary lookup over label
+aliases plus a few positional rules for documents without labels.
+
+`parse_credential_from_layout` follows the `parse_credential_from_text`
+contract, so either path can feed the verify pipeline.
+"""
+
+import csv
+import io
+import re
+from statistics import median
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .parser import (
+    GENERIC_PROFILE,
+    ParseResult,
+    classify_document,
+    finalize_fields,
+    normalize_date,
+    parse_document,
+)
+
+
+class OCRWord(NamedTuple):
+    page: int
+    block: int
+    paragraph: int
+    line: int
+    left: int
+    top: int
+    width: int
+    height: int
+    confidence: float
+    text: str
+
+
+class OCRLine(NamedTuple):
+    words: Tuple[OCRWord, ...]
+    left: int
+    top: int
+    right: int
+    bottom: int
+
+    @property
+    def text(self) -> str:
+        return " ".join(word.text for word in self.words)
+
+    @property
+    def height(self) -> int:
+        return self.bottom - self.top
+
+
+_LABEL_NOISE = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+_COLONS = (":", "：")
+
+
+def normalize_label(label: str) -> str:
+    """Lowercase, drop punctuation and collapse spaces: 'Serial No.:' -> 'serial no'."""
+    return _SPACES.sub(" ", _LABEL_NOISE.sub("", label.lower())).strip()
+
+
+def _aliases(*labels: str) -> Tuple[str, ...]:
+    return tuple(normalize_label(label) for label in labels)
+
+
+# Label aliases per field, in the same priority order as the regex patterns.
+FIELD_LABELS: Dict[str, Tuple[str, ...]] = {
+    "full_name": _aliases(
+        "Full Name", "Name", "Student Name", "Recipient Name", "Candidate Name",
+        "Name of Student", "Name of Recipient", "Name of Candidate", "ስም", "የሙሉ ስም",
+    ),
+    "serial_number": _aliases(
+        "Serial Number", "Serial No", "Serial #", "Certificate Number", "Certificate No",
+        "ID Number", "ID No", "ID", "Credential ID", "Document ID", "Reference Number",
+        "Reference No", "Registration Number", "Registration No", "Reg No", "ተ.ቁ", "መ.ቁ",
+        "License No", "License Number", "UGR", "Student ID", "ID Card", "National ID",
+    ),
+    "issued_date": _aliases(
+        "Issue Date", "Issued Date", "Issued On", "Date of Issue", "Date Issued", "Date",
+        "Dated", "Date of Award", "Graduation Date", "Completion Date", "የተሰጠበት ቀን", "ቀን",
+        "DOB", "Date of Birth", "Birth Date", "Expiry Date", "Valid Date", "Validity",
+        "Admission", "Admission Date", "የትውልድ ቀን",
+    ),
+    "certificate_title": _aliases(
+        "Certificate Title", "Title", "Program", "Course", "Field of Study",
+        "Credential Type", "Type", "Study Level", "Level",
+    ),
+}
+KNOWN_LABELS = frozenset(label for labels in FIELD_LABELS.values() for label in labels)
+
+# Positional rules: phrases after which the holder's name follows, and words
+# that mark a line as the document title.
+NAME_LEAD_INS = ("this is to certify that", "certify that", "presented to", "awarded to", "granted to")
+TITLE_WORDS = ("certificate", "diploma", "degree", "transcript", "license", "id card", "identification")
+
+_SERIAL = re.compile(r"[A-Z0-9][A-Z0-9\-/]*", re.IGNORECASE)
+_DIGIT = re.compile(r"\d")
+_NAME_TAIL = re.compile(r"\s+(?:has|have)\b.*$", re.IGNORECASE)
+
+
+def words_from_data(data: dict) -> List[OCRWord]:
+    """Words from `image_to_data(..., output_type=Output.DICT)`, skipping empty boxes."""
+    words = []
+    for index, text in enumerate(data["text"]):
+        text = (text or "").strip()
+        if not text:
+            continue
+        words.append(
+            OCRWord(
+                int(data["page_num"][index]),
+                int(data["block_num"][index]),
+                int(data["par_num"][index]),
+                int(data["line_num"][index]),
+                int(data["left"][index]),
+                int(data["top"][index]),
+                int(data["width"][index]),
+                int(data["height"][index]),
+                float(data["conf"][index]),
+                text,
+            )
+        )
+    return words
+
+
+def words_from_tsv(tsv: str) -> List[OCRWord]:
+    """Words from the raw TSV string `image_to_data` returns by default."""
+    rows = csv.DictReader(io.StringIO(tsv), delimiter="\t", quoting=csv.QUOTE_NONE)
+    columns: Dict[str, list] = {}
+    for row in rows:
+        for key, value in row.items():
+            columns.setdefault(key, []).append(value)
+    return words_from_data(columns) if columns else []
+
+
+class OCRLayout:
+    """
+    Lines of an OCR'd page in reading order, with a label -> value index.
+
+    The index is built once in the constructor; lookups afterwards never
+    rescan the text.
+    """
+
+    def __init__(self, words: List[OCRWord]):
+        self.lines = self._group_lines(words)
+        self.fields: Dict[str, str] = {}
+        self._index()
+
+    @classmethod
+    def from_data(cls, data: dict) -> "OCRLayout":
+        return cls(words_from_data(data))
+
+    @classmethod
+    def from_tsv(cls, tsv: str) -> "OCRLayout":
+        return cls(words_from_tsv(tsv))
+
+    @property
+    def text(self) -> str:
+        """Plain text, one OCR line per line, for storage and the regex parser."""
+        return "\n".join(line.text for line in self.lines)
+
+    @staticmethod
+    def _group_lines(words: List[OCRWord]) -> List[OCRLine]:
+        grouped: Dict[tuple, List[OCRWord]] = {}
+        for word in words:
+            grouped.setdefault((word.page, word.block, word.paragraph, word.line), []).append(word)
+        lines = []
+        for line_words in grouped.values():
+            line_words.sort(key=lambda word: word.left)
+            lines.append(
+                OCRLine(
+                    tuple(line_words),
+                    min(word.left for word in line_words),
+                    min(word.top for word in line_words),
+                    max(word.left + word.width for word in line_words),
+                    max(word.top + word.height for word in line_words),
+                )
+            )
+        lines.sort(key=lambda line: (line.words[0].page, line.top, line.left))
+        return lines
+
+    def _index(self):
+        for position, line in enumerate(self.lines):
+            split = self._split_label(line)
+            if split is None:
+                continue
+            label, value = split
+            if not value:
+                value = self._value_below(position)
+            if value:
+                self.fields.setdefault(label, value)
+
+    def _split_label(self, line: OCRLine) -> Optional[Tuple[str, str]]:
+        """Split a line into (normalized label, value), or None if it has no label."""
+        words = line.words
+        for index, word in enumerate(words):
+            for colon in _COLONS:
+                if colon in word.text:
+                    head, _, tail = word.text.partition(colon)
+                    label = " ".join([w.text for w in words[:index]] + [head])
+                    value = " ".join(([tail] if tail else []) + [w.text for w in words[index + 1 :]])
+                    return normalize_label(label), value.strip()
+
+        # No colon: a known label separated from its value by a wide gap.
+        if len(words) > 1:
+            gaps = [(words[i + 1].left - (words[i].left + words[i].width), i) for i in range(len(words) - 1)]
+            gap, index = max(gaps)
+            if gap > 2 * median(word.height for word in words):
+                label = normalize_label(" ".join(w.text for w in words[: index + 1]))
+                if label in KNOWN_LABELS:
+                    return label, " ".join(w.text for w in words[index + 1 :])
+
+        label = normalize_label(line.text)
+        if label in KNOWN_LABELS:
+            return label, ""
+        return None
+
+    def _value_below(self, position: int) -> str:
+        """Text of the next line down that overlaps the label horizontally."""
+        label_line = self.lines[position]
+        for line in self.lines[position + 1 : position + 4]:
+            if line.top < label_line.bottom - label_line.height // 2:
+                continue
+            if line.top - label_line.bottom > 2 * label_line.height:
+                break
+            if line.left < label_line.right and line.right > label_line.left:
+                return line.text if self._split_label(line) is None else ""
+        return ""
+
+    def lookup(self, field: str) -> List[str]:
+        """Candidate values for a field, in label priority order."""
+        return [self.fields[label] for label in FIELD_LABELS[field] if label in self.fields]
+
+
+def _clean_name(value: str) -> Optional[str]:
+    # Keep the leading run of words that are not lowercase Latin, so trailing
+    # prose ("has successfully completed") is dropped even without a colon.
+    words = []
+    for word in _NAME_TAIL.sub("", value).split():
+        if word[0].islower():
+            break
+        words.append(word)
+    name = " ".join(words).strip(" .,-")
+    if 2 <= len(name.split()) <= 5 and 5 <= len(name) <= 60:
+        return name
+    return None
+
+
+def _clean_serial(value: str) -> Optional[str]:
+    match = _SERIAL.search(value)
+    if not match:
+        return None
+    serial = match.group(0).upper()
+    if len(serial) >= 4 and (_DIGIT.search(serial) or len(serial) >= 6):
+        return serial
+    return None
+
+
+def _clean_title(value: str) -> Optional[str]:
+    title = _SPACES.sub(" ", value).strip()
+    if 1 <= len(title) <= 100:
+        return title
+    return None
+
+
+_CLEANERS = {
+    "full_name": _clean_name,
+    "serial_number": _clean_serial,
+    "issued_date": lambda value: normalize_date(value.strip()),
+    "certificate_title": _clean_title,
+}
+
+
+def clean_field_value(field: str, value: str) -> Optional[str]:
+    """Validate and normalise one field value read off a document, or None."""
+    return _CLEANERS[field](value)
+
+
+def _positional_name(layout: OCRLayout) -> Optional[str]:
+    """Ceremonial certificates: the name follows 'This is to certify that'."""
+    for position, line in enumerate(layout.lines):
+        lowered = line.text.lower()
+        for lead_in in NAME_LEAD_INS:
+            index = lowered.find(lead_in)
+            if index < 0:
+                continue
+            remainder = line.text[index + len(lead_in) :]
+            if not remainder.strip() and position + 1 < len(layout.lines):
+                remainder = layout.lines[position + 1].text
+            name = _clean_name(remainder)
+            if name:
+                return name
+    return None
+
+
+def _positional_serial(layout: OCRLayout) -> Optional[str]:
+    """ID cards print the number on a line of its own, e.g. 'UGR/1234/14'."""
+    for line in layout.lines:
+        if len(line.words) == 1 and _DIGIT.search(line.text):
+            serial = _clean_serial(line.text)
+            if serial and len(serial) >= 6:
+                return serial
+    return None
+
+
+def _positional_title(layout: OCRLayout) -> Optional[str]:
+    """The tallest line that reads like a document title."""
+    candidates = [line for line in layout.lines if any(word in line.text.lower() for word in TITLE_WORDS)]
+    if not candidates:
+        return None
+    return _clean_title(max(candidates, key=lambda line: line.height).text)
+
+
+def parse_credential_from_layout(layout: OCRLayout) -> Optional[dict]:
+    """Extract credential fields from OCR word boxes; same contract as the text parser."""
+    extracted_data = {}
+    for field, clean in _CLEANERS.items():
+        extracted_data[field] = next(
+            (value for value in map(clean, layout.lookup(field)) if value), None
+        )
+    if not extracted_data["full_name"]:
+        extracted_data["full_name"] = _positional_name(layout)
+    if not extracted_data["serial_number"]:
+        extracted_data["serial_number"] = _positional_serial(layout)
+    if not extracted_data["certificate_title"]:
+        extracted_data["certificate_title"] = _positional_title(layout)
+    return finalize_fields(extracted_data)
+
+
+def parse_layout_document(layout: OCRLayout) -> ParseResult:
+    """
+    Layout-first counterpart of `parse_document`. If the label map does not
+    yield the required fields, the regex parser runs on the layout's text.
+    """
+    text = layout.text
+    fields = parse_credential_from_layout(layout)
+    if fields is None:
+        return parse_document(text)
+    return ParseResult(fields, classify_document(text) if text else GENERIC_PROFILE)
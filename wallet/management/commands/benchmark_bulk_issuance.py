@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from institutions.issuance import DEFAULT_CHUNK_SIZE
+from wallet.benchmarks.bulk_issuance import run_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks credential issuance in records per second: bulk issuance in "
+        "chunked transactions against one save() per record. Runs on synthetic "
+        "records that are rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000, help="Rows issued in bulk.")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Records per transaction.")
+        parser.add_argument("--save-sample", type=int, default=500, help="Records issued one by one with save().")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+
+    def handle(self, *args, **options):
+        if options["rows"] < 1 or options["chunk_size"] < 1 or options["save_sample"] < 1:
+            raise CommandError("--rows, --chunk-size and --save-sample must be at least 1.")
+
+        report = run_benchmark(options["rows"], options["chunk_size"], options["save_sample"], seed=options["seed"])
+        self.stdout.write(f"Issuance of {report.rows} rows ({report.duplicates} duplicates), chunks of {report.chunk_size}:")
+        self.stdout.write(f"  bulk          {report.bulk_records_per_second:9.0f} records/s  ({report.created} created)")
+        self.stdout.write(f"  save() each   {report.save_records_per_second:9.0f} records/s  ({report.save_sample} records)")
+        self.stdout.write(f"  speedup       {report.speedup:9.1f}x")
@@ -0,0 +1,62 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from wallet.benchmarks.corpus import generate_corpus
+from wallet.benchmarks.layout import compare_corpus, compare_paths, ocr_word_data
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp")
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the regex extraction path with the layout-aware path built on "
+        "Tesseract word boxes: end-to-end parse latency, hit rate and per-field "
+        "agreement. Uses synthetic word boxes unless --images is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--docs", type=int, default=1000, help="Synthetic corpus size.")
+        parser.add_argument("--seed", type=int, default=0, help="Corpus random seed.")
+        parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions (best of N).")
+        parser.add_argument(
+            "--images",
+            metavar="DIR",
+            help="OCR every image in DIR once with image_to_data and compare on the real word boxes.",
+        )
+
+    def handle(self, *args, **options):
+        repeat = options["repeat"]
+        if options["images"]:
+            paths = sorted(
+                os.path.join(options["images"], name)
+                for name in os.listdir(options["images"])
+                if name.lower().endswith(IMAGE_EXTENSIONS)
+            )
+            if not paths:
+                raise CommandError(f"No images found in {options['images']}.")
+            # OCR runs once up front; only parsing is timed.
+            result = compare_paths([ocr_word_data(path) for path in paths], ["image"] * len(paths), repeat=repeat)
+            source = f"{len(paths)} images"
+        else:
+            corpus = generate_corpus(options["docs"], seed=options["seed"])
+            result = compare_corpus(corpus, repeat=repeat, seed=options["seed"])
+            source = f"{len(corpus)} synthetic documents"
+
+        self.stdout.write(f"Word boxes to fields ({source}, best of {repeat}):")
+        for row in (result.regex, result.layout):
+            self.stdout.write(
+                f"  {row.path:<8} {row.docs_per_second:>10.0f} docs/s "
+                f"{row.mean_ms:>7.3f} ms/doc  hit rate {row.hit_rate:6.1%}"
+            )
+
+        self.stdout.write("\nField agreement between the paths:")
+        for field, agreement in result.field_agreement.items():
+            self.stdout.write(f"  {field:<18} {agreement:6.1%}")
+
+        self.stdout.write("\nHit rate by document kind:")
+        for kind, rates in result.hit_rate_by_kind.items():
+            line = f"  {kind:<22} regex {rates['regex']:6.1%}  layout {rates['layout']:6.1%}"
+            if rates["layout"] < rates["regex"]:
+                line = self.style.WARNING(line)
+            self.stdout.write(line)
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from institutions.matching import MAX_NAME_CANDIDATES
+from wallet.benchmarks.name_matching import run_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the holder-name search used when the serial cannot be read: "
+        "recall of the blocking step at k, precision of the combined score, "
+        "acceptance and false-acceptance rates, and blocking and scoring latency. "
+        "Runs on a synthetic register that is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--records", type=int, default=10000, help="Register size.")
+        parser.add_argument("--queries", type=int, default=500, help="Noisy queries for registered records.")
+        parser.add_argument("--k", type=int, default=MAX_NAME_CANDIDATES, help="Candidates kept by blocking.")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+
+    def handle(self, *args, **options):
+        if options["records"] < 1 or options["queries"] < 1:
+            raise CommandError("--records and --queries must be at least 1.")
+
+        report = run_benchmark(options["records"], options["queries"], options["k"], options["seed"])
+        self.stdout.write(f"Name search on {report.records} records, {report.queries} queries, k={report.k}:")
+        self.stdout.write(f"  recall@k            {report.recall_at_k:7.1%}")
+        self.stdout.write(f"  precision@1         {report.precision_at_1:7.1%}")
+        self.stdout.write(f"  accepted            {report.accept_rate:7.1%}  ({report.accept_precision:.1%} correct)")
+        self.stdout.write(f"  impostors accepted  {report.false_accept_rate:7.1%}")
+        self.stdout.write(f"  candidates (mean)   {report.mean_candidates:7.1f}")
+        self.stdout.write(
+            f"  blocking            p50 {report.blocking_p50_ms:7.2f} ms  p95 {report.blocking_p95_ms:7.2f} ms"
+        )
+        self.stdout.write(
+            f"  scoring             p50 {report.scoring_p50_ms:7.2f} ms  p95 {report.scoring_p95_ms:7.2f} ms"
+        )
@@ -0,0 +1,58 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from wallet.benchmarks.ocr_engines import engine_latency, prepare_images
+from wallet.benchmarks.preprocessing import synthetic_images
+from wallet.ocr_engines import PooledEngine, SubprocessEngine
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp")
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares per-document OCR latency of the subprocess engine (a tesseract "
+        "process per call) with the worker pool, cold and warm."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--images", metavar="DIR", help="Directory of sample scans (default: rendered synthetic documents).")
+        parser.add_argument("--docs", type=int, default=20, help="Synthetic documents to render without --images.")
+        parser.add_argument("--pool-size", type=int, default=2, help="Worker processes in the pool.")
+
+    def handle(self, *args, **options):
+        if options["images"]:
+            paths = sorted(
+                os.path.join(options["images"], name)
+                for name in os.listdir(options["images"])
+                if name.lower().endswith(IMAGE_EXTENSIONS)
+            )
+            if not paths:
+                raise CommandError(f"No images found in {options['images']}.")
+            images = []
+            for path in paths:
+                with open(path, "rb") as handle:
+                    images.append(handle.read())
+        else:
+            images = [data for _, data in synthetic_images(options["docs"])]
+
+        subprocess_engine = SubprocessEngine()
+        if subprocess_engine.version.endswith("unknown"):
+            raise CommandError("Tesseract is not available.")
+        images = prepare_images(images)
+
+        rows = [engine_latency("subprocess", subprocess_engine, images)]
+        pool = PooledEngine(size=options["pool_size"])
+        try:
+            # Cold: workers start on demand inside the timed calls.
+            rows.append(engine_latency("pool (cold)", pool, images))
+            rows.append(engine_latency("pool (warm)", pool.warm(), images))
+        finally:
+            pool.close()
+
+        self.stdout.write(f"OCR latency per document over {len(images)} images ({pool.version}):")
+        self.stdout.write(f"  {'engine':<14} {'first ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8}")
+        for row in rows:
+            self.stdout.write(
+                f"  {row.engine:<14} {row.first_ms:>9.1f} {row.p50_ms:>8.1f} {row.p95_ms:>8.1f} {row.mean_ms:>8.1f}"
+            )
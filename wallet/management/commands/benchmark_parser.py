@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from wallet.benchmarks.corpus import generate_corpus
+from wallet.benchmarks.parsing import (
+    extractor_throughput,
+    pattern_growth,
+    pattern_worst_case,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks wallet.parser on a synthetic OCR corpus: throughput per field "
+        "extractor, worst-case time per pattern, and a backtracking check that "
+        "flags patterns whose time grows superlinearly with input length."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--docs", type=int, default=1000, help="Corpus size.")
+        parser.add_argument("--seed", type=int, default=0, help="Corpus random seed.")
+        parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions (best of N).")
+        parser.add_argument(
+            "--sizes",
+            default="2000,4000,8000,16000,32000",
+            help="Comma-separated pathological input lengths, in characters.",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=1.5,
+            help="Growth exponent above which a pattern is flagged (1 = linear, 2 = quadratic).",
+        )
+        parser.add_argument("--top", type=int, default=10, help="Patterns to list in the worst-case table.")
+        parser.add_argument(
+            "--strict",
+            action="store_true",
+            help="Exit with an error if any pattern is flagged, for use as a pre-deploy check.",
+        )
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options["sizes"].split(",") if size]
+        if len(sizes) < 2:
+            raise CommandError("--sizes needs at least two lengths to measure growth.")
+
+        corpus = generate_corpus(options["docs"], seed=options["seed"])
+        repeat = options["repeat"]
+
+        self.stdout.write(f"Extractor throughput ({len(corpus)} documents, best of {repeat}):")
+        for row in extractor_throughput(corpus, repeat=repeat):
+            self.stdout.write(
+                f"  {row.extractor:<28} {row.docs_per_second:>10.0f} docs/s "
+                f"{row.megabytes_per_second:>7.2f} MB/s  hit rate {row.hit_rate:6.1%}"
+            )
+
+        self.stdout.write(f"\nSlowest patterns on the corpus (top {options['top']}):")
+        for row in pattern_worst_case(corpus, repeat=repeat)[: options["top"]]:
+            self.stdout.write(
+                f"  {row.pattern:<34} worst {row.worst_seconds * 1e6:>9.1f} us "
+                f"mean {row.mean_seconds * 1e6:>7.1f} us  ({row.worst_kind})"
+            )
+
+        self.stdout.write(f"\nBacktracking growth on pathological inputs ({', '.join(map(str, sizes))} chars):")
+        flagged = []
+        for row in pattern_growth(sizes, repeat=repeat, threshold=options["threshold"]):
+            line = (
+                f"  {row.pattern:<34} exponent {row.exponent:5.2f} "
+                f"{row.seconds_by_size[max(sizes)] * 1e3:>9.2f} ms at {max(sizes)} ({row.worst_input})"
+            )
+            if row.superlinear:
+                flagged.append(row.pattern)
+                self.stdout.write(self.style.WARNING(line + "  SUPERLINEAR"))
+            else:
+                self.stdout.write(line)
+
+        if not flagged:
+            self.stdout.write(self.style.SUCCESS("\nNo superlinear patterns."))
+            return
+        message = f"{len(flagged)} superlinear pattern(s): {', '.join(flagged)}"
+        if options["strict"]:
+            raise CommandError(message)
+        self.stdout.write(self.style.WARNING("\n" + message))
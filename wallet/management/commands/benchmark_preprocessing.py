@@ -0,0 +1,68 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from wallet.benchmarks.preprocessing import benchmark_steps, synthetic_images
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp")
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures each OCR preprocessing step (JPEG draft decode, EXIF orientation, "
+        "grayscale, downscale, binarization, deskew) switched on in turn: time spent, "
+        "pixels handed to Tesseract, OCR latency and parse success rate."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--images", metavar="DIR", help="Directory of sample scans (default: rendered synthetic documents).")
+        parser.add_argument("--docs", type=int, default=20, help="Synthetic documents to render without --images.")
+        parser.add_argument("--seed", type=int, default=0, help="Synthetic corpus random seed.")
+        parser.add_argument("--no-ocr", action="store_true", help="Only time preprocessing; do not run Tesseract.")
+
+    def handle(self, *args, **options):
+        if options["images"]:
+            paths = sorted(
+                os.path.join(options["images"], name)
+                for name in os.listdir(options["images"])
+                if name.lower().endswith(IMAGE_EXTENSIONS)
+            )
+            if not paths:
+                raise CommandError(f"No images found in {options['images']}.")
+            images = []
+            for path in paths:
+                with open(path, "rb") as handle:
+                    images.append(handle.read())
+        else:
+            images = [data for _, data in synthetic_images(options["docs"], seed=options["seed"])]
+
+        ocr = None
+        if not options["no_ocr"]:
+            import pytesseract
+
+            try:
+                pytesseract.get_tesseract_version()
+            except Exception as e:
+                raise CommandError(f"Tesseract is not available ({e}); rerun with --no-ocr.")
+            ocr = pytesseract.image_to_string
+
+        rows = benchmark_steps(images, ocr=ocr)
+        baseline = rows[0]
+        self.stdout.write(f"Per document, averaged over {len(images)} images:")
+        header = f"  {'config':<16} {'prep ms':>8} {'bitmap MB':>10} {'saved':>7}"
+        if ocr is not None:
+            header += f" {'ocr ms':>8} {'ocr saved':>10} {'parsed':>7}"
+        self.stdout.write(header)
+        for row in rows:
+            saved = 1 - row.bitmap_megabytes / baseline.bitmap_megabytes if baseline.bitmap_megabytes else 0.0
+            line = f"  {row.label:<16} {row.preprocess_ms:>8.1f} {row.bitmap_megabytes:>10.2f} {saved:>7.1%}"
+            if row.ocr_ms is not None:
+                ocr_saved = 1 - row.ocr_ms / baseline.ocr_ms if baseline.ocr_ms else 0.0
+                line += f" {row.ocr_ms:>8.1f} {ocr_saved:>10.1%} {row.parse_rate:>7.1%}"
+                if row.parse_rate < baseline.parse_rate:
+                    line = self.style.WARNING(line + "  fewer parsed than baseline")
+            self.stdout.write(line)
+
+        self.stdout.write("\nStep timings (ms) in the full configuration:")
+        for step, milliseconds in rows[-1].step_ms.items():
+            self.stdout.write(f"  {step:<16} {milliseconds:>8.1f}")
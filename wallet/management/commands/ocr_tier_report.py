@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Avg, Count
+from django.utils import timezone
+
+from wallet.models import Document
+from wallet.card_templates import templates_enabled
+from wallet.verification import PDF_OCR_TIER, PDF_TEXT_TIER, TEMPLATE_TIER, ocr_tiers
+
+
+class Command(BaseCommand):
+    help = (
+        "Shows which OCR tier parsed each document: how many uploads stop at the "
+        "fast pass, how many escalate, and how many no tier could parse. Use it to "
+        "tune WALLET_OCR_TIERS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, help="Only documents uploaded in the last N days.")
+
+    def handle(self, *args, **options):
+        documents = Document.objects.all()
+        if options["days"]:
+            documents = documents.filter(uploaded_at__gte=timezone.now() - timedelta(days=options["days"]))
+        cached = documents.filter(ocr_passes=0, parser_version__gt="").count()
+        # Documents served from the OCR cache ran no tiers; leave them out.
+        rows = {
+            row["ocr_tier"]: row
+            for row in documents.filter(ocr_passes__gt=0)
+            .values("ocr_tier")
+            .annotate(documents=Count("id"), passes=Avg("ocr_passes"))
+        }
+        total = sum(row["documents"] for row in rows.values())
+        self.stdout.write(f"{total} document(s) OCRed, {cached} served from the OCR cache.")
+        if not total:
+            return
+
+        self.stdout.write(f"  {'tier':<12} {'docs':>8} {'share':>7} {'cumulative':>11} {'passes':>7}")
+        cumulative = 0
+        names = ([TEMPLATE_TIER] if templates_enabled() else []) + [tier.name for tier in ocr_tiers()]
+        names += [PDF_TEXT_TIER, PDF_OCR_TIER]
+        # Configured tiers in ladder order, then tiers no longer configured.
+        names += sorted(name for name in rows if name and name not in names)
+        for name in names + [""]:
+            row = rows.get(name)
+            if row is None:
+                if name:
+                    self.stdout.write(f"  {name:<12} {0:>8} {0:>7.1%}")
+                continue
+            share = row["documents"] / total
+            label = name or "(none)"
+            if name:
+                cumulative += share
+                line = f"  {label:<12} {row['documents']:>8} {share:>7.1%} {cumulative:>11.1%} {row['passes']:>7.2f}"
+            else:
+                line = self.style.WARNING(f"  {label:<12} {row['documents']:>8} {share:>7.1%} {'':>11} {row['passes']:>7.2f}")
+            self.stdout.write(line)
@@ -0,0 +1,76 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from wallet.benchmarks.corpus import generate_corpus
+from wallet.models import Document
+from wallet.parser import ParserStats, ProfiledCredentialParser
+
+
+class Command(BaseCommand):
+    help = (
+        "Parses a sample of stored Document.extracted_text with an instrumented "
+        "parser and prints patterns ranked by the time they cost, with how often "
+        "each one is tried, skipped by its keyword gate, matches and wins."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sample", type=int, default=1000, help="Most recent documents to parse.")
+        parser.add_argument(
+            "--synthetic",
+            action="store_true",
+            help="Use the synthetic benchmark corpus instead of stored documents.",
+        )
+        parser.add_argument("--json", metavar="PATH", help="Also export the raw counters as JSON ('-' for stdout).")
+
+    def handle(self, *args, **options):
+        sample = options["sample"]
+        if options["synthetic"]:
+            texts = [doc.text for doc in generate_corpus(sample)]
+        else:
+            texts = (
+                Document.objects.exclude(extracted_text__isnull=True)
+                .exclude(extracted_text="")
+                .order_by("-id")
+                .values_list("extracted_text", flat=True)[:sample]
+                .iterator(chunk_size=500)
+            )
+
+        instrumented = ProfiledCredentialParser(stats=ParserStats())
+        parsed = documents = 0
+        for text in texts:
+            documents += 1
+            parsed += instrumented.parse(text).fields is not None
+        if not documents:
+            raise CommandError("No documents with extracted text to sample; try --synthetic.")
+
+        snapshot = instrumented.stats.snapshot()
+        self.stdout.write(f"Parsed {parsed}/{documents} documents.\n")
+        for field, totals in snapshot["fields"].items():
+            hit_rate = totals["hits"] / totals["extractions"] if totals["extractions"] else 0.0
+            self.stdout.write(f"  {field:<8} hit rate {hit_rate:6.1%}")
+        for profile, count in sorted(snapshot["profiles"].items(), key=lambda item: -item[1]):
+            self.stdout.write(f"  profile {profile:<16} {count:>7} documents")
+
+        self.stdout.write(
+            f"\n  {'pattern':<34} {'tried':>7} {'skipped':>8} {'matched':>8} {'won':>6} "
+            f"{'win%':>6} {'total ms':>9} {'us/try':>7}"
+        )
+        for row in snapshot["patterns"]:
+            win_rate = row["won"] / row["tried"] if row["tried"] else 0.0
+            per_try = row["seconds"] / row["tried"] * 1e6 if row["tried"] else 0.0
+            line = (
+                f"  {row['field'] + '.' + row['pattern']:<34} {row['tried']:>7} {row['skipped']:>8} "
+                f"{row['matched']:>8} {row['won']:>6} {win_rate:>6.1%} "
+                f"{row['seconds'] * 1e3:>9.2f} {per_try:>7.1f}"
+            )
+            # Patterns that cost time but never produce the field are pruning candidates.
+            if row["tried"] and not row["won"]:
+                line = self.style.WARNING(line + "  never won")
+            self.stdout.write(line)
+
+        if options["json"] == "-":
+            instrumented.stats.export(sys.stdout)
+        elif options["json"]:
+            with open(options["json"], "w") as stream:
+                instrumented.stats.export(stream)
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+
+from wallet.models import OCRCacheEntry
+from wallet.ocr_cache import prune
+
+
+class Command(BaseCommand):
+    help = (
+        "Evicts OCR cache entries by age and by count (least recently used first) "
+        "and prints how the cache is being used."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-entries", type=int, help="Defaults to WALLET_OCR_CACHE_MAX_ENTRIES.")
+        parser.add_argument("--max-age-days", type=int, help="Defaults to WALLET_OCR_CACHE_MAX_AGE_DAYS.")
+
+    def handle(self, *args, **options):
+        deleted = prune(max_entries=options["max_entries"], max_age_days=options["max_age_days"])
+        self.stdout.write(f"Evicted {deleted} entr{'y' if deleted == 1 else 'ies'}.")
+
+        totals = OCRCacheEntry.objects.aggregate(entries=Count("id"), hits=Sum("hit_count"))
+        hits = totals["hits"] or 0
+        entries = totals["entries"]
+        # Every entry is one miss (the OCR that filled it) plus its hits.
+        lookups = hits + entries
+        self.stdout.write(
+            f"{entries} entries, {hits} hits, hit rate {hits / lookups if lookups else 0.0:.1%} "
+            "over the entries still cached."
+        )
+        for engine in (
+            OCRCacheEntry.objects.values("engine_version").annotate(entries=Count("id")).order_by("-entries")
+        ):
+            self.stdout.write(f"  {engine['engine_version']:<40} {engine['entries']:>8} entries")
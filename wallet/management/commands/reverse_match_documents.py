@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from institutions.lookup import SUBSET_DIGESTS
+from institutions.models import CredentialRecord
+from wallet.models import PENDING, Document
+from wallet.reverse_matching import reverse_match
+
+
+class Command(BaseCommand):
+    help = (
+        "Links unverified documents to the credential records they match, for records "
+        "issued without the credentials_issued signal (bulk_create, imports) and after "
+        "upgrading. Walks records with an id above --start-after in batches. With "
+        "--refresh-keys it first recomputes the match keys of unverified documents "
+        "from their stored parse; run that once after the keys are added."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000, help="Records matched per batch.")
+        parser.add_argument(
+            "--start-after",
+            type=int,
+            default=0,
+            metavar="ID",
+            help="Skip records with an id up to and including ID (resume point printed by a previous run).",
+        )
+        parser.add_argument(
+            "--refresh-keys",
+            action="store_true",
+            help="Recompute the match keys of unverified parsed documents first.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        if options["refresh_keys"]:
+            self.refresh_keys(batch_size)
+
+        queryset = CredentialRecord.objects.only("id", "credential_hash", *SUBSET_DIGESTS).order_by("id")
+        last_id = options["start_after"]
+        linked = suggested = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            result = reverse_match(batch)
+            linked += result.linked
+            suggested += result.suggested
+            self.stdout.write(f"  up to record id {last_id}: {linked} linked, {suggested} suggested")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"{linked} document(s) linked, {suggested} suggested; last record id {last_id}.")
+        )
+
+    def refresh_keys(self, batch_size):
+        queryset = Document.objects.filter(PENDING, parsed_fields__isnull=False).only("id", "parsed_fields")
+        last_id = refreshed = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id).order_by("id")[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            for document in batch:
+                document.set_match_keys()
+            Document.objects.bulk_update(batch, ["match_hash", *SUBSET_DIGESTS])
+            refreshed += len(batch)
+        self.stdout.write(f"Refreshed the match keys of {refreshed} unverified document(s).")
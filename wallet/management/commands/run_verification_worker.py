@@ -0,0 +1,63 @@
+import os
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from institutions.bloom import get_filter
+from wallet.jobs import claim_next_job, requeue_abandoned_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs queued document verification jobs: OCR, parsing and matching outside "
+        "the HTTP request. Start as many workers as the machine has cores to spare; "
+        "they coordinate through the job table, no broker needed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Exit when the queue is empty instead of polling.")
+        parser.add_argument("--max-jobs", type=int, help="Exit after running this many jobs.")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument(
+            "--lease-seconds",
+            type=int,
+            default=300,
+            help="A running job not heard from for this long is treated as abandoned and requeued.",
+        )
+        parser.add_argument("--max-attempts", type=int, default=3, help="Claims per job before it is failed.")
+        parser.add_argument("--name", default=f"{socket.gethostname()}:{os.getpid()}", help="Worker name recorded on claims.")
+
+    def handle(self, *args, **options):
+        worker, max_jobs = options["name"], options["max_jobs"]
+        # Load or build the credential prefilter now rather than in the first job.
+        get_filter()
+        self.stdout.write(f"Verification worker {worker} started.")
+        processed = 0
+        while max_jobs is None or processed < max_jobs:
+            # Long-running process: drop connections the database has timed out.
+            close_old_connections()
+            requeued = requeue_abandoned_jobs(options["lease_seconds"], options["max_attempts"])
+            if requeued:
+                self.stdout.write(self.style.WARNING(f"Requeued {requeued} abandoned job(s)."))
+
+            job = claim_next_job(worker)
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(options["poll_interval"])
+                continue
+
+            started = time.perf_counter()
+            job = run_job(job)
+            if job.status == job.QUEUED:
+                # Handed back because OCR capacity is exhausted; back off.
+                self.stdout.write(self.style.WARNING(f"  job {job.id} requeued: OCR busy"))
+                time.sleep(options["poll_interval"])
+                continue
+            processed += 1
+            line = f"  job {job.id} document {job.document_id}: {job.status} in {time.perf_counter() - started:.2f}s"
+            self.stdout.write(self.style.ERROR(line + f" ({job.error})") if job.error else line)
+
+        self.stdout.write(f"Worker {worker} stopping after {processed} job(s).")
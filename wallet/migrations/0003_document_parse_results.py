@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0002_remove_document_document_hash_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='document_profile',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='parsed_fields',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='parser_version',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='text_digest',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
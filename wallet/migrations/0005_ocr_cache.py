@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0004_verificationjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.CreateModel(
+            name='OCRCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('engine_version', models.CharField(max_length=100)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('READY', 'Ready')], default='PENDING', max_length=10)),
+                ('extracted_text', models.TextField(blank=True, default='')),
+                ('word_data', models.JSONField(blank=True, null=True)),
+                ('parsed_fields', models.JSONField(blank=True, null=True)),
+                ('document_profile', models.CharField(blank=True, default='', max_length=32)),
+                ('parser_version', models.CharField(blank=True, default='', max_length=32)),
+                ('hit_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('content_hash', 'engine_version'), name='unique_ocr_cache_key')],
+            },
+        ),
+    ]
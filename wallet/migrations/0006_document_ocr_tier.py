@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0005_ocr_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='ocr_passes',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='ocr_tier',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='ocrcacheentry',
+            name='ocr_tier',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0006_document_ocr_tier'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='content_type',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+    ]
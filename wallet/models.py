@@ -1,13 +1,22 @@
 #
 # File: /home/pirate/Documents/Projects/Better-auth/Sheba-Pass/Better-Hack-Sheba-Cred/wallet/models.py
 #
+import uuid
+
 from django.db import models
 from django.conf import settings
 
 # We must import the CredentialRecord model from our new 'institutions' app
 # so that we can create a relationship (ForeignKey) to it.
+from institutions.lookup import SUBSET_DIGESTS, subset_digests
 from institutions.models import CredentialRecord
 
+from .parser import PARSER_VERSION, text_digest
+
+
+# Documents not (yet) linked to a trusted record.
+PENDING = models.Q(verified_credential__isnull=True)
+
 
 class Document(models.Model):
     """
@@ -40,15 +49,183 @@ class Document(models.Model):
     # and for our future "fuzzy matching" logic.
     extracted_text = models.TextField(blank=True, null=True)
 
+    # SHA-256 of the uploaded bytes, computed while the upload streams in.
+    # Keys the OCR cache, so re-uploads of the same scan skip OCR.
+    content_hash = models.CharField(max_length=64, blank=True, default="", db_index=True)
+    # The type sniffed from the upload's magic bytes (see wallet.uploads), so
+    # the pipeline need not reopen the file to tell a PDF from an image.
+    content_type = models.CharField(max_length=50, blank=True, default="")
+
+    # The parser's output for `extracted_text`, kept so re-verification and
+    # analysis do not rerun the parser. `parser_version` and `text_digest`
+    # record what produced it; `reparse_documents` refreshes stale rows.
+    # An empty `parser_version` means the document was never parsed.
+    parsed_fields = models.JSONField(blank=True, null=True)
+    document_profile = models.CharField(max_length=32, blank=True, default="")
+    parser_version = models.CharField(max_length=32, blank=True, default="", db_index=True)
+    text_digest = models.CharField(max_length=64, blank=True, default="")
+
+    # The OCR tier (see wallet.verification.DEFAULT_OCR_TIERS) whose output
+    # parsed, empty if none did, and how many OCR passes it took; 0 passes
+    # means the output came from the OCR cache. `ocr_tier_report` sums them up.
+    ocr_tier = models.CharField(max_length=32, blank=True, default="", db_index=True)
+    ocr_passes = models.PositiveSmallIntegerField(default=0)
+
+    # The keys CredentialRecord is indexed by, computed from `parsed_fields`:
+    # the full hash and the field-subset digests, empty when the fields do not
+    # give one. When credentials are issued, unverified documents are looked
+    # up by them (see wallet.reverse_matching).
+    match_hash = models.CharField(max_length=64, blank=True, default="")
+    name_serial_digest = models.CharField(max_length=64, blank=True, default="")
+    name_date_digest = models.CharField(max_length=64, blank=True, default="")
+
+    # A record that a subset digest matched after upload, waiting for the
+    # holder to confirm it, as a CONFIRMATION_REQUIRED answer would.
+    suggested_credential = models.ForeignKey(
+        CredentialRecord,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="suggested_documents",
+    )
+
     # A timestamp that is automatically set when the document is first uploaded.
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    # Fields written by set_parse_result, for update_fields and bulk_update.
+    PARSE_FIELDS = ["parsed_fields", "document_profile", "parser_version", "text_digest", "match_hash"] + list(
+        SUBSET_DIGESTS
+    )
+
+    class Meta:
+        # Only unverified documents are ever looked up by these keys, so the
+        # indexes leave verified ones out.
+        indexes = [
+            models.Index(fields=["match_hash"], name="doc_pending_hash_idx", condition=PENDING),
+            models.Index(fields=["name_serial_digest"], name="doc_pending_name_serial_idx", condition=PENDING),
+            models.Index(fields=["name_date_digest"], name="doc_pending_name_date_idx", condition=PENDING),
+        ]
+
+    def set_parse_result(self, result):
+        """Store a `wallet.parser.ParseResult` computed from the current extracted_text."""
+        self.parsed_fields = result.fields
+        self.document_profile = result.profile
+        self.parser_version = PARSER_VERSION
+        self.text_digest = text_digest(self.extracted_text or "")
+        self.set_match_keys()
+
+    def set_match_keys(self):
+        """Recompute the match keys from parsed_fields."""
+        fields = self.parsed_fields or {}
+        self.match_hash = CredentialRecord.canonical_hash(fields) if fields else ""
+        for column, digest in subset_digests(fields).items():
+            setattr(self, column, digest)
+
+    @property
+    def parse_is_stale(self):
+        """True if the stored parse came from another parser version or other text."""
+        return self.parser_version != PARSER_VERSION or self.text_digest != text_digest(
+            self.extracted_text or ""
+        )
+
     def __str__(self):
         # This provides a dynamic, human-readable name based on the verification status.
         status = "Verified" if self.verified_credential else "Unverified"
         return f"Document from {self.user.email} ({status})"
 
 
+class VerificationJob(models.Model):
+    """
+    A queued verification of an uploaded document. The verify endpoint creates
+    one and answers 202 straight away; the `run_verification_worker` command
+    claims queued jobs and runs OCR, parsing and matching outside the request.
+    """
+
+    QUEUED = "QUEUED"
+    OCR = "OCR"
+    PARSING = "PARSING"
+    MATCHING = "MATCHING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (OCR, "Running OCR"),
+        (PARSING, "Parsing"),
+        (MATCHING, "Matching"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+    # States in which a worker holds the job.
+    RUNNING = (OCR, PARSING, MATCHING)
+
+    # The id handed to the client. A UUID, so job ids cannot be enumerated.
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name="verification_jobs")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+
+    # The response body the synchronous endpoint would have returned, and its
+    # HTTP status code.
+    result = models.JSONField(blank=True, null=True)
+    result_code = models.PositiveSmallIntegerField(blank=True, null=True)
+    error = models.TextField(blank=True, default="")
+
+    # Claim bookkeeping. A running job whose claim is older than the worker's
+    # lease is assumed abandoned and goes back to the queue.
+    attempts = models.PositiveSmallIntegerField(default=0)
+    claimed_by = models.CharField(max_length=100, blank=True, default="")
+    claimed_at = models.DateTimeField(blank=True, null=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "created_at"])]
+
+    def __str__(self):
+        return f"Verification job {self.id} ({self.status})"
+
+
+class OCRCacheEntry(models.Model):
+    """
+    OCR output and parse result for one uploaded file's content, keyed by the
+    SHA-256 of its bytes and the OCR engine/config version that produced it.
+
+    A PENDING row is a claim: the process that inserted it is running OCR for
+    that content, and other uploads of the same file wait for it to become
+    READY instead of running OCR again (see wallet.ocr_cache).
+    """
+
+    PENDING = "PENDING"
+    READY = "READY"
+    STATUS_CHOICES = [(PENDING, "Pending"), (READY, "Ready")]
+
+    content_hash = models.CharField(max_length=64)
+    engine_version = models.CharField(max_length=100)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+
+    extracted_text = models.TextField(blank=True, default="")
+    # Tesseract word boxes in layout extraction mode, so a newer parser can
+    # reparse the entry without running OCR again.
+    word_data = models.JSONField(blank=True, null=True)
+    parsed_fields = models.JSONField(blank=True, null=True)
+    document_profile = models.CharField(max_length=32, blank=True, default="")
+    parser_version = models.CharField(max_length=32, blank=True, default="")
+    ocr_tier = models.CharField(max_length=32, blank=True, default="")
+
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["content_hash", "engine_version"], name="unique_ocr_cache_key"),
+        ]
+
+    def __str__(self):
+        return f"OCR cache {self.content_hash[:12]} ({self.engine_version}, {self.status})"
+
+
 # NOTE: The old `VerifiableCredential` model that was previously in this file is now obsolete.
 # Its role has been fully replaced by the much more robust `CredentialRecord` model
 # in the 'institutions' app. We have deleted it.
@@ -0,0 +1,185 @@
+"""
+Content-addressed cache of OCR output and parse results.
+
+Entries are keyed by the SHA-256 of the uploaded bytes and the OCR engine
+version, so re-uploads of the same scan skip Tesseract entirely. Lookups are
+single-flight across processes: the first upload of some content inserts a
+PENDING row (the unique key makes that an atomic claim) and runs OCR; other
+uploads of the same content poll until the row is READY. A claim left behind
+by a crashed process expires after `pending_timeout` seconds.
+
+Entries remember the parser version of their parse result. A hit from an
+older parser is reparsed from the stored text or word boxes, which is cheap,
+and the entry is updated.
+"""
+
+import threading
+import time
+from datetime import timedelta
+from typing import Callable, Dict, NamedTuple, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OCRCacheEntry
+from .parser import PARSER_VERSION, ParseResult
+
+
+class OCROutput(NamedTuple):
+    text: str
+    word_data: Optional[dict]
+    parsed: ParseResult
+    # The OCR tier whose output parsed ("" if none did), and the OCR passes
+    # run to get here; 0 for output served from the cache.
+    tier: str = ""
+    passes: int = 0
+
+
+class OCRCacheStats:
+    """
+    Hit/miss counters for this process. `coalesced` counts lookups that waited
+    for another process's OCR of the same content instead of running their own.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = self.misses = self.coalesced = self.reparsed = self.bypassed = 0
+
+    def record(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "reparsed": self.reparsed,
+                "bypassed": self.bypassed,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+STATS = OCRCacheStats()
+
+# Inserts between opportunistic prunes, per process.
+PRUNE_EVERY = 500
+_inserts = 0
+
+
+def cache_enabled() -> bool:
+    return getattr(settings, "WALLET_OCR_CACHE", True)
+
+
+def _ready(entry: OCRCacheEntry, reparse: Callable[[str, Optional[dict]], ParseResult]) -> OCROutput:
+    now = timezone.now()
+    OCRCacheEntry.objects.filter(pk=entry.pk).update(hit_count=F("hit_count") + 1, last_used_at=now)
+    parsed = ParseResult(entry.parsed_fields, entry.document_profile)
+    if entry.parser_version != PARSER_VERSION:
+        parsed = reparse(entry.extracted_text, entry.word_data)
+        OCRCacheEntry.objects.filter(pk=entry.pk).update(
+            parsed_fields=parsed.fields, document_profile=parsed.profile, parser_version=PARSER_VERSION
+        )
+        STATS.record("reparsed")
+    return OCROutput(entry.extracted_text, entry.word_data, parsed, entry.ocr_tier)
+
+
+def fetch_or_compute(
+    content_hash: str,
+    engine_version: str,
+    compute: Callable[[], OCROutput],
+    reparse: Callable[[str, Optional[dict]], ParseResult],
+    wait_timeout: float = 120.0,
+    pending_timeout: float = 600.0,
+    poll_interval: float = 0.25,
+) -> OCROutput:
+    """
+    Return the cached OCR output for this content, or run `compute` once and
+    cache it. Concurrent callers with the same key wait up to `wait_timeout`
+    seconds for the first one to finish, then compute without the cache.
+    """
+    global _inserts
+    key = {"content_hash": content_hash, "engine_version": engine_version}
+    deadline = time.monotonic() + wait_timeout
+    waited = False
+    while True:
+        entry = OCRCacheEntry.objects.filter(**key).first()
+        if entry is not None and entry.status == OCRCacheEntry.READY:
+            if waited:
+                STATS.record("coalesced")
+            STATS.record("hits")
+            return _ready(entry, reparse)
+
+        if entry is None:
+            try:
+                with transaction.atomic():
+                    entry = OCRCacheEntry.objects.create(**key)
+            except IntegrityError:
+                continue  # Someone else claimed it between our read and insert.
+            STATS.record("misses")
+            try:
+                output = compute()
+            except BaseException:
+                entry.delete()  # Release the claim so a waiter can take over.
+                raise
+            OCRCacheEntry.objects.filter(pk=entry.pk).update(
+                status=OCRCacheEntry.READY,
+                extracted_text=output.text,
+                word_data=output.word_data,
+                parsed_fields=output.parsed.fields,
+                document_profile=output.parsed.profile,
+                parser_version=PARSER_VERSION,
+                ocr_tier=output.tier,
+                last_used_at=timezone.now(),
+            )
+            _inserts += 1
+            if _inserts % PRUNE_EVERY == 0:
+                prune()
+            return output
+
+        # PENDING: another process is running OCR for this content.
+        if entry.created_at < timezone.now() - timedelta(seconds=pending_timeout):
+            # Its owner died; drop the claim and race for a new one.
+            OCRCacheEntry.objects.filter(pk=entry.pk, status=OCRCacheEntry.PENDING).delete()
+            continue
+        if time.monotonic() >= deadline:
+            STATS.record("bypassed")
+            return compute()
+        waited = True
+        time.sleep(poll_interval)
+
+
+def prune(max_entries: Optional[int] = None, max_age_days: Optional[int] = None) -> int:
+    """
+    Evict entries unused for `max_age_days`, then the least recently used ones
+    beyond `max_entries`. Defaults come from WALLET_OCR_CACHE_MAX_ENTRIES and
+    WALLET_OCR_CACHE_MAX_AGE_DAYS. Returns the number of entries deleted.
+    """
+    if max_entries is None:
+        max_entries = getattr(settings, "WALLET_OCR_CACHE_MAX_ENTRIES", 50000)
+    if max_age_days is None:
+        max_age_days = getattr(settings, "WALLET_OCR_CACHE_MAX_AGE_DAYS", 90)
+
+    ready = OCRCacheEntry.objects.filter(status=OCRCacheEntry.READY)
+    deleted, _ = ready.filter(last_used_at__lt=timezone.now() - timedelta(days=max_age_days)).delete()
+    if max_entries <= 0:
+        return deleted + ready.delete()[0]
+    # The last-used time of the oldest entry that may stay. Entries sharing it
+    # survive too, so a few more than max_entries may be kept.
+    oldest_kept = ready.order_by("-last_used_at").values_list("last_used_at", flat=True)[max_entries - 1 : max_entries]
+    oldest_kept = next(iter(oldest_kept), None)
+    if oldest_kept is not None:
+        deleted += ready.filter(last_used_at__lt=oldest_kept).delete()[0]
+    return deleted
+
+
+def cache_stats() -> Dict[str, float]:
+    return STATS.snapshot()
@@ -0,0 +1,384 @@
+"""
+OCR engines behind the verify pipeline.
+
+`SubprocessEngine` is what we always did: pytesseract starts a `tesseract`
+process per call and passes the image through temp files, so every upload
+pays for process start-up and model load. `PooledEngine` keeps a few
+long-lived worker processes that load the model once and receive bitmaps
+over a pipe. Workers are recycled after `max_jobs_per_worker` jobs (bounding
+any leak in the native library), and a job that runs past `timeout` kills its
+worker, which is replaced on the next checkout.
+
+Inside a pool worker the model stays loaded only with the `tesserocr`
+bindings (libtesseract in-process); without them the worker falls back to
+pytesseract, which still saves the per-call Python-side setup but not the
+tesseract start-up. An engine's `version` names the backend as well as the
+tesseract release, so the OCR cache never mixes their output.
+
+The engine is chosen with the WALLET_OCR_ENGINE setting, e.g.
+`{"backend": "pool", "size": 4, "max_jobs_per_worker": 500, "timeout": 60}`.
+This module must stay importable without Django set up: pool workers may be
+spawned as fresh interpreters that import it.
+"""
+
+import atexit
+import multiprocessing
+import threading
+import time
+from typing import Callable, List, Optional
+
+import pytesseract
+from PIL import Image
+
+
+# The pytesseract `Output.DICT` columns that wallet.layout reads.
+WORD_DATA_KEYS = ("page_num", "block_num", "par_num", "line_num", "left", "top", "width", "height", "conf", "text")
+
+
+class OCREngineError(Exception):
+    """The engine failed to OCR an image."""
+
+
+class OCRTimeout(OCREngineError):
+    """OCR took longer than the engine's per-job timeout."""
+
+
+class OCREngine:
+    """Interface for OCR backends."""
+
+    #: Identifies the engine's output; part of the OCR cache key.
+    version = "unknown"
+
+    def image_to_string(self, image: Image.Image, config: str = "") -> str:
+        raise NotImplementedError
+
+    def image_to_data(self, image: Image.Image, config: str = "") -> dict:
+        """Word boxes in the shape of pytesseract's `Output.DICT`."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def _tesseract_version() -> str:
+    try:
+        return str(pytesseract.get_tesseract_version())
+    except Exception:
+        return "unknown"
+
+
+class PytesseractBackend:
+    """One `tesseract` process per call, via pytesseract."""
+
+    def __init__(self):
+        self.version = self.describe()
+
+    @staticmethod
+    def describe() -> str:
+        """The version an instance would report, without building one."""
+        return f"pytesseract/tesseract-{_tesseract_version()}"
+
+    def image_to_string(self, image, config=""):
+        return pytesseract.image_to_string(image, config=config)
+
+    def image_to_data(self, image, config=""):
+        return pytesseract.image_to_data(image, config=config, output_type=pytesseract.Output.DICT)
+
+
+class TesserocrBackend:
+    """libtesseract in-process via tesserocr; the model is loaded once."""
+
+    def __init__(self):
+        import tesserocr
+
+        self._tesserocr = tesserocr
+        self._api = tesserocr.PyTessBaseAPI()
+        self.version = self.describe()
+
+    @staticmethod
+    def describe() -> str:
+        """
+        The version an instance would report, without building one. Names the
+        bindings: they read config for `--psm` only, so their output differs
+        from the CLI's for the same flags. Raises ImportError without them.
+        """
+        import tesserocr
+
+        return f"tesserocr-{tesserocr.__version__}/tesseract-{tesserocr.tesseract_version().split()[1]}"
+
+    def _configure(self, config):
+        # Only the page segmentation mode is translated from CLI-style config.
+        parts = config.split()
+        psm = int(parts[parts.index("--psm") + 1]) if "--psm" in parts else 3
+        self._api.SetPageSegMode(psm)
+
+    def image_to_string(self, image, config=""):
+        self._configure(config)
+        self._api.SetImage(image)
+        return self._api.GetUTF8Text()
+
+    def image_to_data(self, image, config=""):
+        self._configure(config)
+        self._api.SetImage(image)
+        self._api.Recognize()
+        RIL = self._tesserocr.RIL
+        data = {key: [] for key in WORD_DATA_KEYS}
+        block = paragraph = line = 0
+        for item in self._tesserocr.iterate_level(self._api.GetIterator(), RIL.WORD):
+            if item.IsAtBeginningOf(RIL.BLOCK):
+                block, paragraph, line = block + 1, 0, 0
+            if item.IsAtBeginningOf(RIL.PARA):
+                paragraph, line = paragraph + 1, 0
+            if item.IsAtBeginningOf(RIL.TEXTLINE):
+                line += 1
+            box = item.BoundingBox(RIL.WORD)
+            if box is None:
+                continue
+            left, top, right, bottom = box
+            text = item.GetUTF8Text(RIL.WORD) or ""
+            row = (1, block, paragraph, line, left, top, right - left, bottom - top, item.Confidence(RIL.WORD), text)
+            for key, value in zip(WORD_DATA_KEYS, row):
+                data[key].append(value)
+        return data
+
+
+def default_backend():
+    """tesserocr when installed (model stays loaded), else pytesseract."""
+    try:
+        return TesserocrBackend()
+    except ImportError:
+        return PytesseractBackend()
+
+
+def backend_version(backend_factory: Callable) -> str:
+    """The version the backends `backend_factory` builds report, without building one."""
+    if backend_factory is default_backend:
+        try:
+            return TesserocrBackend.describe()
+        except ImportError:
+            return PytesseractBackend.describe()
+    describe = getattr(backend_factory, "describe", None)
+    return describe() if describe is not None else "unknown"
+
+
+class SubprocessEngine(OCREngine):
+    """The pytesseract subprocess path, in the calling process."""
+
+    def __init__(self):
+        self._backend = PytesseractBackend()
+        self.version = self._backend.version
+
+    def image_to_string(self, image, config=""):
+        return self._backend.image_to_string(image, config)
+
+    def image_to_data(self, image, config=""):
+        return self._backend.image_to_data(image, config)
+
+
+def _pack(image: Image.Image) -> tuple:
+    # Raw pixels: no PNG encode/decode or temp file on either side of the pipe.
+    if image.mode not in ("L", "RGB", "1"):
+        image = image.convert("RGB")
+    return image.mode, image.size, image.tobytes()
+
+
+def _worker_main(conn, backend_factory: Callable):
+    """Pool worker loop: build the backend once, then OCR bitmaps until told to stop."""
+    try:
+        backend = backend_factory()
+        conn.send(("ready", None))
+    except Exception as e:
+        conn.send(("error", f"backend failed to start: {e!r}"))
+        return
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        kind, (mode, size, pixels), config = message
+        try:
+            image = Image.frombytes(mode, size, pixels)
+            method = backend.image_to_data if kind == "data" else backend.image_to_string
+            conn.send(("ok", method(image, config)))
+        except Exception as e:
+            conn.send(("error", repr(e)))
+
+
+class _Worker:
+    def __init__(self, context, backend_factory, start_timeout: float):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, backend_factory), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+        if not self.conn.poll(start_timeout):
+            self.kill()
+            raise OCREngineError("OCR worker did not start in time.")
+        status, payload = self.conn.recv()
+        if status != "ready":
+            self.kill()
+            raise OCREngineError(payload)
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.kill()
+        self.conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class PooledEngine(OCREngine):
+    """
+    A pool of up to `size` warm OCR worker processes, shared by the threads of
+    this process. Workers start lazily (or all at once with `warm()`).
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        max_jobs_per_worker: int = 500,
+        timeout: float = 60.0,
+        acquire_timeout: Optional[float] = None,
+        backend_factory: Callable = default_backend,
+        start_method: str = "spawn",
+        start_timeout: float = 30.0,
+        version: Optional[str] = None,
+    ):
+        if size < 1:
+            raise ValueError("size must be at least 1.")
+        self.size = size
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.timeout = timeout
+        self.acquire_timeout = acquire_timeout
+        self.start_timeout = start_timeout
+        self._backend_factory = backend_factory
+        self._context = multiprocessing.get_context(start_method)
+        self._idle: List[_Worker] = []
+        self._live = 0
+        self._closed = False
+        self._available = threading.Condition()
+        # Workers run the same install, and so build the same backend, as this process.
+        self.version = version or backend_version(backend_factory)
+        self.recycled = self.timeouts = 0
+
+    def warm(self) -> "PooledEngine":
+        """Start every worker now, so the first requests do not pay for it."""
+        workers = [self._checkout() for _ in range(self.size)]
+        for worker in workers:
+            self._checkin(worker)
+        return self
+
+    def _checkout(self) -> _Worker:
+        deadline = None if self.acquire_timeout is None else time.monotonic() + self.acquire_timeout
+        with self._available:
+            while True:
+                if self._closed:
+                    raise OCREngineError("OCR engine is closed.")
+                if self._idle:
+                    return self._idle.pop()
+                if self._live < self.size:
+                    self._live += 1
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise OCRTimeout("No OCR worker became free in time.")
+                self._available.wait(remaining)
+        # Start the process outside the lock; other threads keep using the pool.
+        try:
+            worker = _Worker(self._context, self._backend_factory, self.start_timeout)
+        except Exception:
+            with self._available:
+                self._live -= 1
+                self._available.notify()
+            raise
+        return worker
+
+    def _checkin(self, worker: Optional[_Worker]):
+        """Return a worker to the pool; None means it died and its slot is free."""
+        if worker is not None and worker.jobs >= self.max_jobs_per_worker:
+            worker.stop()
+            worker = None
+            self.recycled += 1
+        with self._available:
+            if worker is None or self._closed:
+                self._live -= 1
+                if worker is not None:
+                    worker.stop()
+            else:
+                self._idle.append(worker)
+            self._available.notify()
+
+    def _run(self, kind: str, image: Image.Image, config: str):
+        worker = self._checkout()
+        try:
+            worker.conn.send((kind, _pack(image), config))
+            if not worker.conn.poll(self.timeout):
+                worker.kill()
+                worker = None
+                self.timeouts += 1
+                raise OCRTimeout(f"OCR did not finish within {self.timeout}s.")
+            status, payload = worker.conn.recv()
+        except (EOFError, OSError) as e:
+            if worker is not None:
+                worker.kill()
+                worker = None
+            raise OCREngineError(f"OCR worker died: {e!r}") from e
+        finally:
+            if worker is not None:
+                worker.jobs += 1
+            self._checkin(worker)
+        if status != "ok":
+            raise OCREngineError(payload)
+        return payload
+
+    def image_to_string(self, image, config=""):
+        return self._run("string", image, config)
+
+    def image_to_data(self, image, config=""):
+        return self._run("data", image, config)
+
+    def close(self):
+        with self._available:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._live -= len(idle)
+            self._available.notify_all()
+        for worker in idle:
+            worker.stop()
+
+
+_ENGINE: Optional[OCREngine] = None
+_ENGINE_LOCK = threading.Lock()
+
+
+def build_engine(options: dict) -> OCREngine:
+    options = dict(options)
+    backend = options.pop("backend", "subprocess")
+    if backend == "subprocess":
+        return SubprocessEngine()
+    if backend == "pool":
+        return PooledEngine(**options)
+    raise ValueError(f"Unknown OCR engine backend {backend!r}.")
+
+
+def get_engine() -> OCREngine:
+    """The process-wide engine configured by WALLET_OCR_ENGINE, built on first use."""
+    global _ENGINE
+    if _ENGINE is None:
+        from django.conf import settings
+
+        with _ENGINE_LOCK:
+            if _ENGINE is None:
+                _ENGINE = build_engine(getattr(settings, "WALLET_OCR_ENGINE", {}))
+                atexit.register(_ENGINE.close)
+    return _ENGINE
@@ -0,0 +1,162 @@
+"""
+Process-wide cap on concurrent OCR.
+
+Tesseract parallelises internally with OpenMP. When several requests each
+run OCR at once, the box runs (jobs x OpenMP threads) threads on its cores
+and tail latency explodes. The governor admits at most `limit` OCR jobs at a
+time, sets OMP_THREAD_LIMIT so each job uses `thread_limit` threads, and
+queues the rest. The queue is bounded and every wait has a deadline. A
+caller that would wait past its deadline is refused straight away with
+OCRBusy, which the verify endpoint turns into a retryable 503.
+
+The budget comes from the WALLET_OCR_GOVERNOR setting:
+
+    {"cpu_share": 0.75, "thread_limit": 1, "processes": 1,
+     "max_queue": 16, "max_wait": 10.0}
+
+`processes` is how many processes on the box run OCR (web workers plus
+verification workers); the core budget is split evenly between them.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+
+class OCRBusy(Exception):
+    """OCR capacity is exhausted; the caller should retry later."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class OCRGovernor:
+    def __init__(
+        self,
+        limit: int,
+        thread_limit: int = 1,
+        max_queue: int = 16,
+        max_wait: float = 10.0,
+        initial_job_seconds: float = 2.0,
+    ):
+        if limit < 1:
+            raise ValueError("limit must be at least 1.")
+        self.limit = limit
+        self.thread_limit = thread_limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._queued = 0
+        # Exponentially weighted mean OCR time, used to predict waits.
+        self._job_seconds = initial_job_seconds
+        self._waits = self._rejected = self._completed = 0
+        self._wait_total = self._wait_max = 0.0
+        # Tesseract (and pool workers started after this) read it at start-up.
+        os.environ["OMP_THREAD_LIMIT"] = str(thread_limit)
+
+    @classmethod
+    def from_settings(cls, options: dict, cpu_count: Optional[int] = None) -> "OCRGovernor":
+        options = dict(options)
+        cpu_share = options.pop("cpu_share", 0.75)
+        processes = options.pop("processes", 1)
+        thread_limit = options.get("thread_limit", 1)
+        cores = cpu_count or os.cpu_count() or 1
+        limit = options.pop("limit", None) or max(1, int(cores * cpu_share / (thread_limit * processes)))
+        return cls(limit, **options)
+
+    def predicted_wait(self) -> float:
+        """Seconds a new arrival would wait, from queue length and mean job time."""
+        with self._condition:
+            return self._predicted_wait()
+
+    def _predicted_wait(self) -> float:
+        if self._in_flight < self.limit:
+            return 0.0
+        # Everyone ahead, plus us, spread over `limit` slots.
+        return (self._queued + 1) * self._job_seconds / self.limit
+
+    @contextmanager
+    def slot(self, max_wait: Optional[float] = None):
+        """Hold one OCR slot for the duration of the block. Raises OCRBusy."""
+        max_wait = self.max_wait if max_wait is None else max_wait
+        self._acquire(max_wait)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - started)
+
+    def _reject(self, reason: str):
+        self._rejected += 1
+        raise OCRBusy(reason, retry_after=max(1.0, self._predicted_wait()))
+
+    def _acquire(self, max_wait: float):
+        with self._condition:
+            if self._in_flight < self.limit and not self._queued:
+                self._in_flight += 1
+                return
+            if self._queued >= self.max_queue:
+                self._reject(f"OCR queue is full ({self._queued} waiting).")
+            if self._predicted_wait() > max_wait:
+                self._reject(f"Predicted OCR wait exceeds {max_wait:.1f}s.")
+
+            self._queued += 1
+            arrived = time.monotonic()
+            deadline = arrived + max_wait
+            try:
+                while self._in_flight >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._reject(f"Waited {max_wait:.1f}s for an OCR slot.")
+                    self._condition.wait(remaining)
+            finally:
+                self._queued -= 1
+            self._in_flight += 1
+            waited = time.monotonic() - arrived
+            self._waits += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+    def _release(self, seconds: float):
+        with self._condition:
+            self._in_flight -= 1
+            self._completed += 1
+            self._job_seconds = 0.8 * self._job_seconds + 0.2 * seconds
+            self._condition.notify()
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._condition:
+            return {
+                "limit": self.limit,
+                "thread_limit": self.thread_limit,
+                "in_flight": self._in_flight,
+                "queue_depth": self._queued,
+                "max_queue": self.max_queue,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "waits": self._waits,
+                "mean_wait_ms": self._wait_total / self._waits * 1e3 if self._waits else 0.0,
+                "max_wait_ms": self._wait_max * 1e3,
+                "mean_job_ms": self._job_seconds * 1e3,
+                "predicted_wait_ms": self._predicted_wait() * 1e3,
+            }
+
+
+_GOVERNOR: Optional[OCRGovernor] = None
+_GOVERNOR_LOCK = threading.Lock()
+
+
+def get_governor() -> OCRGovernor:
+    """The process-wide governor configured by WALLET_OCR_GOVERNOR, built on first use."""
+    global _GOVERNOR
+    if _GOVERNOR is None:
+        from django.conf import settings
+
+        with _GOVERNOR_LOCK:
+            if _GOVERNOR is None:
+                _GOVERNOR = OCRGovernor.from_settings(getattr(settings, "WALLET_OCR_GOVERNOR", {}))
+    return _GOVERNOR
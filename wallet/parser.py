@@ -1,309 +1,933 @@
+import calendar
+import hashlib
+import json
+import os
 import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import Optional
+from functools import lru_cache, partial
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, TextIO, Tuple
+
+
+class FieldPattern(NamedTuple):
+    """
+    A precompiled extraction pattern for one field.
+
+    `keywords` are lowercase literals the pattern cannot match without; if none of
+    them occur in the case-folded text the regex is skipped entirely. An empty
+    set means the pattern is always tried. `needs_digit` does the same for
+    patterns whose capture group requires a digit.
+    """
+
+    name: str
+    regex: re.Pattern
+    keywords: frozenset = frozenset()
+    needs_digit: bool = False
+
+    def can_match(self, scan: "ScanText") -> bool:
+        if self.needs_digit and not scan.has_digit:
+            return False
+        return not self.keywords or not self.keywords.isdisjoint(scan.keywords)
+
+
+class ScanText(NamedTuple):
+    """Normalized text plus the cheap features computed once per document."""
+
+    text: str
+    keywords: frozenset
+    has_digit: bool
+
+
+def _compile(flags: int, *patterns) -> tuple:
+    """Compile (name, regex, keywords[, needs_digit]) rows into FieldPatterns."""
+    return tuple(
+        FieldPattern(name, re.compile(regex, flags), frozenset(keywords), *digit)
+        for name, regex, keywords, *digit in patterns
+    )
+
+
+def pattern_keywords(*pattern_groups) -> frozenset:
+    """Union of the gate keywords of every pattern in the given groups."""
+    return frozenset().union(*(p.keywords for group in pattern_groups for p in group))
+
+
+# Characters that re.IGNORECASE treats as equal to an ASCII letter but that
+# str.lower() does not fold onto it. Mapping them keeps keyword gating exact.
+_FOLD_EXTRA = str.maketrans({"İ": "i", "ı": "i", "ſ": "s"})
+
+_HORIZONTAL_SPACE = re.compile(r"[ \t]+")
+_BLANK_LINES = re.compile(r"\n\s*\n")
+_WHITESPACE = re.compile(r"\s+")
+_ARTIFACTS = re.compile(r"[_\-]{2,}")
+_DIGIT = re.compile(r"\d")
+_ORDINAL_SUFFIX = re.compile(r"(\d+)(?:st|nd|rd|th)")
+_YEAR = re.compile(r"\d{4}")
+
+_MONTHS = ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec")
+_MONTH_ALTERNATION = (
+    r"(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|Jun(?:e)?|Jul(?:y)?"
+    r"|Aug(?:ust)?|Sep(?:tember)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)"
+)
+
+NAME_PATTERNS = _compile(
+    re.IGNORECASE | re.MULTILINE,
+    # Pattern 1: Explicit labels (most common)
+    ("label_name", r"(?:Full\s+)?Name\s*[:：]\s*([A-Z][A-Za-z\s\.'-]{2,50})", ("name",)),
+    ("label_role_name", r"(?:Student|Recipient|Candidate)\s+Name\s*[:：]\s*([A-Z][A-Za-z\s\.'-]{2,50})", ("name",)),
+    ("label_name_of_role", r"(?:Name\s+of\s+(?:Student|Recipient|Candidate))\s*[:：]\s*([A-Z][A-Za-z\s\.'-]{2,50})", ("name",)),
+    ("label_amharic_name", r"ስም\s*[:：]\s*([A-Z][A-Za-z\s\.'-]{2,50})", ("ስም",)),  # Amharic "Name"
+    # Ethiopian ID specific patterns
+    ("id_name", r"Name[:\s]+([A-Z][a-z]+\s+[A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)", ("name",)),
+    ("id_amharic_full_name", r"(?:የሙሉ\s+ስም|ስም)\s*[:：]?\s*([A-Z][A-Za-z\s\.'-]{2,50})", ("ስም",)),  # Full name in Amharic
+    # Pattern 2: Ceremonial phrases
+    ("certify_that", r"(?:This\s+(?:is\s+to\s+)?certif(?:y|ies)\s+that)\s+([A-Z][A-Za-z\s\.'-]{2,50})\s+(?:has|have)", ("certif",)),
+    ("presented_to", r"(?:Presented\s+to|Awarded\s+to|Granted\s+to)\s+([A-Z][A-Za-z\s\.'-]{2,50})", ("presented", "awarded", "granted")),
+    ("conferred_on", r"(?:Hereby\s+conferred\s+(?:up)?on)\s+([A-Z][A-Za-z\s\.'-]{2,50})", ("hereby",)),
+    ("be_it_known", r"(?:Be\s+it\s+known\s+that)\s+([A-Z][A-Za-z\s\.'-]{2,50})", ("known",)),
+)
+
+_DATE_VALUE = r"(\d{1,2}[-/\.]\d{1,2}[-/\.]\d{2,4})"
+
+DATE_PATTERNS = _compile(
+    re.IGNORECASE,
+    # Pattern 1: Labeled dates
+    ("label_issue_date", r"(?:Issue(?:d)?\s+(?:Date|On)|Date\s+(?:of\s+)?Issue(?:d)?)\s*[:：]\s*" + _DATE_VALUE, ("issue",), True),
+    ("label_date", r"(?:Date|Dated|Date\s+of\s+Award)\s*[:：]\s*" + _DATE_VALUE, ("date",), True),
+    ("label_graduation_date", r"(?:Graduation\s+Date|Completion\s+Date)\s*[:：]\s*" + _DATE_VALUE, ("graduation", "completion"), True),
+    ("label_amharic_date", r"(?:የተሰጠበት\s+ቀን|ቀን)\s*[:：]\s*" + _DATE_VALUE, ("ቀን",), True),  # Amharic "Date"
+    # Ethiopian ID specific patterns
+    ("id_birth_date", r"(?:DOB|Date\s+of\s+Birth|Birth\s+Date)\s*[:：]\s*" + _DATE_VALUE, ("dob", "birth"), True),
+    ("id_expiry_date", r"(?:Expiry\s+Date|Valid\s+Date|Validity)\s*[:：]\s*" + _DATE_VALUE, ("expiry", "valid"), True),
+    ("id_admission_date", r"(?:Admission|Admission\s+Date)\s*[:：]\s*" + _DATE_VALUE, ("admission",), True),
+    ("id_amharic_birth_date", r"(?:የትውልድ\s+ቀን)\s*[:：]?\s*" + _DATE_VALUE, ("ቀን",), True),  # Birth date in Amharic
+    # Pattern 2: Written dates
+    ("written_labeled", r"(?:Issue(?:d)?|Date(?:d)?|Awarded)\s*[:：]?\s*(\d{1,2}\s+" + _MONTH_ALTERNATION + r"[a-z]*\s+\d{2,4})", ("issue", "date", "awarded"), True),
+    ("written", r"(\d{1,2}(?:st|nd|rd|th)?\s+(?:of\s+)?" + _MONTH_ALTERNATION + r"[a-z]*,?\s+\d{2,4})", _MONTHS, True),
+    # Pattern 3: ISO and standard formats
+    ("iso", r"\b(\d{4}-\d{2}-\d{2})\b", ("-",), True),  # ISO: 2024-01-15
+    ("slashed", r"\b(\d{1,2}/\d{1,2}/\d{4})\b", ("/",), True),  # US/Ethiopian: 01/15/2024
+    ("dotted", r"\b(\d{1,2}\.\d{1,2}\.\d{4})\b", (".",), True),  # European: 15.01.2024
+)
+
+TITLE_PATTERNS = _compile(
+    re.IGNORECASE | re.MULTILINE,
+    # Pattern 1: Certificate type with "of/in"
+    ("type_of", r"(?:Certificate|Diploma|Degree|Award)\s+(?:of|in)\s+([A-Za-z\s&,]+?)(?:\n|is\s+(?:hereby|awarded)|has\s+been)", ("certificate", "diploma", "degree", "award")),
+    ("degree_in", r"(?:Bachelor|Master|Doctor|PhD|B\.?Sc|M\.?Sc|B\.?A|M\.?A)\s+(?:of|in|degree\s+in)\s+([A-Za-z\s&,]+?)(?:\n|$|,)", ("doctor", "phd", "ba", "b.a", "ma", "m.a", "bsc", "b.sc", "msc", "m.sc")),
+    # Pattern 2: Labeled title
+    ("label_title", r"(?:Certificate\s+)?Title\s*[:：]\s*([A-Za-z\s&,\-]+?)(?:\n|Date|Serial|$)", ("title",)),
+    ("label_program", r"(?:Program|Course|Field\s+of\s+Study)\s*[:：]\s*([A-Za-z\s&,\-]+?)(?:\n|Date|$)", ("program", "course", "study")),
+    ("label_type", r"(?:Credential\s+Type|Type)\s*[:：]\s*([A-Za-z\s&,\-]+?)(?:\n|$)", ("type",)),
+    # Ethiopian ID specific patterns
+    ("id_level", r"(?:Study\s+Level|Level)\s*[:：]\s*([A-Za-z\s&,\-]+?)(?:\n|$)", ("level",)),
+    ("id_single_letter", r"(?:Blood\s+Type|Gender|Sex|Nationality)\s*[:：]\s*([A-Z])", ("type", "gender", "sex", "nationality")),  # Single letter fields
+    # Pattern 3: Document header (first line often contains title)
+    ("header", r"^([A-Z][A-Za-z\s]+(?:Certificate|Diploma|Award|Degree|Transcript))", ("certificate", "diploma", "award", "degree", "transcript")),
+    ("header_of", r"((?:Certificate|Diploma|Award)\s+of\s+[A-Za-z\s]+)", ("certificate", "diploma", "award")),
+    # Ethiopian ID types
+    ("driver_license", r"(Ethiopian\s+(?:Driver|Driving)\s+License)", ("ethiopian",)),
+    ("national_id", r"(Ethiopian\s+(?:National\s+)?(?:Digital\s+)?ID\s+Card)", ("ethiopian",)),
+    ("student_id", r"(Student\s+Identification)", ("identification",)),
+)
+
+SERIAL_PATTERNS = _compile(
+    re.IGNORECASE,
+    # Pattern 1: Labeled serial numbers
+    ("label_serial", r"(?:Serial\s+(?:Number|No\.?|#)|Certificate\s+(?:Number|No\.?|#)|ID\s+(?:Number|No\.?)?)\s*[:：]\s*([A-Z0-9\-/]+)", ("serial", "certificate", "id")),
+    ("label_reference", r"(?:Credential\s+ID|Document\s+ID|Reference\s+(?:Number|No))\s*[:：]\s*([A-Z0-9\-/]+)", ("credential", "document", "reference")),
+    ("label_registration", r"(?:Registration\s+(?:Number|No)|Reg\.?\s+No\.?)\s*[:：]\s*([A-Z0-9\-/]+)", ("reg",)),
+    ("label_amharic_serial", r"(?:ተ\.ቁ|መ\.ቁ)\s*[:：]\s*([A-Z0-9\-/]+)", ("ተ.ቁ", "መ.ቁ")),  # Amharic abbreviations for serial number
+    # Ethiopian ID specific patterns
+    ("id_license_number", r"(?:License\s+No|License\s+Number)\s*[:：]?\s*([A-Z0-9\-/]+)", ("license",)),
+    ("id_student_number", r"(?:UGR|Student\s+ID)\s*[:：]?\s*([A-Z0-9\-/]+)", ("ugr", "student")),
+    ("id_card_number", r"(?:ID\s+Card|National\s+ID)\s*[:：]?\s*([A-Z0-9\-/]+)", ("card", "national")),
+    # Pattern 2: Common serial formats
+    ("format_prefixed", r"\b([A-Z]{2,4}[-/]\d{4,}[-/][A-Z0-9]+)\b", (), True),  # CERT-2024-ABC123
+    ("format_letters_digits", r"\b([A-Z]{3,}\d{4,})\b", (), True),  # CERT2024123 or UGR575614
+    ("format_year_number", r"\b(\d{4}[-/]\d{4,})\b", ("-", "/"), True),  # 2024-123456
+    ("format_slashed", r"\b([A-Z]{2,}/\d{2,}/\d{4,})\b", ("/",), True),  # ET/24/12345
+    ("format_digits", r"\b(\d{6,})\b", (), True),  # 662194 (6+ digit numbers)
+    # Barcode patterns (long numeric sequences)
+    ("format_barcode", r"\b(\d{12,})\b", (), True),  # 628467391861420 (barcode numbers)
+    # Pattern 3: Generic number after keywords
+    ("generic_number", r"(?:No\.?|Number|#)\s*[:：]?\s*([A-Z0-9\-/]{5,})", ("no", "number", "#")),
+)
+
+INSTITUTION_PATTERNS = _compile(
+    re.IGNORECASE,
+    ("label_issuer", r"(?:Issued\s+by|Awarded\s+by|From)\s*[:：]\s*([A-Z][A-Za-z\s&,\.]+(?:University|College|Institute|Academy|School))", ("by", "from")),
+    ("institution_suffix", r"([A-Z][A-Za-z\s&,\.]+(?:University|College|Institute|Academy|School))", ("university", "college", "institute", "academy", "school")),
+    ("label_institution", r"(?:Institution|Organization)\s*[:：]\s*([A-Z][A-Za-z\s&,\.]+)", ("institution", "organization")),
+    # Ethiopian institutions
+    ("aau", r"(Addis\s+Ababa\s+University)", ("addis",)),
+    ("aau_amharic", r"(የአዲስ\s+አበባ\s+ዩኒቨርሲቲ)", ("የአዲስ",)),  # Addis Ababa University in Amharic
+    ("transport_authority", r"(Ethiopian\s+(?:Transport|Road)\s+Authority)", ("ethiopian",)),
+    ("fdre", r"(Federal\s+Democratic\s+Republic\s+of\s+Ethiopia)", ("federal",)),
+)
+
+GRADE_PATTERNS = _compile(
+    re.IGNORECASE,
+    ("label_grade", r"(?:Grade|GPA|CGPA|Score)\s*[:：]\s*([\d\.]+(?:/[\d\.]+)?)", ("grade", "gpa", "score")),
+    ("with_grade", r"(?:With\s+(?:a\s+)?(?:grade\s+of|GPA\s+of))\s*([\d\.]+)", ("with",)),
+    ("classification", r"(?:Distinction|First\s+Class|Second\s+Class|Pass)", ("distinction", "class", "pass")),
+)
+
+
+def scan_text(text: str, keywords: frozenset) -> ScanText:
+    """
+    Fold the text once and record which of `keywords` occur in it, so gating a
+    pattern afterwards is a set intersection rather than another pass over the text.
+    """
+    folded = text.lower() if text.isascii() else text.translate(_FOLD_EXTRA).lower()
+    present = frozenset(keyword for keyword in keywords if keyword in folded)
+    return ScanText(text, present, _DIGIT.search(text) is not None)
+
+
+def normalize_text(text: str) -> str:
+    """Collapse horizontal whitespace and blank lines, preserving line structure."""
+    text = _HORIZONTAL_SPACE.sub(" ", text)
+    return _BLANK_LINES.sub("\n", text)
+
+
+def finalize_fields(extracted_data: dict) -> Optional[dict]:
+    """
+    Apply the parse contract shared by every extraction path: require a name
+    and one identifier (serial or title), and drop fields that were not found.
+    """
+    # Validation: require at minimum name and one identifier (serial or title)
+    if extracted_data["full_name"] and (extracted_data["serial_number"] or extracted_data["certificate_title"]):
+        # Clean up None values for optional fields
+        return {k: v for k, v in extracted_data.items() if v is not None}
+
+    return None
+
+
+class CredentialParser:
+    """
+    Extraction engine behind `parse_credential_from_text`.
+
+    Every pattern is compiled once at import time and grouped per field in
+    priority order. For each field the first pattern (in order) whose first
+    match passes validation wins, which is exactly the behaviour of trying the
+    patterns one `re.search` at a time. What the engine adds is gating: the
+    text is case-folded once per document and checked for every gate keyword,
+    and any pattern whose keywords are absent is skipped without scanning the
+    text, so a typical document only runs a handful of the ~40 regexes.
+
+    Patterns are deliberately not merged into one alternation: a combined
+    regex returns the leftmost match of any alternative, not the first match
+    of the highest-priority one, which would change the results.
+    """
+
+    def __init__(
+        self,
+        name_patterns=NAME_PATTERNS,
+        date_patterns=DATE_PATTERNS,
+        title_patterns=TITLE_PATTERNS,
+        serial_patterns=SERIAL_PATTERNS,
+    ):
+        self.name_patterns = name_patterns
+        self.date_patterns = date_patterns
+        self.title_patterns = title_patterns
+        self.serial_patterns = serial_patterns
+        self.keywords = pattern_keywords(name_patterns, date_patterns, title_patterns, serial_patterns)
+
+    def parse(self, text: str) -> Optional[dict]:
+        if not text or len(text.strip()) < 10:
+            return None
+        return self.parse_scan(scan_text(normalize_text(text), self.keywords))
+
+    def parse_scan(self, scan: ScanText) -> Optional[dict]:
+        """Parse an already normalized and scanned document."""
+        return finalize_fields(self.extract_scan(scan))
+
+    def extract_scan(self, scan: ScanText) -> dict:
+        """Every field found in a scanned document, None where missing, before the parse contract."""
+        # Extract only required fields
+        return {
+            "full_name": self._first("name", self.name_patterns, scan, _clean_name),
+            "serial_number": self._first("serial", self.serial_patterns, scan, _clean_serial),
+            "issued_date": self._first("date", self.date_patterns, scan, _clean_date),
+            "certificate_title": self._first("title", self.title_patterns, scan, _clean_title),
+        }
+
+    def extract_name(self, text: str) -> Optional[str]:
+        return self._first("name", self.name_patterns, scan_text(text, self.keywords), _clean_name)
+
+    def extract_date(self, text: str) -> Optional[str]:
+        return self._first("date", self.date_patterns, scan_text(text, self.keywords), _clean_date)
+
+    def extract_certificate_title(self, text: str) -> Optional[str]:
+        return self._first("title", self.title_patterns, scan_text(text, self.keywords), _clean_title)
+
+    def extract_serial_number(self, text: str) -> Optional[str]:
+        return self._first("serial", self.serial_patterns, scan_text(text, self.keywords), _clean_serial)
+
+    def _first(self, field: str, patterns, scan: ScanText, clean) -> Optional[str]:
+        """Return the cleaned capture of the first pattern whose match validates."""
+        for pattern in patterns:
+            if not pattern.can_match(scan):
+                continue
+            match = pattern.regex.search(scan.text)
+            if match:
+                value = clean(match)
+                if value:
+                    return value
+        return None
+
+
+class PatternStats:
+    """Counters for one pattern. `seconds` covers the search plus validation."""
+
+    __slots__ = ("tried", "skipped", "matched", "won", "seconds")
+
+    def __init__(self):
+        self.tried = self.skipped = self.matched = self.won = 0
+        self.seconds = 0.0
+
+
+class ParserStats:
+    """
+    In-process aggregate of what an InstrumentedCredentialParser did.
+
+    Each extraction is timed into local variables and merged under a lock
+    once per field, so the overhead stays at a couple of perf_counter calls
+    per tried pattern.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.patterns: Dict[Tuple[str, str], PatternStats] = {}
+        self.fields: Dict[str, List[int]] = {}
+        self.profiles: Dict[str, int] = {}
+
+    def record_profile(self, profile: str):
+        with self._lock:
+            self.profiles[profile] = self.profiles.get(profile, 0) + 1
+
+    def record(self, field: str, attempts: list, winner: Optional[str]):
+        """Merge one extraction: `attempts` is a list of (pattern, matched, seconds or None if skipped)."""
+        with self._lock:
+            totals = self.fields.setdefault(field, [0, 0])
+            totals[0] += 1
+            totals[1] += winner is not None
+            for name, matched, seconds in attempts:
+                stats = self.patterns.get((field, name))
+                if stats is None:
+                    stats = self.patterns[(field, name)] = PatternStats()
+                if seconds is None:
+                    stats.skipped += 1
+                    continue
+                stats.tried += 1
+                stats.matched += matched
+                stats.won += name == winner
+                stats.seconds += seconds
+
+    def reset(self):
+        with self._lock:
+            self.patterns.clear()
+            self.fields.clear()
+            self.profiles.clear()
+
+    def snapshot(self) -> dict:
+        """Plain-data copy of the counters, patterns ranked by total time spent."""
+        with self._lock:
+            patterns = [
+                {
+                    "field": field,
+                    "pattern": name,
+                    "tried": stats.tried,
+                    "skipped": stats.skipped,
+                    "matched": stats.matched,
+                    "won": stats.won,
+                    "seconds": stats.seconds,
+                }
+                for (field, name), stats in self.patterns.items()
+            ]
+            fields = {
+                field: {"extractions": extractions, "hits": hits}
+                for field, (extractions, hits) in self.fields.items()
+            }
+            profiles = dict(self.profiles)
+        patterns.sort(key=lambda row: row["seconds"], reverse=True)
+        return {"fields": fields, "profiles": profiles, "patterns": patterns}
+
+    def export(self, stream: TextIO):
+        """Write the snapshot as JSON, e.g. to a file or stdout."""
+        json.dump(self.snapshot(), stream, indent=2)
+
+
+class InstrumentedCredentialParser(CredentialParser):
+    """CredentialParser that records per-pattern tries, wins and time in `stats`."""
+
+    def __init__(self, stats: Optional[ParserStats] = None, **patterns):
+        super().__init__(**patterns)
+        self.stats = stats or ParserStats()
+
+    def _first(self, field: str, patterns, scan: ScanText, clean) -> Optional[str]:
+        attempts = []
+        result = winner = None
+        for pattern in patterns:
+            if not pattern.can_match(scan):
+                attempts.append((pattern.name, False, None))
+                continue
+            start = time.perf_counter()
+            match = pattern.regex.search(scan.text)
+            value = clean(match) if match else None
+            attempts.append((pattern.name, match is not None, time.perf_counter() - start))
+            if value:
+                result, winner = value, pattern.name
+                break
+        self.stats.record(field, attempts, winner)
+        return result
+
+
+def _clean_name(match: re.Match) -> Optional[str]:
+    name = match.group(1).strip()
+    # Clean up common OCR artifacts
+    name = _WHITESPACE.sub(" ", name)
+    name = _ARTIFACTS.sub("", name)
+    # Validate: 2-5 words, reasonable length
+    if 2 <= len(name.split()) <= 5 and 5 <= len(name) <= 60:
+        return name
+    return None
+
+
+def _clean_date(match: re.Match) -> Optional[str]:
+    return normalize_date(match.group(1).strip())
+
+
+def _clean_title(match: re.Match) -> Optional[str]:
+    title = match.group(1).strip()
+    title = _WHITESPACE.sub(" ", title)
+    title = _ARTIFACTS.sub("", title)
+    # Validate length (allow single chars for gender/blood type)
+    if 1 <= len(title) <= 100:
+        return title
+    return None
+
+
+def _clean_serial(match: re.Match) -> Optional[str]:
+    serial = match.group(1).strip().upper()
+    # Validate: should have mix of letters/numbers or be long enough
+    if len(serial) >= 4 and (_DIGIT.search(serial) or len(serial) >= 6):
+        return serial
+    return None
+
+
+def _clean_institution(match: re.Match) -> Optional[str]:
+    institution = match.group(1).strip()
+    if 5 <= len(institution) <= 100:
+        return institution
+    return None
+
+
+def _clean_grade(match: re.Match) -> Optional[str]:
+    return match.group(1).strip() if match.lastindex else match.group(0).strip()
+
+
+GENERIC_PROFILE = "generic"
+
+
+def _subset(patterns: tuple, *names: str) -> tuple:
+    """The named patterns, kept in the generic priority order."""
+    unknown = set(names) - {pattern.name for pattern in patterns}
+    if unknown:
+        raise ValueError(f"Unknown patterns: {sorted(unknown)}")
+    return tuple(pattern for pattern in patterns if pattern.name in names)
+
+
+class DocumentProfile(NamedTuple):
+    """
+    A document type: the weighted signals that identify it and the pattern
+    subset it parses with. `signals` are lowercase literals matched against
+    the case-folded, whitespace-normalized text.
+    """
+
+    name: str
+    signals: Dict[str, int]
+    patterns: Dict[str, tuple]
+
+
+_ID_NAME_PATTERNS = _subset(NAME_PATTERNS, "label_name", "label_amharic_name", "id_name", "id_amharic_full_name")
+_ID_DATE_PATTERNS = _subset(
+    DATE_PATTERNS,
+    "label_issue_date", "label_date", "label_amharic_date", "id_birth_date", "id_expiry_date",
+    "id_amharic_birth_date", "written_labeled", "written", "iso", "slashed", "dotted",
+)
+
+DOCUMENT_PROFILES = (
+    DocumentProfile(
+        "certificate",
+        {
+            "certificate": 2, "certify": 2, "diploma": 2, "degree": 2, "transcript": 3,
+            "bachelor": 2, "master of": 2, "conferred": 2, "registrar": 2, "awarded": 1,
+            "presented to": 1, "graduation": 1, "gpa": 1, "university": 1,
+        },
+        {
+            "name_patterns": _subset(
+                NAME_PATTERNS,
+                "label_name", "label_role_name", "label_name_of_role", "label_amharic_name",
+                "certify_that", "presented_to", "conferred_on", "be_it_known",
+            ),
+            "date_patterns": _subset(
+                DATE_PATTERNS,
+                "label_issue_date", "label_date", "label_graduation_date", "label_amharic_date",
+                "written_labeled", "written", "iso", "slashed", "dotted",
+            ),
+            "title_patterns": _subset(
+                TITLE_PATTERNS,
+                "type_of", "degree_in", "label_title", "label_program", "label_type", "header", "header_of",
+            ),
+            "serial_patterns": _subset(
+                SERIAL_PATTERNS,
+                "label_serial", "label_reference", "label_registration", "label_amharic_serial",
+                "id_student_number", "format_prefixed", "format_letters_digits", "format_year_number",
+                "format_slashed", "format_digits", "format_barcode", "generic_number",
+            ),
+        },
+    ),
+    DocumentProfile(
+        "driver_license",
+        {
+            "driver license": 3, "driving license": 3, "driving licence": 3, "መንጃ ፈቃድ": 3,
+            "license no": 2, "transport authority": 2, "road authority": 2, "blood type": 1,
+        },
+        {
+            "name_patterns": _ID_NAME_PATTERNS,
+            "date_patterns": _ID_DATE_PATTERNS,
+            "title_patterns": _subset(TITLE_PATTERNS, "label_type", "id_single_letter", "driver_license"),
+            "serial_patterns": _subset(
+                SERIAL_PATTERNS,
+                "label_serial", "id_license_number", "format_prefixed", "format_letters_digits",
+                "format_digits", "format_barcode", "generic_number",
+            ),
+        },
+    ),
+    DocumentProfile(
+        "national_id",
+        {
+            "national id": 3, "digital id": 3, "fayda": 3, "ብሔራዊ መታወቂያ": 3,
+            "id card": 2, "nationality": 1, "date of birth": 1,
+        },
+        {
+            "name_patterns": _ID_NAME_PATTERNS,
+            "date_patterns": _ID_DATE_PATTERNS,
+            "title_patterns": _subset(TITLE_PATTERNS, "label_type", "id_single_letter", "national_id"),
+            "serial_patterns": _subset(
+                SERIAL_PATTERNS,
+                "label_serial", "id_card_number", "format_letters_digits", "format_digits",
+                "format_barcode", "generic_number",
+            ),
+        },
+    ),
+    DocumentProfile(
+        "student_id",
+        {"student identification": 3, "ugr": 3, "student id": 2, "admission": 1, "study level": 1, "id card": 1},
+        {
+            "name_patterns": _subset(NAME_PATTERNS, "label_name", "label_role_name", "id_name"),
+            "date_patterns": _subset(
+                DATE_PATTERNS,
+                "label_issue_date", "label_date", "id_birth_date", "id_expiry_date", "id_admission_date",
+                "written_labeled", "written", "iso", "slashed", "dotted",
+            ),
+            "title_patterns": _subset(TITLE_PATTERNS, "label_program", "label_type", "id_level", "student_id"),
+            "serial_patterns": _subset(
+                SERIAL_PATTERNS,
+                "label_serial", "label_registration", "id_student_number", "format_prefixed",
+                "format_letters_digits", "format_slashed", "format_digits", "generic_number",
+            ),
+        },
+    ),
+)
+
+
+class ParseResult(NamedTuple):
+    """Parsed fields (None when required fields are missing) and the profile used."""
+
+    fields: Optional[dict]
+    profile: str
+
+
+class ProfiledCredentialParser:
+    """
+    Routes each document to the pattern set of its type.
+
+    A first-stage classifier scores every profile by the weighted signals
+    present in the text. The signals are folded into the same keyword scan
+    the pattern gates use, so classification costs no extra pass. When no
+    profile reaches `min_score`, or the top two tie, the document goes through
+    the generic parser with the full pattern union.
+
+    Passing `stats` builds instrumented parsers that record into it.
+    """
+
+    def __init__(self, profiles=DOCUMENT_PROFILES, min_score: int = 3, stats: Optional[ParserStats] = None):
+        make_parser = CredentialParser if stats is None else partial(InstrumentedCredentialParser, stats)
+        self.stats = stats
+        self.profiles = profiles
+        self.min_score = min_score
+        self.generic = make_parser()
+        self.parsers = {profile.name: make_parser(**profile.patterns) for profile in profiles}
+        self.keywords = self.generic.keywords.union(*(profile.signals for profile in profiles))
+
+    def classify_scan(self, scan: ScanText) -> str:
+        scores = sorted(
+            (
+                (sum(weight for signal, weight in profile.signals.items() if signal in scan.keywords), profile.name)
+                for profile in self.profiles
+            ),
+            reverse=True,
+        )
+        if not scores:
+            return GENERIC_PROFILE
+        best_score, best = scores[0]
+        runner_up = scores[1][0] if len(scores) > 1 else 0
+        if best_score >= self.min_score and best_score > runner_up:
+            return best
+        return GENERIC_PROFILE
+
+    def classify(self, text: str) -> str:
+        return self.classify_scan(scan_text(normalize_text(text or ""), self.keywords))
+
+    def parse(self, text: str) -> ParseResult:
+        if not text or len(text.strip()) < 10:
+            return ParseResult(None, GENERIC_PROFILE)
+        scan = scan_text(normalize_text(text), self.keywords)
+        profile = self.classify_scan(scan)
+        if self.stats is not None:
+            self.stats.record_profile(profile)
+        parser = self.parsers.get(profile, self.generic)
+        return ParseResult(parser.parse_scan(scan), profile)
+
+
+# Persisted parse results record the version that produced them (see the
+# reparse_documents command). Pattern and profile edits change the fingerprint
+# on their own; bump PARSER_REVISION for changes that alter output without
+# touching them, such as cleaners, validation or date normalization.
+PARSER_REVISION = 1
+
+
+def _parser_fingerprint() -> str:
+    digest = hashlib.sha256()
+    tables = (NAME_PATTERNS, DATE_PATTERNS, TITLE_PATTERNS, SERIAL_PATTERNS, INSTITUTION_PATTERNS, GRADE_PATTERNS)
+    for patterns in tables:
+        for pattern in patterns:
+            digest.update(f"{pattern.name}\0{pattern.regex.pattern}\0{pattern.regex.flags}\n".encode("utf-8"))
+    for profile in DOCUMENT_PROFILES:
+        names = {kwarg: [pattern.name for pattern in patterns] for kwarg, patterns in profile.patterns.items()}
+        digest.update(json.dumps([profile.name, profile.signals, names], sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+PARSER_VERSION = f"{PARSER_REVISION}.{_parser_fingerprint()}"
+
+
+def text_digest(text: str) -> str:
+    """SHA-256 of the OCR text a parse result was computed from."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+_PARSER = ProfiledCredentialParser()
+# Not instrumented, so partial extractions do not count in parser stats.
+_FIELD_EXTRACTOR = CredentialParser()
+_INSTITUTION_KEYWORDS = pattern_keywords(INSTITUTION_PATTERNS)
+_GRADE_KEYWORDS = pattern_keywords(GRADE_PATTERNS)
+
+
+def enable_instrumentation(stats: Optional[ParserStats] = None) -> ParserStats:
+    """
+    Route the module-level parsing functions through instrumented parsers
+    and return the stats object they record into. Only this process is
+    affected; `parse_many` workers are not instrumented.
+    """
+    global _PARSER
+    _PARSER = ProfiledCredentialParser(stats=stats or ParserStats())
+    return _PARSER.stats
+
+
+def disable_instrumentation():
+    global _PARSER
+    _PARSER = ProfiledCredentialParser()
+
+
+def parser_stats() -> Optional[ParserStats]:
+    """The active ParserStats, or None when instrumentation is off."""
+    return _PARSER.stats
+
+
+def parse_document(text: str) -> ParseResult:
+    """
+    Classify the document and parse it with its profile's patterns. Returns
+    the fields `parse_credential_from_text` would return plus the profile name.
+    """
+    return _PARSER.parse(text)
+
+
+def extract_fields(text: str) -> dict:
+    """
+    The fields the full pattern union finds in `text`, None where missing,
+    whether or not they make a complete parse. Lets multi-page documents
+    tell which page completes the fields without parsing the pages read so
+    far again after every page.
+    """
+    return _FIELD_EXTRACTOR.extract_scan(scan_text(normalize_text(text or ""), _FIELD_EXTRACTOR.keywords))
+
+
+def classify_document(text: str) -> str:
+    """The document profile `parse_document` would use for this text."""
+    return _PARSER.classify(text)
 
 
 def parse_credential_from_text(text: str) -> Optional[dict]:
     """
     Comprehensive OCR parser for extracting structured credential data from certificates.
-    
+
     Supports multiple document types:
     - Academic certificates (degrees, diplomas, transcripts)
     - Professional certifications
     - ID cards (student IDs, national IDs)
     - Membership cards
     - Ethiopian and international formats
-    
+
     Extracts:
     - full_name: Person's name
     - serial_number: Unique identifier
     - issued_date: Date of issuance
     - certificate_title: Type/title of credential
+
+    The document is first classified and parsed with its type's pattern set;
+    use `parse_document` to also get the chosen profile.
     """
-    
-    if not text or len(text.strip()) < 10:
-        return None
-    
-    # Normalize text: remove excessive whitespace, preserve line breaks for structure
-    text_normalized = re.sub(r'[ \t]+', ' ', text)
-    text_normalized = re.sub(r'\n\s*\n', '\n', text_normalized)
-    
-    # Extract only required fields
-    extracted_data = {
-        "full_name": extract_name(text_normalized),
-        "serial_number": extract_serial_number(text_normalized),
-        "issued_date": extract_date(text_normalized),
-        "certificate_title": extract_certificate_title(text_normalized),
-    }
-    
-    # Validation: require at minimum name and one identifier (serial or title)
-    if extracted_data["full_name"] and (extracted_data["serial_number"] or extracted_data["certificate_title"]):
-        # Clean up None values for optional fields
-        return {k: v for k, v in extracted_data.items() if v is not None}
-    
-    return None
+    return _PARSER.parse(text).fields
+
+
+def parse_many(
+    texts: Iterable[str],
+    workers: Optional[int] = None,
+    chunksize: int = 256,
+    max_in_flight: Optional[int] = None,
+) -> Iterator[Optional[dict]]:
+    """
+    Parse a stream of texts, yielding one `parse_credential_from_text` result
+    per input, in input order.
+
+    Texts are read from `texts` lazily and sent to a pool of `workers` processes
+    (default: one per CPU) in chunks of `chunksize`. At most `max_in_flight`
+    chunks (default: twice the worker count) are submitted but not yet yielded,
+    so memory stays flat even when `texts` is a queryset iterator over millions
+    of rows. With `workers=1` everything runs in the calling process.
+    """
+    workers = workers or os.cpu_count() or 1
+    if chunksize < 1:
+        raise ValueError("chunksize must be at least 1.")
+
+    if workers == 1:
+        for text in texts:
+            yield _PARSER.parse(text).fields
+        return
+
+    max_in_flight = max_in_flight or workers * 2
+    iter_texts = iter(texts)
+    chunks = iter(lambda: list(islice(iter_texts, chunksize)), [])
+    pending = deque()
+
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        for chunk in chunks:
+            pending.append(executor.submit(_parse_chunk, chunk))
+            # Backpressure: stop reading input until the oldest chunk is drained.
+            if len(pending) >= max_in_flight:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _parse_chunk(chunk: list) -> list:
+    """Process-pool entry point for `parse_many`."""
+    return [_PARSER.parse(text).fields for text in chunk]
 
 
 def extract_name(text: str) -> Optional[str]:
     """Extract person's name using multiple pattern strategies."""
-    
-    # Pattern 1: Explicit labels (most common)
-    label_patterns = [
-        r"(?:Full\s+)?Name\s*[:：]\s*([A-Z][A-Za-z\s\.'-]{2,50})",
-        r"(?:Student|Recipient|Candidate)\s+Name\s*[:：]\s*([A-Z][A-Za-z\s\.'-]{2,50})",
-        r"(?:Name\s+of\s+(?:Student|Recipient|Candidate))\s*[:：]\s*([A-Z][A-Za-z\s\.'-]{2,50})",
-        r"ስም\s*[:：]\s*([A-Z][A-Za-z\s\.'-]{2,50})",  # Amharic "Name"
-        # Ethiopian ID specific patterns
-        r"Name[:\s]+([A-Z][a-z]+\s+[A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)",
-        r"(?:የሙሉ\s+ስም|ስም)\s*[:：]?\s*([A-Z][A-Za-z\s\.'-]{2,50})",  # Full name in Amharic
-    ]
-    
-    # Pattern 2: Ceremonial phrases
-    ceremonial_patterns = [
-        r"(?:This\s+(?:is\s+to\s+)?certif(?:y|ies)\s+that)\s+([A-Z][A-Za-z\s\.'-]{2,50})\s+(?:has|have)",
-        r"(?:Presented\s+to|Awarded\s+to|Granted\s+to)\s+([A-Z][A-Za-z\s\.'-]{2,50})",
-        r"(?:Hereby\s+conferred\s+(?:up)?on)\s+([A-Z][A-Za-z\s\.'-]{2,50})",
-        r"(?:Be\s+it\s+known\s+that)\s+([A-Z][A-Za-z\s\.'-]{2,50})",
-    ]
-    
-    # Pattern 3: Ethiopian name patterns (3-4 parts common)
-    # Ethiopian names often follow: FirstName FatherName GrandfatherName
-    ethiopian_patterns = [
-        r"\b([A-Z][a-z]+\s+[A-Z][a-z]+\s+[A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)\b",
-        r"([A-Z][a-z]{2,}\s+[A-Z][a-z]{2,}\s+[A-Z][a-z]{2,})",  # 3-part Ethiopian name
-    ]
-    
-    # Try all patterns in order of reliability
-    all_patterns = label_patterns + ceremonial_patterns
-    
-    for pattern in all_patterns:
-        match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
-        if match:
-            name = match.group(1).strip()
-            # Clean up common OCR artifacts
-            name = re.sub(r'\s+', ' ', name)
-            name = re.sub(r'[_\-]{2,}', '', name)
-            # Validate: 2-5 words, reasonable length
-            if 2 <= len(name.split()) <= 5 and 5 <= len(name) <= 60:
-                return name
-    
-    return None
+    return _PARSER.generic.extract_name(text)
 
 
 def extract_date(text: str) -> Optional[str]:
     """Extract and normalize dates in various formats."""
-    
-    # Pattern 1: Labeled dates
-    labeled_patterns = [
-        r"(?:Issue(?:d)?\s+(?:Date|On)|Date\s+(?:of\s+)?Issue(?:d)?)\s*[:：]\s*(\d{1,2}[-/\.]\d{1,2}[-/\.]\d{2,4})",
-        r"(?:Date|Dated|Date\s+of\s+Award)\s*[:：]\s*(\d{1,2}[-/\.]\d{1,2}[-/\.]\d{2,4})",
-        r"(?:Graduation\s+Date|Completion\s+Date)\s*[:：]\s*(\d{1,2}[-/\.]\d{1,2}[-/\.]\d{2,4})",
-        r"(?:የተሰጠበት\s+ቀን|ቀን)\s*[:：]\s*(\d{1,2}[-/\.]\d{1,2}[-/\.]\d{2,4})",  # Amharic "Date"
-        # Ethiopian ID specific patterns
-        r"(?:DOB|Date\s+of\s+Birth|Birth\s+Date)\s*[:：]\s*(\d{1,2}[-/\.]\d{1,2}[-/\.]\d{2,4})",
-        r"(?:Expiry\s+Date|Valid\s+Date|Validity)\s*[:：]\s*(\d{1,2}[-/\.]\d{1,2}[-/\.]\d{2,4})",
-        r"(?:Admission|Admission\s+Date)\s*[:：]\s*(\d{1,2}[-/\.]\d{1,2}[-/\.]\d{2,4})",
-        r"(?:የትውልድ\s+ቀን)\s*[:：]?\s*(\d{1,2}[-/\.]\d{1,2}[-/\.]\d{2,4})",  # Birth date in Amharic
-    ]
-    
-    # Pattern 2: Written dates
-    written_patterns = [
-        r"(?:Issue(?:d)?|Date(?:d)?|Awarded)\s*[:：]?\s*(\d{1,2}\s+(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|Jun(?:e)?|Jul(?:y)?|Aug(?:ust)?|Sep(?:tember)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)[a-z]*\s+\d{2,4})",
-        r"(\d{1,2}(?:st|nd|rd|th)?\s+(?:of\s+)?(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|Jun(?:e)?|Jul(?:y)?|Aug(?:ust)?|Sep(?:tember)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)[a-z]*,?\s+\d{2,4})",
-    ]
-    
-    # Pattern 3: ISO and standard formats
-    standard_patterns = [
-        r"\b(\d{4}-\d{2}-\d{2})\b",  # ISO: 2024-01-15
-        r"\b(\d{1,2}/\d{1,2}/\d{4})\b",  # US/Ethiopian: 01/15/2024
-        r"\b(\d{1,2}\.\d{1,2}\.\d{4})\b",  # European: 15.01.2024
-    ]
-    
-    all_patterns = labeled_patterns + written_patterns + standard_patterns
-    
-    for pattern in all_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            date_str = match.group(1).strip()
-            normalized = normalize_date(date_str)
-            if normalized:
-                return normalized
-    
-    return None
+    return _PARSER.generic.extract_date(text)
 
 
 def extract_certificate_title(text: str) -> Optional[str]:
     """Extract certificate/credential title."""
-    
-    # Pattern 1: Certificate type with "of/in"
-    type_patterns = [
-        r"(?:Certificate|Diploma|Degree|Award)\s+(?:of|in)\s+([A-Za-z\s&,]+?)(?:\n|is\s+(?:hereby|awarded)|has\s+been)",
-        r"(?:Bachelor|Master|Doctor|PhD|B\.?Sc|M\.?Sc|B\.?A|M\.?A)\s+(?:of|in|degree\s+in)\s+([A-Za-z\s&,]+?)(?:\n|$|,)",
-    ]
-    
-    # Pattern 2: Labeled title
-    labeled_patterns = [
-        r"(?:Certificate\s+)?Title\s*[:：]\s*([A-Za-z\s&,\-]+?)(?:\n|Date|Serial|$)",
-        r"(?:Program|Course|Field\s+of\s+Study)\s*[:：]\s*([A-Za-z\s&,\-]+?)(?:\n|Date|$)",
-        r"(?:Credential\s+Type|Type)\s*[:：]\s*([A-Za-z\s&,\-]+?)(?:\n|$)",
-        # Ethiopian ID specific patterns
-        r"(?:Study\s+Level|Level)\s*[:：]\s*([A-Za-z\s&,\-]+?)(?:\n|$)",
-        r"(?:Blood\s+Type|Gender|Sex|Nationality)\s*[:：]\s*([A-Z])",  # Single letter fields
-    ]
-    
-    # Pattern 3: Document header (first line often contains title)
-    header_patterns = [
-        r"^([A-Z][A-Za-z\s]+(?:Certificate|Diploma|Award|Degree|Transcript))",
-        r"((?:Certificate|Diploma|Award)\s+of\s+[A-Za-z\s]+)",
-        # Ethiopian ID types
-        r"(Ethiopian\s+(?:Driver|Driving)\s+License)",
-        r"(Ethiopian\s+(?:National\s+)?(?:Digital\s+)?ID\s+Card)",
-        r"(Student\s+Identification)",
-    ]
-    
-    all_patterns = type_patterns + labeled_patterns + header_patterns
-    
-    for pattern in all_patterns:
-        match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
-        if match:
-            title = match.group(1).strip()
-            # Clean up
-            title = re.sub(r'\s+', ' ', title)
-            title = re.sub(r'[_\-]{2,}', '', title)
-            # Validate length (allow single chars for gender/blood type)
-            if 1 <= len(title) <= 100:
-                return title
-    
-    return None
+    return _PARSER.generic.extract_certificate_title(text)
 
 
 def extract_serial_number(text: str) -> Optional[str]:
     """Extract serial/certificate/ID number."""
-    
-    # Pattern 1: Labeled serial numbers
-    labeled_patterns = [
-        r"(?:Serial\s+(?:Number|No\.?|#)|Certificate\s+(?:Number|No\.?|#)|ID\s+(?:Number|No\.?)?)\s*[:：]\s*([A-Z0-9\-/]+)",
-        r"(?:Credential\s+ID|Document\s+ID|Reference\s+(?:Number|No))\s*[:：]\s*([A-Z0-9\-/]+)",
-        r"(?:Registration\s+(?:Number|No)|Reg\.?\s+No\.?)\s*[:：]\s*([A-Z0-9\-/]+)",
-        r"(?:ተ\.ቁ|መ\.ቁ)\s*[:：]\s*([A-Z0-9\-/]+)",  # Amharic abbreviations for serial number
-        # Ethiopian ID specific patterns
-        r"(?:License\s+No|License\s+Number)\s*[:：]?\s*([A-Z0-9\-/]+)",
-        r"(?:UGR|Student\s+ID)\s*[:：]?\s*([A-Z0-9\-/]+)",
-        r"(?:ID\s+Card|National\s+ID)\s*[:：]?\s*([A-Z0-9\-/]+)",
-    ]
-    
-    # Pattern 2: Common serial formats
-    format_patterns = [
-        r"\b([A-Z]{2,4}[-/]\d{4,}[-/][A-Z0-9]+)\b",  # CERT-2024-ABC123
-        r"\b([A-Z]{3,}\d{4,})\b",  # CERT2024123 or UGR575614
-        r"\b(\d{4}[-/]\d{4,})\b",  # 2024-123456
-        r"\b([A-Z]{2,}/\d{2,}/\d{4,})\b",  # ET/24/12345
-        r"\b(\d{6,})\b",  # 662194 (6+ digit numbers)
-        # Barcode patterns (long numeric sequences)
-        r"\b(\d{12,})\b",  # 628467391861420 (barcode numbers)
-    ]
-    
-    # Pattern 3: Generic number after keywords
-    generic_patterns = [
-        r"(?:No\.?|Number|#)\s*[:：]?\s*([A-Z0-9\-/]{5,})",
-    ]
-    
-    all_patterns = labeled_patterns + format_patterns + generic_patterns
-    
-    for pattern in all_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            serial = match.group(1).strip().upper()
-            # Validate: should have mix of letters/numbers or be long enough
-            if len(serial) >= 4 and (re.search(r'\d', serial) or len(serial) >= 6):
-                return serial
-    
-    return None
+    return _PARSER.generic.extract_serial_number(text)
 
 
 def extract_institution(text: str) -> Optional[str]:
     """Extract issuing institution name."""
-    
-    patterns = [
-        r"(?:Issued\s+by|Awarded\s+by|From)\s*[:：]\s*([A-Z][A-Za-z\s&,\.]+(?:University|College|Institute|Academy|School))",
-        r"([A-Z][A-Za-z\s&,\.]+(?:University|College|Institute|Academy|School))",
-        r"(?:Institution|Organization)\s*[:：]\s*([A-Z][A-Za-z\s&,\.]+)",
-        # Ethiopian institutions
-        r"(Addis\s+Ababa\s+University)",
-        r"(የአዲስ\s+አበባ\s+ዩኒቨርሲቲ)",  # Addis Ababa University in Amharic
-        r"(Ethiopian\s+(?:Transport|Road)\s+Authority)",
-        r"(Federal\s+Democratic\s+Republic\s+of\s+Ethiopia)",
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            institution = match.group(1).strip()
-            if 5 <= len(institution) <= 100:
-                return institution
-    
-    return None
+    return _PARSER.generic._first("institution", INSTITUTION_PATTERNS, scan_text(text, _INSTITUTION_KEYWORDS), _clean_institution)
 
 
 def extract_grade(text: str) -> Optional[str]:
     """Extract grade/GPA if present."""
-    
-    patterns = [
-        r"(?:Grade|GPA|CGPA|Score)\s*[:：]\s*([\d\.]+(?:/[\d\.]+)?)",
-        r"(?:With\s+(?:a\s+)?(?:grade\s+of|GPA\s+of))\s*([\d\.]+)",
-        r"(?:Distinction|First\s+Class|Second\s+Class|Pass)",
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            return match.group(1).strip() if match.lastindex else match.group(0).strip()
-    
+    return _PARSER.generic._first("grade", GRADE_PATTERNS, scan_text(text, _GRADE_KEYWORDS), _clean_grade)
+
+
+# Format sniffing for normalize_date. The digit rules mirror the grammar
+# datetime.strptime uses for %d, %m and %Y, so a token accepted here is exactly
+# a token strptime would accept in the same position.
+_STRPTIME_DAY = re.compile(r"3[01]|[12]\d|0[1-9]|[1-9]", re.ASCII)
+_STRPTIME_MONTH = re.compile(r"1[0-2]|0[1-9]|[1-9]", re.ASCII)
+_NUMERIC_DATE = re.compile(r"(\d+)([/.-])(\d+)\2(\d+)", re.ASCII)
+_DAY_MONTH_YEAR = re.compile(r"(\d{1,2}) +([A-Za-z]+)(,?) +(\d{4})", re.ASCII)
+_MONTH_DAY_YEAR = re.compile(r"([A-Za-z]+) +(\d{1,2}), +(\d{4})", re.ASCII)
+_YEAR_AT_EDGE = re.compile(r"\A\d{4}|\d{4}\Z")
+
+# Field orders to try per separator, in the priority of the original format list:
+# %d/%m/%Y, %m/%d/%Y, %Y-%m-%d, %d-%m-%Y, %d.%m.%Y, %Y/%m/%d.
+_NUMERIC_ORDERS = {
+    "/": ("dmY", "mdY", "Ymd"),
+    "-": ("Ymd", "dmY"),
+    ".": ("dmY",),
+}
+_FULL_MONTHS = {name.lower(): number for number, name in enumerate(calendar.month_name) if name}
+_ABBR_MONTHS = {name.lower(): number for number, name in enumerate(calendar.month_abbr) if name}
+
+# Complete strptime format list, used only for inputs the sniffer does not
+# recognise (non-ASCII digits, tabs, upper-case ordinals and the like).
+_DIGIT_FIRST_FORMATS = (
+    "%d/%m/%Y",      # 15/01/2024
+    "%m/%d/%Y",      # 01/15/2024
+    "%Y-%m-%d",      # 2024-01-15 (ISO)
+    "%d-%m-%Y",      # 15-01-2024
+    "%d.%m.%Y",      # 15.01.2024
+    "%Y/%m/%d",      # 2024/01/15
+    "%d %B %Y",      # 15 January 2024
+    "%d %b %Y",      # 15 Jan 2024
+    "%d %B, %Y",     # 15 January, 2024
+    "%dth %B %Y",    # 15th January 2024
+    "%dst %B %Y",    # 1st January 2024
+    "%dnd %B %Y",    # 2nd January 2024
+    "%drd %B %Y",    # 3rd January 2024
+)
+_LETTER_FIRST_FORMATS = (
+    "%B %d, %Y",     # January 15, 2024
+    "%b %d, %Y",     # Jan 15, 2024
+)
+
+
+def _iso_date(year: int, month: int, day: int) -> Optional[str]:
+    if year < 1:
+        return None
+    if day > 28 and day > calendar.monthrange(year, month)[1]:
+        return None
+    if year < 1000:
+        # Match strftime's platform-specific rendering of short years.
+        return datetime(year, month, day).strftime("%Y-%m-%d")
+    return f"{year}-{month:02d}-{day:02d}"
+
+
+def _sniff_numeric(match: re.Match) -> Optional[str]:
+    first, separator, second, third = match.groups()
+    for order in _NUMERIC_ORDERS[separator]:
+        tokens = dict(zip(order, (first, second, third)))
+        if (
+            len(tokens["Y"]) == 4
+            and _STRPTIME_MONTH.fullmatch(tokens["m"])
+            and _STRPTIME_DAY.fullmatch(tokens["d"])
+        ):
+            normalized = _iso_date(int(tokens["Y"]), int(tokens["m"]), int(tokens["d"]))
+            if normalized:
+                return normalized
+    return None
+
+
+def _sniff_named(day: str, month: Optional[int], year: str) -> Optional[str]:
+    if month is None or not _STRPTIME_DAY.fullmatch(day):
+        return None
+    return _iso_date(int(year), month, int(day))
+
+
+def _strptime_any(cleaned: str) -> Optional[str]:
+    formats = _LETTER_FIRST_FORMATS if cleaned[0].isalpha() else _DIGIT_FIRST_FORMATS
+    for fmt in formats:
+        try:
+            return datetime.strptime(cleaned, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
     return None
 
 
+def _parse_date(cleaned: str) -> Optional[str]:
+    """
+    Pick the format from the shape of the string instead of trying each one.
+
+    Every supported format starts or ends with a four digit year, so anything
+    else is rejected without parsing. Common ASCII shapes are decided directly from the
+    separator, the digit-group widths and the month-name token; returning None
+    for them means no format can match. Anything else goes through strptime,
+    restricted to the formats that can start with the string's first character.
+    """
+    if not _YEAR_AT_EDGE.search(cleaned):
+        return None
+
+    match = _NUMERIC_DATE.fullmatch(cleaned)
+    if match:
+        return _sniff_numeric(match)
+
+    match = _DAY_MONTH_YEAR.fullmatch(cleaned)
+    if match:
+        day, month_name, comma, year = match.groups()
+        month_name = month_name.lower()
+        # "15 January, 2024" only has a full-month-name format.
+        month = _FULL_MONTHS.get(month_name) or (None if comma else _ABBR_MONTHS.get(month_name))
+        return _sniff_named(day, month, year)
+
+    match = _MONTH_DAY_YEAR.fullmatch(cleaned)
+    if match:
+        month_name, day, year = match.groups()
+        month_name = month_name.lower()
+        return _sniff_named(day, _FULL_MONTHS.get(month_name) or _ABBR_MONTHS.get(month_name), year)
+
+    return _strptime_any(cleaned)
+
+
+@lru_cache(maxsize=4096)
 def normalize_date(date_string: str) -> Optional[str]:
     """
     Normalize various date formats to ISO format (YYYY-MM-DD).
     Handles Ethiopian calendar dates and international formats.
+
+    Ambiguous numeric dates prefer day-first (15/01/2024 and 01/02/2024 are
+    read as DD/MM/YYYY). Results are memoized, since the same few date strings
+    repeat across an institution's documents.
     """
     if not date_string:
         return None
-    
+
     # Clean up the date string
     date_string = date_string.strip()
-    
-    # Common date formats to try
-    formats = [
-        "%d/%m/%Y",      # 15/01/2024
-        "%m/%d/%Y",      # 01/15/2024
-        "%Y-%m-%d",      # 2024-01-15 (ISO)
-        "%d-%m-%Y",      # 15-01-2024
-        "%d.%m.%Y",      # 15.01.2024
-        "%Y/%m/%d",      # 2024/01/15
-        "%d %B %Y",      # 15 January 2024
-        "%d %b %Y",      # 15 Jan 2024
-        "%B %d, %Y",     # January 15, 2024
-        "%b %d, %Y",     # Jan 15, 2024
-        "%d %B, %Y",     # 15 January, 2024
-        "%dth %B %Y",    # 15th January 2024
-        "%dst %B %Y",    # 1st January 2024
-        "%dnd %B %Y",    # 2nd January 2024
-        "%drd %B %Y",    # 3rd January 2024
-    ]
-    
+
     # Remove ordinal suffixes (1st, 2nd, 3rd, 4th, etc.)
-    cleaned = re.sub(r'(\d+)(?:st|nd|rd|th)', r'\1', date_string)
-    
-    for fmt in formats:
-        try:
-            parsed_date = datetime.strptime(cleaned, fmt)
-            return parsed_date.strftime("%Y-%m-%d")
-        except ValueError:
-            continue
-    
+    cleaned = _ORDINAL_SUFFIX.sub(r'\1', date_string)
+
+    normalized = _parse_date(cleaned)
+    if normalized:
+        return normalized
+
     # If parsing fails, return original if it looks like a date
-    if re.search(r'\d{4}', date_string):
+    if _YEAR.search(date_string):
         return date_string
-    
+
     return None
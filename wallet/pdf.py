@@ -0,0 +1,94 @@
+"""
+Page-at-a-time reading of uploaded PDFs.
+
+Transcripts arrive as PDFs of up to dozens of pages, and `Image.open` cannot
+read them at all. `iter_pdf_pages` walks a PDF one page at a time with
+pypdfium2:
+
+- a page with an embedded text layer yields its text, and no OCR is needed;
+- any other page is rasterized on demand, straight to the resolution the
+  OCR preprocessing would downscale it to anyway, and yields the bitmap.
+
+Only the current page is held in memory. The generator closes each page
+before moving on, and closes the document when the caller stops iterating,
+so a caller that has what it needs after page 2 never renders page 3.
+"""
+
+from typing import Iterator, NamedTuple, Optional
+
+import pypdfium2 as pdfium
+from PIL import Image
+
+PDF_MAGIC = b"%PDF-"
+
+# Fewer characters than this and the page is treated as scanned: image-only
+# PDFs often carry a few stray characters (page numbers, producer stamps).
+MIN_TEXT_LAYER_CHARS = 20
+
+# PDF user space units per inch.
+POINTS_PER_INCH = 72
+
+
+class PDFPage(NamedTuple):
+    """One page: `text` from the text layer, or `image` when it has none."""
+
+    number: int
+    page_count: int
+    text: Optional[str]
+    image: Optional[Image.Image]
+
+
+def is_pdf(path: str) -> bool:
+    # The header may follow up to 1 KB of junk (some scanners prepend it).
+    with open(path, "rb") as handle:
+        return PDF_MAGIC in handle.read(1024)
+
+
+def _page_text(page) -> str:
+    textpage = page.get_textpage()
+    try:
+        return textpage.get_text_range().replace("\r\n", "\n").replace("\r", "\n")
+    finally:
+        textpage.close()
+
+
+def _render(page, dpi: int, max_edge: int) -> Image.Image:
+    width, height = page.get_size()
+    scale = min(dpi / POINTS_PER_INCH, max_edge / max(width, height))
+    bitmap = page.render(scale=scale, grayscale=True)
+    try:
+        # Copy out of pdfium's buffer so the bitmap can be freed now.
+        image = bitmap.to_pil().copy()
+    finally:
+        bitmap.close()
+    image.info["dpi"] = (scale * POINTS_PER_INCH,) * 2
+    return image
+
+
+def iter_pdf_pages(
+    source,
+    dpi: int = 300,
+    max_edge: int = 2500,
+    max_pages: Optional[int] = None,
+    password: Optional[str] = None,
+) -> Iterator[PDFPage]:
+    """
+    Yield the pages of a PDF (a path, bytes or file object) in order, text
+    layer first and bitmap otherwise, rendering at `dpi` with the long edge
+    capped at `max_edge` pixels. Stops after `max_pages` pages.
+    """
+    document = pdfium.PdfDocument(source, password=password)
+    try:
+        page_count = len(document)
+        for index in range(page_count if max_pages is None else min(page_count, max_pages)):
+            page = document[index]
+            try:
+                text = _page_text(page)
+                if len(text.strip()) >= MIN_TEXT_LAYER_CHARS:
+                    yield PDFPage(index + 1, page_count, text, None)
+                else:
+                    yield PDFPage(index + 1, page_count, None, _render(page, dpi, max_edge))
+            finally:
+                page.close()
+    finally:
+        document.close()
@@ -0,0 +1,201 @@
+"""
+Image preprocessing ahead of Tesseract.
+
+Phone photos arrive at 12+ megapixels, rotated by EXIF, in colour, and
+Tesseract gains nothing from most of that. `preprocess` runs a configurable
+sequence of cheap steps and times each one:
+
+- draft: for JPEGs, decode at a reduced scale (1/2, 1/4 or 1/8) straight from
+  the DCT coefficients, so the full-size bitmap is never built;
+- exif_transpose: apply the EXIF orientation tag;
+- grayscale: one band instead of three;
+- downscale: shrink so the long edge is at most `max_edge` pixels and the
+  resolution at most `target_dpi` when the file records its DPI;
+- binarize: Otsu threshold to black and white;
+- deskew: straighten small rotations (projection-profile search).
+
+The configuration comes from the WALLET_OCR_PREPROCESSING setting (a dict of
+`PreprocessConfig` fields). Only Pillow is used.
+"""
+
+import json
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+STEPS = ("draft", "exif_transpose", "grayscale", "downscale", "binarize", "deskew")
+
+
+class PreprocessConfig(NamedTuple):
+    draft: bool = True
+    exif_transpose: bool = True
+    grayscale: bool = True
+    downscale: bool = True
+    max_edge: int = 2500
+    target_dpi: int = 300
+    binarize: bool = False
+    deskew: bool = False
+    max_skew_degrees: float = 5.0
+    skew_step_degrees: float = 0.5
+
+    @classmethod
+    def from_settings(cls) -> "PreprocessConfig":
+        return cls(**getattr(settings, "WALLET_OCR_PREPROCESSING", {}))
+
+    @classmethod
+    def disabled(cls) -> "PreprocessConfig":
+        return cls(**{step: False for step in STEPS})
+
+    def fingerprint(self) -> str:
+        """Stable text form, for cache keys: a config change changes OCR output."""
+        return json.dumps(self._asdict(), sort_keys=True, separators=(",", ":"))
+
+
+class PreprocessResult(NamedTuple):
+    image: Image.Image
+    # Seconds per step that ran, in order; "decode" covers opening and loading.
+    timings: Dict[str, float]
+    original_size: Tuple[int, int]
+
+    @property
+    def bitmap_bytes(self) -> int:
+        """Size of the decoded pixel buffer handed to OCR."""
+        width, height = self.image.size
+        return width * height * len(self.image.getbands())
+
+
+def _scale_for(size: Tuple[int, int], dpi: Optional[float], config: PreprocessConfig) -> float:
+    scale = min(1.0, config.max_edge / max(size))
+    if dpi and dpi > config.target_dpi:
+        scale = min(scale, config.target_dpi / dpi)
+    return scale
+
+
+def _image_dpi(image: Image.Image) -> Optional[float]:
+    dpi = image.info.get("dpi")
+    if not dpi:
+        return None
+    try:
+        return float(max(dpi))
+    except (TypeError, ValueError):
+        return None
+
+
+def otsu_threshold(image: Image.Image) -> int:
+    """The grey level that best separates a greyscale image into two classes."""
+    histogram = image.histogram()[:256]
+    total = sum(histogram)
+    sum_all = sum(level * count for level, count in enumerate(histogram))
+    sum_below = weight_below = 0
+    best_level, best_variance = 127, -1.0
+    for level, count in enumerate(histogram):
+        weight_below += count
+        if not weight_below:
+            continue
+        weight_above = total - weight_below
+        if not weight_above:
+            break
+        sum_below += level * count
+        mean_below = sum_below / weight_below
+        mean_above = (sum_all - sum_below) / weight_above
+        variance = weight_below * weight_above * (mean_below - mean_above) ** 2
+        if variance > best_variance:
+            best_level, best_variance = level, variance
+    return best_level
+
+
+def binarize(image: Image.Image) -> Image.Image:
+    gray = image.convert("L")
+    threshold = otsu_threshold(gray)
+    return gray.point([0 if level <= threshold else 255 for level in range(256)])
+
+
+def _row_profile_score(image: Image.Image) -> float:
+    # Mean ink per row via a 1-pixel-wide box resize; text lines that are level
+    # give sharp peaks and gaps, i.e. a high variance.
+    rows = list(image.resize((1, image.height), Image.Resampling.BOX).getdata())
+    mean = sum(rows) / len(rows)
+    return sum((value - mean) ** 2 for value in rows)
+
+
+def estimate_skew(image: Image.Image, max_degrees: float = 5.0, step: float = 0.5) -> float:
+    """
+    The rotation in degrees that best levels the text lines, searched in
+    `step` increments within +/- `max_degrees` on a small inverted copy.
+    """
+    probe = ImageOps.invert(binarize(image))
+    probe.thumbnail((800, 800))
+    best_angle, best_score = 0.0, _row_profile_score(probe)
+    count = int(max_degrees / step)
+    for index in range(-count, count + 1):
+        angle = index * step
+        if not angle:
+            continue
+        score = _row_profile_score(probe.rotate(angle, resample=Image.Resampling.NEAREST, fillcolor=0))
+        if score > best_score:
+            best_angle, best_score = angle, score
+    return best_angle
+
+
+def preprocess(source, config: Optional[PreprocessConfig] = None) -> PreprocessResult:
+    """
+    Open `source` (a path, file object or an already decoded image, such as
+    a rasterized PDF page) and run the configured steps on it.
+    """
+    config = config or PreprocessConfig.from_settings()
+    timings: Dict[str, float] = {}
+
+    start = time.perf_counter()
+    image = source if isinstance(source, Image.Image) else Image.open(source)
+    original_size = image.size
+    dpi = _image_dpi(image)
+    if config.draft and image.format == "JPEG":
+        scale = _scale_for(image.size, dpi, config)
+        if scale < 1.0:
+            # JPEG draft picks the largest DCT scale that stays at or above the
+            # requested size; downscale below does the remaining fine resize.
+            requested = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+            image.draft("L" if config.grayscale else "RGB", requested)
+            timings["draft"] = time.perf_counter() - start
+    image.load()
+    timings["decode"] = time.perf_counter() - start
+
+    def step(name, func):
+        nonlocal image
+        started = time.perf_counter()
+        image = func(image)
+        timings[name] = time.perf_counter() - started
+
+    if config.exif_transpose:
+        step("exif_transpose", lambda im: ImageOps.exif_transpose(im) or im)
+    if config.grayscale:
+        step("grayscale", lambda im: im if im.mode == "L" else im.convert("L"))
+    if config.downscale:
+
+        def downscale(im):
+            # After a draft decode the recorded DPI no longer matches the pixels.
+            # Longest edges, since exif_transpose may have swapped width and height.
+            effective_dpi = dpi * max(im.size) / max(original_size) if dpi else None
+            scale = _scale_for(im.size, effective_dpi, config)
+            if scale >= 1.0:
+                return im
+            size = (max(1, round(im.width * scale)), max(1, round(im.height * scale)))
+            return im.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+        step("downscale", downscale)
+    if config.binarize:
+        step("binarize", binarize)
+    if config.deskew:
+
+        def deskew(im):
+            angle = estimate_skew(im, config.max_skew_degrees, config.skew_step_degrees)
+            if not angle:
+                return im
+            background = 255 if im.mode in ("L", "1") else (255, 255, 255)
+            return im.rotate(angle, resample=Image.Resampling.BICUBIC, expand=True, fillcolor=background)
+
+        step("deskew", deskew)
+
+    return PreprocessResult(image, timings, original_size)
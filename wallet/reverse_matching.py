@@ -0,0 +1,109 @@
+"""
+Reverse matching: documents uploaded before their credential was issued.
+
+A document that matched nothing stays unverified, but keeps the keys its
+parsed fields give (Document.match_hash and the field-subset digests, the
+same keys CredentialRecord is indexed by). When credentials are issued,
+`reverse_match` looks the new records' keys up among unverified documents,
+through indexes that only cover unverified documents, so its cost follows
+the number of new records and of documents they match, not the number of
+documents:
+
+- a document whose full hash is a new record's is linked to it, as the
+  verify endpoint would have done;
+- a document sharing a field-subset digest with exactly one record gets it
+  as `suggested_credential`, for the holder to confirm, as the endpoint
+  would have suggested it.
+
+Keys are looked up `KEY_CHUNK` at a time and links written with bulk_update,
+so a batch of 100k records costs a few hundred indexed queries.
+"""
+
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Sequence
+
+from django.db.models import Count
+
+from institutions.lookup import SUBSET_DIGESTS
+from institutions.models import CredentialRecord
+
+from .models import PENDING, Document
+
+# Keys per IN (...) query, well under SQLite's parameter limit.
+KEY_CHUNK = 500
+
+
+class ReverseMatchResult(NamedTuple):
+    # Documents linked to a new record by full hash.
+    linked: int
+    # Documents given a new record as a suggestion by field-subset digest.
+    suggested: int
+
+
+def _chunks(values: Sequence[str], size: int = KEY_CHUNK) -> Iterator[Sequence[str]]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _pending(column: str, keys: Iterable[str]) -> List[Document]:
+    """Unverified documents whose `column` is one of `keys`."""
+    keys = sorted(set(keys))
+    documents = []
+    for chunk in _chunks(keys):
+        documents.extend(
+            Document.objects.filter(PENDING, **{f"{column}__in": chunk}).only("id", column, "suggested_credential")
+        )
+    return documents
+
+
+def _shared(column: str, digests: Iterable[str]) -> set:
+    """The digests among `digests` that several records have; they decide nothing."""
+    digests = sorted(set(digests))
+    shared = set()
+    for chunk in _chunks(digests):
+        rows = (
+            CredentialRecord.objects.filter(**{f"{column}__in": chunk})
+            .values(column)
+            .annotate(records=Count("id"))
+            .filter(records__gt=1)
+        )
+        shared.update(row[column] for row in rows)
+    return shared
+
+
+def reverse_match(records: Sequence[CredentialRecord]) -> ReverseMatchResult:
+    """Link or suggest newly issued records to the unverified documents they match."""
+    if not records:
+        return ReverseMatchResult(0, 0)
+
+    # 1. Full hash: the document's fields are exactly the record's.
+    by_hash = {record.credential_hash: record for record in records}
+    linked = _pending("match_hash", by_hash)
+    for document in linked:
+        document.verified_credential = by_hash[document.match_hash]
+        document.suggested_credential = None
+    Document.objects.bulk_update(linked, ["verified_credential", "suggested_credential"], batch_size=KEY_CHUNK)
+
+    # 2. Field-subset digests, strongest first, for documents without a
+    # suggestion. Only digests that hit a document are checked for uniqueness.
+    done = {document.id for document in linked}
+    suggested: List[Document] = []
+    for column in SUBSET_DIGESTS:
+        by_digest: Dict[str, CredentialRecord] = {}
+        for record in records:
+            digest = getattr(record, column)
+            if digest:
+                by_digest[digest] = record
+        documents = [
+            document
+            for document in _pending(column, by_digest)
+            if document.id not in done and document.suggested_credential_id is None
+        ]
+        shared = _shared(column, {getattr(document, column) for document in documents})
+        for document in documents:
+            digest = getattr(document, column)
+            if digest not in shared:
+                document.suggested_credential = by_digest[digest]
+                suggested.append(document)
+                done.add(document.id)
+    Document.objects.bulk_update(suggested, ["suggested_credential"], batch_size=KEY_CHUNK)
+    return ReverseMatchResult(len(linked), len(suggested))
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Document
+from .models import Document, VerificationJob
 
 
 class DocumentSerializer(serializers.ModelSerializer):
@@ -12,5 +12,30 @@ class DocumentSerializer(serializers.ModelSerializer):
         model = Document
         # The user only needs to provide the 'document_file'.
         # All other fields are either set by the system or derived later.
-        fields = ["id", "document_file", "verified_credential", "uploaded_at"]
-        read_only_fields = ["id", "verified_credential", "uploaded_at"]
+        fields = ["id", "document_file", "verified_credential", "suggested_credential", "uploaded_at"]
+        read_only_fields = ["id", "verified_credential", "suggested_credential", "uploaded_at"]
+
+
+class VerificationJobSerializer(serializers.ModelSerializer):
+    """
+    Read-only view of a verification job for the status endpoint. `result` is
+    the verify response body once the job is DONE.
+    """
+
+    job_id = serializers.UUIDField(source="id")
+
+    class Meta:
+        model = VerificationJob
+        fields = [
+            "job_id",
+            "status",
+            "document",
+            "result",
+            "result_code",
+            "error",
+            "attempts",
+            "created_at",
+            "updated_at",
+            "finished_at",
+        ]
+        read_only_fields = fields
@@ -1,6 +1,10 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+
+from institutions.signals import credentials_issued
+
 from .models import Document
+from .reverse_matching import reverse_match
 
 # A list of keywords that we'll look for in the extracted text.
 # In a real-world application, this would be much more extensive and perhaps stored in the database.
@@ -37,3 +41,9 @@ def auto_verify_document(sender, instance, created, **kwargs):
             # to avoid triggering the signal in an infinite loop.
             instance.save(update_fields=["verification_status"])
             print(f"Document {instance.id} auto-verified successfully.")
+
+
+@receiver(credentials_issued)
+def match_pending_documents(sender, records, **kwargs):
+    """Link unverified documents to newly issued credentials they match (see wallet.reverse_matching)."""
+    reverse_match(records)
@@ -1,3 +1,1101 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import random
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image, ImageDraw, ImageFont
+
+from core.models import User
+from institutions.bloom import get_filter, reset_filter
+from institutions.models import CredentialRecord, Institution
+from institutions.record_cache import get_cache, reset_cache
+
+from .benchmarks.corpus import generate_corpus, pathological_inputs
+from .benchmarks.layout import synthetic_word_data
+from .benchmarks.parsing import growth_exponent
+from .benchmarks.preprocessing import render_document, step_ladder
+from .card_templates import CARD_TEMPLATES, HEADER_BOX, read_card
+from .jobs import claim_next_job, requeue_abandoned_jobs, run_job
+from .layout import OCRLayout, parse_credential_from_layout, parse_layout_document
+from .models import Document, OCRCacheEntry, VerificationJob
+from .ocr_cache import STATS, OCROutput, fetch_or_compute, prune
+from .ocr_engines import OCRTimeout, PooledEngine, PytesseractBackend, SubprocessEngine, TesserocrBackend, get_engine
+from .ocr_governor import OCRBusy, OCRGovernor
+from .parser import (
+    GENERIC_PROFILE,
+    PARSER_VERSION,
+    CredentialParser,
+    InstrumentedCredentialParser,
+    ParseResult,
+    ProfiledCredentialParser,
+    disable_instrumentation,
+    enable_instrumentation,
+    extract_serial_number,
+    normalize_date,
+    parse_credential_from_text,
+    parse_document,
+    parse_many,
+    parser_stats,
+)
+from .preprocessing import PreprocessConfig, estimate_skew, preprocess
+from .pdf import _render as pdf_render, is_pdf
+from .reverse_matching import KEY_CHUNK, ReverseMatchResult, reverse_match
+from .uploads import image_dimensions, sniff_content_type
+from .verification import OCRError, OCRTier, match, ocr_document, ocr_tiered, verify_document
+
+CERTIFICATE_TEXT = """ADDIS ABABA UNIVERSITY
+Certificate of Completion
+This is to certify that Abebe Kebede Tesfaye has successfully completed
+the requirements for the Bachelor of Science in Computer Science
+Date of Issue: 15/07/2023
+Serial No: AAU-2023-CS0042
+"""
+
+DRIVER_LICENSE_TEXT = """Federal Democratic Republic of Ethiopia
+Ethiopian Driver License
+Name: Almaz Tadesse Bekele
+License No: DL-884213
+DOB: 03/11/1990
+Expiry Date: 03/11/2028
+Blood Type: O
+"""
+
+
+class CredentialParserTests(SimpleTestCase):
+    def test_parses_certificate(self):
+        self.assertEqual(
+            parse_credential_from_text(CERTIFICATE_TEXT),
+            {
+                "full_name": "Abebe Kebede Tesfaye",
+                "serial_number": "AAU-2023-CS0042",
+                "issued_date": "2023-07-15",
+                "certificate_title": "Completion",
+            },
+        )
+
+    def test_parses_driver_license(self):
+        # The label patterns allow a name to run onto the next line; this pins
+        # the current behaviour so engine changes cannot silently alter it.
+        self.assertEqual(
+            parse_credential_from_text(DRIVER_LICENSE_TEXT),
+            {
+                "full_name": "Almaz Tadesse Bekele License No",
+                "serial_number": "DL-884213",
+                "issued_date": "2028-11-03",
+                "certificate_title": "O",
+            },
+        )
+
+    def test_rejects_short_or_unparseable_text(self):
+        self.assertIsNone(parse_credential_from_text(""))
+        self.assertIsNone(parse_credential_from_text("too short"))
+        self.assertIsNone(parse_credential_from_text("nothing useful in this text at all"))
+
+    def test_keyword_gating_respects_ignorecase_equivalents(self):
+        # re.IGNORECASE matches the long s "ſ" against "s"; the gate must too.
+        self.assertEqual(extract_serial_number("ſerial No: AB1234"), "AB1234")
+
+    def test_parser_instances_are_reusable(self):
+        parser = CredentialParser()
+        self.assertEqual(parser.parse(CERTIFICATE_TEXT), parser.parse(CERTIFICATE_TEXT))
+
+
+class NormalizeDateTests(SimpleTestCase):
+    def test_supported_formats(self):
+        cases = {
+            "15/01/2024": "2024-01-15",
+            "01/15/2024": "2024-01-15",
+            "2024-01-15": "2024-01-15",
+            "15-01-2024": "2024-01-15",
+            "15.01.2024": "2024-01-15",
+            "2024/01/15": "2024-01-15",
+            "15 January 2024": "2024-01-15",
+            "15 Jan 2024": "2024-01-15",
+            "January 15, 2024": "2024-01-15",
+            "Jan 15, 2024": "2024-01-15",
+            "15 January, 2024": "2024-01-15",
+            "3rd January 2024": "2024-01-03",
+            "15TH January 2024": "2024-01-15",
+        }
+        for raw, expected in cases.items():
+            self.assertEqual(normalize_date(raw), expected, raw)
+
+    def test_prefers_day_first(self):
+        self.assertEqual(normalize_date("01/02/2024"), "2024-02-01")
+
+    def test_falls_back_to_raw_string_with_a_year(self):
+        self.assertEqual(normalize_date("31/02/2024"), "31/02/2024")
+        self.assertEqual(normalize_date("15 Jan, 2024"), "15 Jan, 2024")
+        self.assertIsNone(normalize_date("15/01/24"))
+        self.assertIsNone(normalize_date(""))
+
+
+class DocumentProfileTests(SimpleTestCase):
+    def test_classifies_known_layouts(self):
+        self.assertEqual(parse_document(CERTIFICATE_TEXT).profile, "certificate")
+        self.assertEqual(parse_document(DRIVER_LICENSE_TEXT).profile, "driver_license")
+
+    def test_falls_back_to_generic_when_unsure(self):
+        self.assertEqual(
+            ProfiledCredentialParser().classify("Name: Abebe Kebede\nNo: 12345678"),
+            GENERIC_PROFILE,
+        )
+
+    def test_profiles_agree_with_the_generic_parser_on_their_documents(self):
+        router = ProfiledCredentialParser()
+        for text in (CERTIFICATE_TEXT, DRIVER_LICENSE_TEXT):
+            self.assertEqual(router.parse(text).fields, router.generic.parse(text))
+
+
+class ParseManyTests(SimpleTestCase):
+    def test_yields_results_in_input_order(self):
+        texts = [CERTIFICATE_TEXT, "too short", DRIVER_LICENSE_TEXT] * 5
+        expected = [parse_credential_from_text(text) for text in texts]
+        self.assertEqual(list(parse_many(texts, workers=1)), expected)
+        self.assertEqual(
+            list(parse_many(iter(texts), workers=2, chunksize=2, max_in_flight=2)),
+            expected,
+        )
+
+    def test_rejects_empty_chunks(self):
+        with self.assertRaises(ValueError):
+            list(parse_many([CERTIFICATE_TEXT], workers=2, chunksize=0))
+
+
+class ParserBenchmarkTests(SimpleTestCase):
+    def test_corpus_is_deterministic_per_seed(self):
+        self.assertEqual(generate_corpus(20, seed=7), generate_corpus(20, seed=7))
+        self.assertNotEqual(generate_corpus(20, seed=7), generate_corpus(20, seed=8))
+
+    def test_pathological_inputs_have_requested_length(self):
+        for doc in pathological_inputs(5000):
+            self.assertLessEqual(len(doc.text), 5000, doc.kind)
+            self.assertGreater(len(doc.text), 1000, doc.kind)
+
+    def test_growth_exponent(self):
+        self.assertAlmostEqual(growth_exponent({1000: 1.0, 2000: 2.0, 4000: 4.0}), 1.0)
+        self.assertAlmostEqual(growth_exponent({1000: 1.0, 2000: 4.0, 4000: 16.0}), 2.0)
+
+
+class ParserInstrumentationTests(SimpleTestCase):
+    def tearDown(self):
+        disable_instrumentation()
+
+    def test_records_tries_wins_and_gated_skips(self):
+        parser = InstrumentedCredentialParser()
+        result = parser.parse(CERTIFICATE_TEXT)
+        snapshot = parser.stats.snapshot()
+        rows = {(row["field"], row["pattern"]): row for row in snapshot["patterns"]}
+
+        self.assertEqual(result, parse_credential_from_text(CERTIFICATE_TEXT))
+        self.assertEqual(snapshot["fields"]["name"], {"extractions": 1, "hits": 1})
+        self.assertEqual(rows[("name", "certify_that")]["won"], 1)
+        # There is no "name" label in the certificate, so the label patterns are gated.
+        self.assertEqual(rows[("name", "label_name")]["skipped"], 1)
+        self.assertEqual(rows[("name", "label_name")]["tried"], 0)
+
+    def test_module_functions_can_be_switched_to_instrumented_mode(self):
+        self.assertIsNone(parser_stats())
+        stats = enable_instrumentation()
+        parse_credential_from_text(DRIVER_LICENSE_TEXT)
+        self.assertIs(parser_stats(), stats)
+        self.assertEqual(stats.snapshot()["fields"]["serial"]["extractions"], 1)
+        stats.reset()
+        self.assertEqual(stats.snapshot(), {"fields": {}, "profiles": {}, "patterns": []})
+
+
+class LayoutExtractionTests(SimpleTestCase):
+    def layout(self, text, gap_share=0.0):
+        return OCRLayout.from_data(synthetic_word_data(text, gap_share=gap_share))
+
+    def test_label_map_from_colons_and_column_gaps(self):
+        for gap_share in (0.0, 1.0):
+            layout = self.layout(DRIVER_LICENSE_TEXT, gap_share=gap_share)
+            self.assertEqual(layout.fields["license no"], "DL-884213", gap_share)
+            self.assertEqual(layout.fields["dob"], "03/11/1990", gap_share)
+
+    def test_value_on_the_line_below_a_label(self):
+        layout = self.layout("Full Name\nHana Girma Ayele\nNational ID\n1234567890123456\n")
+        self.assertEqual(layout.fields, {"full name": "Hana Girma Ayele", "national id": "1234567890123456"})
+
+    def test_matches_regex_path_on_labelled_documents(self):
+        layout = self.layout(DRIVER_LICENSE_TEXT)
+        self.assertEqual(
+            parse_credential_from_layout(layout),
+            {
+                "full_name": "Almaz Tadesse Bekele",
+                "serial_number": "DL-884213",
+                "issued_date": "1990-11-03",
+                "certificate_title": "Ethiopian Driver License",
+            },
+        )
+        self.assertEqual(layout.text, DRIVER_LICENSE_TEXT.strip())
+
+    def test_positional_rules_for_unlabelled_certificate(self):
+        result = parse_layout_document(self.layout(CERTIFICATE_TEXT))
+        self.assertEqual(result.profile, "certificate")
+        self.assertEqual(result.fields["full_name"], "Abebe Kebede Tesfaye")
+        self.assertEqual(result.fields["serial_number"], "AAU-2023-CS0042")
+        self.assertEqual(result.fields["certificate_title"], "Certificate of Completion")
+
+    def test_falls_back_to_regex_path(self):
+        layout = self.layout("Awarded to nobody in particular\n")
+        self.assertIsNone(parse_credential_from_layout(layout))
+        self.assertEqual(parse_layout_document(layout), parse_document(layout.text))
+
+
+class ReparseDocumentsTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(email="holder@example.com")
+        # Uploads get their text after creation, so bypass the post_save hook.
+        self.documents = Document.objects.bulk_create(
+            Document(user=user, document_file="user_documents/a.png", extracted_text=text)
+            for text in (CERTIFICATE_TEXT, DRIVER_LICENSE_TEXT, "unreadable scan", "")
+        )
+
+    def reparse(self, *args):
+        call_command("reparse_documents", *args, stdout=StringIO())
+
+    def test_parses_unparsed_documents_in_batches(self):
+        self.reparse("--batch-size", "1")
+        certificate, license_, unreadable, empty = Document.objects.order_by("id")
+        self.assertEqual(certificate.parsed_fields, parse_credential_from_text(CERTIFICATE_TEXT))
+        self.assertEqual(license_.document_profile, "driver_license")
+        self.assertIsNone(unreadable.parsed_fields)
+        self.assertEqual(unreadable.parser_version, PARSER_VERSION)
+        self.assertFalse(certificate.parse_is_stale)
+        # Nothing to parse without text.
+        self.assertEqual(empty.parser_version, "")
+
+    def test_only_stale_documents_are_reparsed(self):
+        self.reparse()
+        Document.objects.filter(pk=self.documents[0].pk).update(parsed_fields={"stale": True}, parser_version="0.old")
+        Document.objects.filter(pk=self.documents[1].pk).update(extracted_text=CERTIFICATE_TEXT)
+
+        self.reparse()
+        certificate, license_ = Document.objects.order_by("id")[:2]
+        self.assertEqual(certificate.parsed_fields, parse_credential_from_text(CERTIFICATE_TEXT))
+        # The changed text is only noticed when digests are checked.
+        self.assertEqual(license_.document_profile, "driver_license")
+        self.reparse("--check-digests")
+        license_.refresh_from_db()
+        self.assertEqual(license_.document_profile, "certificate")
+
+    def test_resumes_after_limit(self):
+        self.reparse("--limit", "1")
+        self.assertEqual(Document.objects.filter(parser_version=PARSER_VERSION).count(), 1)
+        self.reparse("--start-after", str(self.documents[0].pk))
+        self.assertEqual(Document.objects.filter(parser_version=PARSER_VERSION).count(), 3)
+
+
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.new("L", (8, 8), 255).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+# A blank PNG; OCR itself is mocked since Tesseract is not needed for these tests.
+PNG_BYTES = png_bytes()
+
+
+class VerificationJobTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        User.objects.create(email="holder@example.com")
+
+    def upload(self):
+        upload = SimpleUploadedFile("scan.png", PNG_BYTES, content_type="image/png")
+        return self.client.post(reverse("document-verify"), {"document_file": upload})
+
+    def test_upload_is_queued_and_answered_with_202(self):
+        response = self.upload()
+        self.assertEqual(response.status_code, 202)
+        job = VerificationJob.objects.get()
+        self.assertEqual(response.data["job_id"], str(job.id))
+        self.assertEqual(job.status, VerificationJob.QUEUED)
+        self.assertEqual(response["Location"], reverse("document-verify-job", kwargs={"job_id": job.id}))
+
+    @mock.patch("wallet.ocr_engines.pytesseract.image_to_string", return_value=DRIVER_LICENSE_TEXT)
+    def test_worker_runs_job_and_status_endpoint_reports_result(self, image_to_string):
+        self.upload()
+        call_command("run_verification_worker", "--once", stdout=StringIO())
+
+        job = VerificationJob.objects.get()
+        self.assertEqual(job.status, VerificationJob.DONE)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.document.parsed_fields, parse_credential_from_text(DRIVER_LICENSE_TEXT))
+        response = self.client.get(reverse("document-verify-job", kwargs={"job_id": job.id}))
+        self.assertEqual(response.data["status"], VerificationJob.DONE)
+        self.assertEqual(response.data["result"]["status"], "UNVERIFIED")
+        self.assertEqual(response.data["result_code"], 404)
+
+    @mock.patch("wallet.ocr_engines.pytesseract.image_to_string", side_effect=RuntimeError("no tesseract"))
+    def test_ocr_failure_fails_the_job(self, image_to_string):
+        self.upload()
+        job = run_job(claim_next_job("test"))
+        self.assertEqual(job.status, VerificationJob.FAILED)
+        self.assertIn("no tesseract", job.error)
+
+    def test_claims_are_exclusive_and_abandoned_jobs_requeued(self):
+        self.upload()
+        job = claim_next_job("first")
+        self.assertEqual((job.status, job.claimed_by), (VerificationJob.OCR, "first"))
+        self.assertIsNone(claim_next_job("second"))
+
+        VerificationJob.objects.update(claimed_at=timezone.now() - timedelta(minutes=10))
+        self.assertEqual(requeue_abandoned_jobs(lease_seconds=60, max_attempts=2), 1)
+        retry = claim_next_job("second")
+        self.assertEqual((retry.claimed_by, retry.attempts), ("second", 2))
+
+        # The first worker lost its claim, so its late result is discarded.
+        with mock.patch("wallet.jobs.verify_document", side_effect=RuntimeError("late")):
+            self.assertEqual(run_job(job).claimed_by, "second")
+        self.assertEqual(VerificationJob.objects.get().status, VerificationJob.OCR)
+
+        VerificationJob.objects.update(claimed_at=timezone.now() - timedelta(minutes=10))
+        self.assertEqual(requeue_abandoned_jobs(lease_seconds=60, max_attempts=2), 0)
+        self.assertEqual(VerificationJob.objects.get().status, VerificationJob.FAILED)
+
+    def test_unknown_job(self):
+        response = self.client.get(reverse("document-verify-job", kwargs={"job_id": "00000000-0000-0000-0000-000000000000"}))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(WALLET_CREDENTIAL_FILTER={"refresh_interval": 60})
+class MatchTests(TestCase):
+    def setUp(self):
+        # Query counts below assume a cold credential lookup cache and a
+        # prefilter that is already built.
+        reset_cache()
+        self.addCleanup(reset_cache)
+        reset_filter()
+        self.addCleanup(reset_filter)
+        issuer = Institution.objects.create(name="Addis Ababa University", status="APPROVED")
+        self.record = CredentialRecord.objects.create(
+            issuer=issuer,
+            credential_data={"full_name": "Abebe Kebede Tesfaye", "credential_id": "AAU-2023-CS0042", "program": "CS"},
+        )
+        user = User.objects.create(email="holder@example.com")
+        Document.objects.bulk_create([Document(user=user, document_file="scan.png")])
+        self.document = Document.objects.get()
+        get_filter()
+
+    def test_exact_hash_match(self):
+        outcome = match(self.document, ParseResult(dict(self.record.credential_data), "certificate"))
+        self.assertEqual(outcome.body["status"], "VERIFIED")
+
+    def test_cached_record_deleted_elsewhere_is_not_linked(self):
+        parsed = ParseResult(dict(self.record.credential_data), "certificate")
+        self.assertEqual(match(self.document, parsed).body["status"], "VERIFIED")
+        with self.assertNumQueries(1):  # A warm hit costs only the link.
+            self.assertEqual(match(self.document, parsed).body["status"], "VERIFIED")
+
+        stale = CredentialRecord.objects.get(pk=self.record.pk)
+        Document.objects.update(verified_credential=None)
+        self.record.delete()
+        # As if the deletion happened in another process.
+        get_cache()._store(stale.credential_hash, stale, get_cache()._epoch)
+        self.assertEqual(match(self.document, parsed).http_status, 404)
+        self.document.refresh_from_db()
+        self.assertIsNone(self.document.verified_credential)
+
+    def test_subset_digest_match(self):
+        parsed = ParseResult(
+            {"full_name": "ABEBE KEBEDE TESFAYE", "serial_number": "AAU 2023/CS0042", "certificate_title": "BSc"},
+            "certificate",
+        )
+        with self.assertNumQueries(1):  # The prefilter rules out the hash; then the name + serial digest.
+            outcome = match(self.document, parsed)
+        self.assertEqual((outcome.body["status"], outcome.body["match_id"]), ("CONFIRMATION_REQUIRED", self.record.id))
+
+    def test_serial_fallback_goes_through_the_lookup_index(self):
+        parsed = ParseResult(
+            {"full_name": "Abebe Kebede Tesfay", "serial_number": "AAU 2023/CS0042", "certificate_title": "BSc"},
+            "certificate",
+        )
+        # Hash ruled out by the prefilter, name + serial digest miss (no date
+        # to digest), then one indexed candidate query.
+        with self.assertNumQueries(2):
+            outcome = match(self.document, parsed)
+        self.assertEqual((outcome.body["status"], outcome.body["match_id"]), ("CONFIRMATION_REQUIRED", self.record.id))
+
+        parsed.fields["full_name"] = "Someone Else Entirely"
+        self.assertEqual(match(self.document, parsed).http_status, 404)
+
+    def test_name_search_when_the_serial_is_unreadable(self):
+        parsed = ParseResult(
+            {"full_name": "Abbebe Kebede Tesfay", "serial_number": "AAU 2O23/C5OO4", "certificate_title": "BSc"},
+            "certificate",
+        )
+        outcome = match(self.document, parsed)
+        self.assertEqual((outcome.body["status"], outcome.body["match_id"]), ("CONFIRMATION_REQUIRED", self.record.id))
+
+        # The name alone would disclose the record to anyone who knows it.
+        parsed.fields["serial_number"] = "AAU 2023/CS0117"
+        self.assertEqual(match(self.document, parsed).http_status, 404)
+        del parsed.fields["serial_number"]
+        self.assertEqual(match(self.document, parsed).http_status, 404)
+
+        parsed.fields.update(serial_number="AAU 2O23/C5OO4", full_name="Abebe Girma")
+        self.assertEqual(match(self.document, parsed).http_status, 404)
+
+    def test_prefilter_skips_lookups_of_unknown_keys(self):
+        parsed = ParseResult({"full_name": "Someone Else", "serial_number": "XYZ-1"}, "certificate")
+        # No hash or serial lookup: the name + serial digest, then the name
+        # search's pair and single-token key queries.
+        with self.assertNumQueries(3):
+            self.assertEqual(match(self.document, parsed).http_status, 404)
+        self.assertEqual(get_filter().snapshot()["definitely_absent"], 2)
+
+
+class ReverseMatchTests(TestCase):
+    DATA = {"full_name": "Abebe Kebede Tesfaye", "credential_id": "AAU-2023-CS0042", "issued_date": "2023-07-15"}
+
+    def setUp(self):
+        self.issuer = Institution.objects.create(name="Addis Ababa University", status="APPROVED")
+        self.user = User.objects.create(email="holder@example.com")
+
+    def documents(self, *fields_list, keys=True):
+        documents = []
+        for fields in fields_list:
+            document = Document(user=self.user, document_file="scan.png", parsed_fields=fields)
+            if keys:
+                document.set_match_keys()
+            documents.append(document)
+        return Document.objects.bulk_create(documents)
+
+    def bulk_records(self, rows):
+        """Records as bulk issuance writes them, without save() or the signal."""
+        records = [
+            CredentialRecord(issuer=self.issuer, credential_data=data, credential_hash=CredentialRecord.canonical_hash(data))
+            for data in rows
+        ]
+        for record in records:
+            record.refresh_digests()
+        return CredentialRecord.objects.bulk_create(records)
+
+    def test_issuing_a_record_links_documents_uploaded_before_it(self):
+        exact, subset, other = self.documents(
+            dict(self.DATA),
+            {"full_name": "ABEBE KEBEDE TESFAYE", "credential_id": "AAU 2023/CS0042", "certificate_title": "BSc"},
+            {"full_name": "Someone Else", "credential_id": "XYZ-1"},
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            record = CredentialRecord.objects.create(issuer=self.issuer, credential_data=dict(self.DATA))
+            # Not before the record is committed.
+            exact.refresh_from_db()
+            self.assertIsNone(exact.verified_credential)
+
+        exact.refresh_from_db()
+        subset.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(exact.verified_credential, record)
+        self.assertIsNone(subset.verified_credential)
+        self.assertEqual(subset.suggested_credential, record)
+        self.assertIsNone(other.verified_credential)
+        self.assertIsNone(other.suggested_credential)
+
+    def test_a_digest_shared_by_several_records_is_not_suggested(self):
+        (document,) = self.documents({"full_name": "Abebe Kebede Tesfaye", "credential_id": "AAU-2023-CS0042"})
+        records = self.bulk_records([dict(self.DATA, program=program) for program in ("CS", "EE")])
+
+        self.assertEqual(reverse_match(records), ReverseMatchResult(0, 0))
+        document.refresh_from_db()
+        self.assertIsNone(document.suggested_credential)
+
+    def test_cost_follows_new_records_not_documents(self):
+        self.documents(*({"full_name": f"Holder {index}", "credential_id": f"OLD-{index}"} for index in range(50)))
+        records = self.bulk_records(
+            [dict(self.DATA, credential_id=f"AAU-2023-{index:05d}") for index in range(2 * KEY_CHUNK + 1)]
+        )
+        # Three chunks of keys for the hashes and for the name + serial digests,
+        # one for the name + date digest they all share; no document matches,
+        # so nothing is written.
+        with self.assertNumQueries(7):
+            self.assertEqual(reverse_match(records), ReverseMatchResult(0, 0))
+
+    def test_command_refreshes_keys_and_matches_bulk_created_records(self):
+        (document,) = self.documents(dict(self.DATA), keys=False)
+        (record,) = self.bulk_records([dict(self.DATA)])
+
+        call_command("reverse_match_documents", "--refresh-keys", stdout=StringIO())
+        document.refresh_from_db()
+        self.assertEqual(document.verified_credential, record)
+
+
+def png_header(width, height) -> bytes:
+    """The start of a PNG declaring the given size: signature, IHDR and a stub IDAT."""
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", b"\0" * 16)
+
+
+@override_settings(WALLET_ASYNC_VERIFICATION=True)
+class UploadScreeningTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        User.objects.create(email="holder@example.com")
+
+    def upload(self, data, name="scan.png"):
+        upload = SimpleUploadedFile(name, data, content_type="image/png")
+        return self.client.post(reverse("document-verify"), {"document_file": upload})
+
+    def test_sniffs_and_records_type_and_digest(self):
+        self.assertEqual(sniff_content_type(PNG_BYTES), "image/png")
+        self.assertEqual(sniff_content_type(b"\n%PDF-1.7\n"), "application/pdf")
+        self.assertIsNone(sniff_content_type(b"PK\x03\x04 a zip"))
+
+        self.assertEqual(self.upload(scanned_pdf(1), name="scan.png").status_code, 202)
+        document = Document.objects.get()
+        self.assertEqual(document.content_type, "application/pdf")
+        self.assertEqual(document.content_hash, hashlib.sha256(scanned_pdf(1)).hexdigest())
+
+    def test_rejects_unsupported_types_whatever_the_name(self):
+        response = self.upload(b"<html>" + b"x" * 2000)
+        self.assertEqual(response.status_code, 415)
+        self.assertIn("document_file", response.data)
+        self.assertEqual(self.upload(b"MZ").status_code, 415)  # Shorter than the sniff window.
+        self.assertFalse(Document.objects.exists())
+
+    @override_settings(WALLET_UPLOAD_MAX_BYTES=100_000)
+    def test_rejects_oversized_files(self):
+        response = self.upload(PNG_BYTES + b"\0" * 200_000)
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(Document.objects.exists())
+
+    def test_rejects_decompression_bombs_from_the_header(self):
+        self.assertEqual(image_dimensions(png_header(12_000, 10_000)), (12_000, 10_000))
+        for width, height in ((12_000, 10_000), (50_000, 40_000)):  # Ours, then Pillow's limit.
+            response = self.upload(png_header(width, height))
+            self.assertEqual(response.status_code, 413)
+            self.assertIn("pixels", str(response.data["document_file"][0]))
+        self.assertEqual(self.upload(png_header(100, 100)[:20]).status_code, 400)  # Truncated header.
+
+
+class OCRCacheTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        User.objects.create(email="holder@example.com")
+        STATS.reset()
+
+    def output(self, text=CERTIFICATE_TEXT):
+        return OCROutput(text, None, parse_document(text))
+
+    @mock.patch("wallet.ocr_engines.pytesseract.image_to_string", return_value=CERTIFICATE_TEXT)
+    def test_reupload_skips_ocr(self, image_to_string):
+        for _ in range(2):
+            upload = SimpleUploadedFile("scan.png", PNG_BYTES, content_type="image/png")
+            self.client.post(reverse("document-verify"), {"document_file": upload})
+        call_command("run_verification_worker", "--once", stdout=StringIO())
+
+        self.assertEqual(image_to_string.call_count, 1)
+        first, second = Document.objects.order_by("id")
+        self.assertEqual(first.content_hash, hashlib.sha256(PNG_BYTES).hexdigest())
+        self.assertEqual(second.parsed_fields, first.parsed_fields)
+        self.assertEqual(second.extracted_text, CERTIFICATE_TEXT)
+        self.assertEqual(OCRCacheEntry.objects.get().hit_count, 1)
+        self.assertEqual((STATS.hits, STATS.misses), (1, 1))
+
+    def test_waits_for_pending_claim_then_bypasses(self):
+        OCRCacheEntry.objects.create(content_hash="abc", engine_version="v1")
+        compute = mock.Mock(return_value=self.output())
+        fetch_or_compute("abc", "v1", compute, reparse=None, wait_timeout=0.05, poll_interval=0.01)
+        compute.assert_called_once()
+        self.assertEqual(STATS.bypassed, 1)
+        # The other process still owns the claim.
+        self.assertEqual(OCRCacheEntry.objects.get().status, OCRCacheEntry.PENDING)
+
+    def test_abandoned_claim_is_taken_over(self):
+        OCRCacheEntry.objects.create(content_hash="abc", engine_version="v1")
+        output = fetch_or_compute("abc", "v1", lambda: self.output(), reparse=None, pending_timeout=0)
+        self.assertEqual(output.parsed, parse_document(CERTIFICATE_TEXT))
+        self.assertEqual(OCRCacheEntry.objects.get().status, OCRCacheEntry.READY)
+
+    def test_failed_ocr_releases_claim(self):
+        with self.assertRaises(RuntimeError):
+            fetch_or_compute("abc", "v1", mock.Mock(side_effect=RuntimeError), reparse=None)
+        self.assertFalse(OCRCacheEntry.objects.exists())
+
+    def test_entries_from_an_older_parser_are_reparsed(self):
+        fetch_or_compute("abc", "v1", lambda: self.output(), reparse=None)
+        OCRCacheEntry.objects.update(parser_version="0.old", parsed_fields=None)
+        reparse = mock.Mock(return_value=parse_document(CERTIFICATE_TEXT))
+        output = fetch_or_compute("abc", "v1", None, reparse=reparse)
+        reparse.assert_called_once_with(CERTIFICATE_TEXT, None)
+        self.assertEqual(output.parsed.fields, parse_credential_from_text(CERTIFICATE_TEXT))
+        self.assertEqual(OCRCacheEntry.objects.get().parser_version, PARSER_VERSION)
+
+    def test_prune_by_age_and_count(self):
+        now = timezone.now()
+        for age in range(5):
+            fetch_or_compute(f"hash{age}", "v1", lambda: self.output(), reparse=None)
+            OCRCacheEntry.objects.filter(content_hash=f"hash{age}").update(last_used_at=now - timedelta(days=age * 10))
+        self.assertEqual(prune(max_entries=10, max_age_days=25), 2)
+        self.assertEqual(prune(max_entries=2, max_age_days=25), 1)
+        self.assertEqual(
+            sorted(OCRCacheEntry.objects.values_list("content_hash", flat=True)), ["hash0", "hash1"]
+        )
+
+
+class TieredOCRTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(
+            override_settings(MEDIA_ROOT=media_root, WALLET_OCR_CACHE=False, WALLET_OCR_TEMPLATES=False)
+        )
+        self.path = os.path.join(media_root, "scan.png")
+        Image.new("L", (2400, 1600), 255).save(self.path)
+
+    @mock.patch("wallet.ocr_engines.pytesseract.image_to_string", return_value=CERTIFICATE_TEXT)
+    def test_stops_at_the_fast_pass_when_it_parses(self, image_to_string):
+        output = ocr_tiered(self.path)
+        self.assertEqual((output.tier, output.passes), ("fast", 1))
+        self.assertEqual(max(image_to_string.call_args.args[0].size), 1200)
+        self.assertEqual(output.parsed.fields, parse_credential_from_text(CERTIFICATE_TEXT))
+
+    @mock.patch("wallet.ocr_engines.pytesseract.image_to_string")
+    def test_escalates_until_the_required_fields_parse(self, image_to_string):
+        image_to_string.side_effect = ["Certificate", "Certificate of Completion", CERTIFICATE_TEXT, "unused"]
+        stages = []
+        output = ocr_tiered(self.path, on_stage=stages.append)
+        self.assertEqual((output.tier, output.passes), ("psm6", 3))
+        self.assertEqual([c.kwargs["config"] for c in image_to_string.call_args_list], ["", "", "--psm 6"])
+        self.assertEqual(stages, ["parsing", "ocr", "parsing", "ocr", "parsing"])
+
+    @mock.patch("wallet.ocr_engines.pytesseract.image_to_string")
+    def test_no_tier_parses(self, image_to_string):
+        image_to_string.side_effect = ["a", "the longest text", "b", "c"]
+        output = ocr_tiered(self.path)
+        self.assertEqual((output.tier, output.passes, output.text), ("", 4, "the longest text"))
+        self.assertIsNone(output.parsed.fields)
+
+    @mock.patch("wallet.ocr_engines.pytesseract.image_to_string", return_value="")
+    def test_identical_passes_are_skipped(self, image_to_string):
+        Image.new("L", (800, 600), 255).save(self.path)
+        tiers = [OCRTier("fast", max_edge=1200), OCRTier("full"), OCRTier("psm6", config="--psm 6")]
+        self.assertEqual(ocr_tiered(self.path, tiers).passes, 2)
+
+    @mock.patch("wallet.ocr_engines.pytesseract.image_to_string", return_value=CERTIFICATE_TEXT)
+    def test_tier_is_recorded_on_the_document(self, image_to_string):
+        user = User.objects.create(email="holder@example.com")
+        document = Document(user=user, document_file="scan.png")
+        Document.objects.bulk_create([document])
+        document = Document.objects.get()
+        verify_document(document)
+        document.refresh_from_db()
+        self.assertEqual((document.ocr_tier, document.ocr_passes), ("fast", 1))
+
+        out = StringIO()
+        call_command("ocr_tier_report", stdout=out)
+        self.assertIn("1 document(s) OCRed", out.getvalue())
+        self.assertRegex(out.getvalue(), r"fast\s+1\s+100.0%")
+
+
+class CardTemplateTests(SimpleTestCase):
+    # Each region of the driver licence template is painted its own grey, so
+    # the fake OCR can tell which crop it was given.
+    TEXTS = {
+        10: "Federal Democratic Republic of Ethiopia\nEthiopian Driver License",
+        40: "Almaz Tadesse Bekele",
+        70: "DL-884213",
+        100: "03/11/2020",
+    }
+
+    def card(self, header=10):
+        image = Image.new("L", (1012, 638), 255)
+        draw = ImageDraw.Draw(image)
+        boxes = [HEADER_BOX] + [region.box for region in next(t for t in CARD_TEMPLATES if t.name == "driver_license").regions]
+        for shade, (left, top, right, bottom) in zip((header, 40, 70, 100), boxes):
+            draw.rectangle((left * 1012, top * 638, right * 1012 - 1, bottom * 638 - 1), fill=shade)
+        return image
+
+    def fake_ocr(self, image, config):
+        return self.TEXTS.get(image.getpixel((image.width // 2, image.height // 2)), "")
+
+    def test_reads_the_template_regions(self):
+        read = read_card(self.card(), self.fake_ocr)
+        self.assertEqual(read.template.name, "driver_license")
+        self.assertEqual(
+            read.parsed.fields,
+            {
+                "full_name": "Almaz Tadesse Bekele",
+                "serial_number": "DL-884213",
+                "issued_date": "2020-11-03",
+                "certificate_title": "Ethiopian Driver License",
+            },
+        )
+        # The stored text reparses to the same fields.
+        self.assertEqual(parse_credential_from_text(read.text), read.parsed.fields)
+
+    def test_a_name_alone_does_not_complete_the_read(self):
+        with mock.patch.dict(self.TEXTS, {70: "", 100: ""}):
+            read = read_card(self.card(), self.fake_ocr)
+        self.assertEqual(read.template.name, "driver_license")
+        self.assertIsNone(read.parsed.fields)
+        with mock.patch.dict(self.TEXTS, {70: ""}):
+            fields = read_card(self.card(), self.fake_ocr).parsed.fields
+        self.assertEqual(fields["certificate_title"], "Ethiopian Driver License")
+
+    def test_printed_card_fields_fall_inside_their_regions(self):
+        image, printed = printed_driver_license()
+        # Each printed item has its own ink colour; OCR "reads" the items
+        # whose every pixel is in the crop, and garbles the ones cut off.
+        total = {colour: count for count, colour in image.getcolors()}
+
+        def ocr(crop, config):
+            inside = {colour: count for count, colour in crop.getcolors()}
+            read = []
+            for colour, text in printed.items():
+                if colour in inside:
+                    read.append(text if inside[colour] == total[colour] else "#" * len(text))
+            return "\n".join(read)
+
+        read = read_card(image, ocr)
+        self.assertEqual(read.template.name, "driver_license")
+        self.assertEqual(
+            read.parsed.fields,
+            {
+                "full_name": "Almaz Tadesse Bekele",
+                "serial_number": "DL-884213",
+                "issued_date": "2020-11-03",
+                "certificate_title": "Ethiopian Driver License",
+            },
+        )
+
+    @skipUnless(shutil.which("tesseract"), "Tesseract is not installed.")
+    def test_printed_card_with_tesseract(self):
+        image, _ = printed_driver_license()
+        read = read_card(image.convert("L"), lambda crop, config: get_engine().image_to_string(crop, config))
+        fields = read.parsed.fields
+        self.assertEqual((fields["full_name"], fields["serial_number"]), ("Almaz Tadesse Bekele", "DL-884213"))
+
+    def test_sample_photo_is_not_read_as_a_card(self):
+        # A phone photo of a licence: portrait, with the desk around the card.
+        path = os.path.join(settings.BASE_DIR, "media", "user_documents", "Driver_licence.jpg")
+        ocr = mock.Mock()
+        with Image.open(path) as image:
+            self.assertIsNone(read_card(image, ocr))
+        ocr.assert_not_called()
+
+    def test_non_cards_and_unknown_headers(self):
+        ocr = mock.Mock(side_effect=self.fake_ocr)
+        self.assertIsNone(read_card(Image.new("L", (1240, 1754), 255), ocr))
+        ocr.assert_not_called()
+        read = read_card(self.card(header=200), ocr)
+        self.assertEqual((read.template, read.parsed.fields, read.passes), (None, None, 1))
+
+    def test_templates_ocr_a_fraction_of_the_card(self):
+        for template in CARD_TEMPLATES:
+            self.assertLess(template.ocr_area, 0.45, template.name)
+
+    def test_pipeline_uses_the_template_first(self):
+        path = os.path.join(tempfile.mkdtemp(), "card.png")
+        self.addCleanup(shutil.rmtree, os.path.dirname(path), ignore_errors=True)
+        self.card().save(path)
+        with mock.patch("wallet.ocr_engines.pytesseract.image_to_string", side_effect=self.fake_ocr) as ocr:
+            output = ocr_tiered(path)
+        self.assertEqual((output.tier, output.passes), ("template", 2))
+        self.assertEqual(sorted(c.kwargs["config"] for c in ocr.call_args_list), ["--psm 6"] + ["--psm 7"] * 3)
+
+
+def printed_driver_license():
+    """
+    A driver licence printed as the issuer lays it out, at 300 dpi, with a
+    photo, a background pattern and fields the template skips. Returns the
+    image and {ink colour: text} for every printed item.
+    """
+    image = Image.new("RGB", (1012, 638), (250, 246, 235))
+    draw = ImageDraw.Draw(image)
+    draw.fontmode = "1"  # No anti-aliasing: each item keeps its own colour.
+    for x in range(-638, 1012, 24):
+        draw.line((x, 638, x + 638, 0), fill=(236, 230, 214))
+    draw.rectangle((40, 150, 290, 480), fill=(150, 150, 160))
+    items = [
+        ((30, 18), "Federal Democratic Republic of Ethiopia", 30),
+        ((30, 68), "Ethiopian Driver License", 30),
+        ((340, 190), "Almaz Tadesse Bekele", 36),
+        ((340, 268), "DL-884213", 34),
+        ((340, 345), "Grade: 3", 26),
+        ((340, 420), "03/11/2020", 34),
+        ((340, 500), "Blood Group: O+", 26),
+    ]
+    printed = {}
+    for index, (position, text, size) in enumerate(items):
+        colour = (index * 10, 0, 40)
+        draw.text(position, text, fill=colour, font=ImageFont.load_default(size=size))
+        printed[colour] = text
+    return image, printed
+
+
+def text_pdf(pages) -> bytes:
+    """A minimal PDF with one Helvetica text page per string, i.e. a text layer."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        lines = " ".join(
+            "(%s) '" % line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            for line in text.splitlines()
+        )
+        stream = f"BT /F1 11 Tf 14 TL 72 760 Td {lines} ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+def scanned_pdf(page_count) -> bytes:
+    """An image-only PDF (no text layer), as a scanner produces."""
+    pages = [Image.new("L", (850, 1100), 255) for _ in range(page_count)]
+    out = io.BytesIO()
+    pages[0].save(out, "PDF", save_all=True, append_images=pages[1:], resolution=100)
+    return out.getvalue()
+
+
+class PDFIngestionTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = os.path.join(directory, "transcript.pdf")
+
+    def write(self, data):
+        with open(self.path, "wb") as handle:
+            handle.write(data)
+
+    @mock.patch("wallet.ocr_engines.pytesseract.image_to_string")
+    def test_text_layer_is_used_without_ocr(self, image_to_string):
+        self.write(text_pdf(["Official Transcript of Academic Record\nPage one has no fields", CERTIFICATE_TEXT, "Page three"]))
+        self.assertTrue(is_pdf(self.path))
+        output = ocr_document(self.path)
+        image_to_string.assert_not_called()
+        self.assertEqual((output.tier, output.passes), ("pdf-text", 0))
+        self.assertEqual(output.parsed.fields, parse_credential_from_text(CERTIFICATE_TEXT))
+        self.assertNotIn("Page three", output.text)  # Stopped after page 2.
+
+    @mock.patch("wallet.ocr_engines.pytesseract.image_to_string")
+    def test_scanned_pages_are_rendered_and_ocred_lazily(self, image_to_string):
+        self.write(scanned_pdf(50))
+        image_to_string.side_effect = ["Transcript page", "Continued", CERTIFICATE_TEXT] + ["unused"] * 47
+        with mock.patch("wallet.pdf._render", wraps=pdf_render) as render:
+            output = ocr_document(self.path)
+        self.assertEqual((output.tier, output.passes, render.call_count), ("pdf-ocr", 3, 3))
+        # Rendered straight at the preprocessing size cap (2500 px long edge).
+        self.assertEqual(image_to_string.call_args.args[0].size, (1932, 2500))
+        self.assertEqual(output.parsed.fields, parse_credential_from_text(CERTIFICATE_TEXT))
+
+    @mock.patch("wallet.ocr_engines.pytesseract.image_to_string", return_value="nothing here")
+    def test_page_limit_and_no_fields(self, image_to_string):
+        self.write(scanned_pdf(5))
+        with override_settings(WALLET_PDF_MAX_PAGES=2):
+            output = ocr_document(self.path)
+        self.assertEqual((output.tier, output.passes, output.parsed.fields), ("", 2, None))
+
+    def test_pages_read_so_far_are_parsed_once_they_hold_the_fields(self):
+        filler = "Course listing continues on the next page"
+        pages = [filler] * 30 + ["Name: Abebe Kebede Tesfaye"] + [filler] * 30
+        pages += ["Serial No: AAU-2023-CS0042", "Page after the serial number"]
+        self.write(text_pdf(pages))
+        with mock.patch("wallet.verification.parse_document", wraps=parse_document) as parse:
+            output = ocr_document(self.path)
+        # Not once per page: that re-reads the whole text each time.
+        self.assertEqual(parse.call_count, 1)
+        self.assertEqual(output.parsed, parse_document("\n\n".join(pages[:-1])))
+        self.assertNotIn("Page after", output.text)
+
+    def test_corrupt_pdf_is_an_ocr_error(self):
+        self.write(b"%PDF-1.4 truncated")
+        with self.assertRaises(OCRError):
+            ocr_document(self.path)
+
+
+class PreprocessingTests(SimpleTestCase):
+    def photo(self, seed):
+        return render_document(CERTIFICATE_TEXT, random.Random(seed), size=(1600, 1200))
+
+    def test_default_steps_shrink_and_orient_the_image(self):
+        for seed in range(6):
+            result = preprocess(io.BytesIO(self.photo(seed)), PreprocessConfig(max_edge=800))
+            self.assertEqual(result.image.mode, "L")
+            # Landscape again even when stored sideways with an EXIF tag.
+            self.assertEqual(result.image.size, (800, 600))
+            self.assertIn("draft", result.timings)
+
+    def test_dpi_cap_holds_for_photos_stored_sideways(self):
+        stored = Image.new("RGB", (1000, 500), "white")
+        exif = stored.getexif()
+        exif[0x0112] = 6  # Rotate 90 degrees on display, as phones store portraits.
+        buffer = io.BytesIO()
+        stored.save(buffer, "PNG", dpi=(600, 600), exif=exif)
+        result = preprocess(io.BytesIO(buffer.getvalue()), PreprocessConfig(max_edge=10000, target_dpi=300))
+        self.assertEqual(result.image.size, (250, 500))
+
+    def test_disabled_config_is_a_plain_decode(self):
+        result = preprocess(io.BytesIO(self.photo(0)), PreprocessConfig.disabled())
+        self.assertEqual(result.image.mode, "RGB")
+        self.assertEqual(list(result.timings), ["decode"])
+        self.assertEqual(result.image.size, result.original_size)
+
+    def test_estimate_skew(self):
+        page = Image.new("L", (1200, 900), 255)
+        draw = ImageDraw.Draw(page)
+        for line in range(12):
+            draw.text((60, 60 + line * 60), "Certificate of Completion " * 2, fill=0, font=ImageFont.load_default(size=28))
+        self.assertEqual(estimate_skew(page.rotate(2, fillcolor=255)), -2.0)
+        self.assertEqual(estimate_skew(page), 0.0)
+
+    def test_step_ladder_enables_one_more_step_each_time(self):
+        ladder = step_ladder()
+        self.assertEqual(ladder[0][0], "none")
+        self.assertEqual(ladder[-1][1].deskew, True)
+        self.assertEqual(len(ladder), 7)
+
+
+class EchoOCRBackend:
+    """Stands in for Tesseract in pool workers; a 13x13 image hangs."""
+
+    def image_to_string(self, image, config=""):
+        if image.size == (13, 13):
+            time.sleep(30)
+        return f"{image.mode} {image.width}x{image.height} pid {os.getpid()}"
+
+
+class PooledEngineTests(SimpleTestCase):
+    def pool(self, **options):
+        pool = PooledEngine(backend_factory=EchoOCRBackend, start_method="fork", version="echo", **options)
+        self.addCleanup(pool.close)
+        return pool
+
+    @mock.patch("wallet.ocr_engines._tesseract_version", return_value="5.3.0")
+    def test_version_names_the_backend_workers_build(self, tesseract_version):
+        with mock.patch.object(TesserocrBackend, "describe", side_effect=ImportError):
+            self.assertEqual(PooledEngine().version, "pytesseract/tesseract-5.3.0")
+        with mock.patch.object(TesserocrBackend, "describe", return_value="tesserocr-2.6.2/tesseract-5.3.0"):
+            self.assertEqual(PooledEngine().version, "tesserocr-2.6.2/tesseract-5.3.0")
+            # The bindings honour fewer flags, so their OCR output is cached apart.
+            self.assertNotEqual(PooledEngine().version, SubprocessEngine().version)
+        self.assertEqual(PooledEngine(backend_factory=PytesseractBackend).version, SubprocessEngine().version)
+
+    def test_workers_stay_warm_and_are_recycled(self):
+        pool = self.pool(size=1, max_jobs_per_worker=2)
+        image = Image.new("L", (20, 10))
+        first, second, third = (pool.image_to_string(image) for _ in range(3))
+        self.assertTrue(first.startswith("L 20x10"))
+        self.assertEqual(first, second)
+        self.assertNotEqual(second, third)
+        self.assertEqual(pool.recycled, 1)
+
+    def test_timeout_replaces_the_worker(self):
+        pool = self.pool(size=1, timeout=0.5)
+        before = pool.image_to_string(Image.new("RGB", (20, 10)))
+        with self.assertRaises(OCRTimeout):
+            pool.image_to_string(Image.new("L", (13, 13)))
+        after = pool.image_to_string(Image.new("RGB", (20, 10)))
+        self.assertNotEqual(before, after)
+        self.assertEqual(pool.timeouts, 1)
+
+
+class OCRGovernorTests(TestCase):
+    def setUp(self):
+        # Governors set OMP_THREAD_LIMIT for the process.
+        self.enterContext(mock.patch.dict(os.environ))
+
+    def test_limit_from_cpu_share(self):
+        governor = OCRGovernor.from_settings({"cpu_share": 0.5, "thread_limit": 2, "processes": 2}, cpu_count=16)
+        self.assertEqual(governor.limit, 2)
+        self.assertEqual(os.environ["OMP_THREAD_LIMIT"], "2")
+        self.assertEqual(OCRGovernor.from_settings({}, cpu_count=1).limit, 1)
+
+    def test_queues_up_to_limit_and_fails_fast(self):
+        governor = OCRGovernor(limit=1, max_queue=1, max_wait=5.0, initial_job_seconds=0.1)
+        release = threading.Event()
+        queued_done = threading.Event()
+
+        def hold():
+            with governor.slot():
+                release.wait(5)
+
+        def queued():
+            with governor.slot():
+                queued_done.set()
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        while not governor.snapshot()["in_flight"]:
+            time.sleep(0.001)
+        waiter = threading.Thread(target=queued)
+        waiter.start()
+        while not governor.snapshot()["queue_depth"]:
+            time.sleep(0.001)
+
+        with self.assertRaises(OCRBusy):  # The queue is full.
+            with governor.slot():
+                pass
+        release.set()
+        holder.join()
+        waiter.join()
+        self.assertTrue(queued_done.is_set())
+        snapshot = governor.snapshot()
+        self.assertEqual((snapshot["completed"], snapshot["rejected"], snapshot["waits"]), (2, 1, 1))
+
+    def test_predicted_wait_past_deadline_is_refused(self):
+        governor = OCRGovernor(limit=1, initial_job_seconds=30.0)
+        with governor.slot():
+            with self.assertRaises(OCRBusy) as busy:
+                with governor.slot(max_wait=1.0):
+                    pass
+        self.assertGreaterEqual(busy.exception.retry_after, 30)
+
+    @override_settings(WALLET_ASYNC_VERIFICATION=False)
+    def test_sync_verify_answers_503_when_busy(self):
+        User.objects.create(email="holder@example.com")
+        governor = OCRGovernor(limit=1, max_queue=0)
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        with override_settings(MEDIA_ROOT=media_root), mock.patch(
+            "wallet.verification.get_governor", return_value=governor
+        ), governor.slot():
+            upload = SimpleUploadedFile("scan.png", PNG_BYTES, content_type="image/png")
+            response = self.client.post(reverse("document-verify"), {"document_file": upload})
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response)
+        self.assertFalse(Document.objects.exists())
@@ -0,0 +1,236 @@
+"""
+Upload handling for document endpoints.
+"""
+
+import hashlib
+import io
+import warnings
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from PIL import Image
+from rest_framework import status
+from rest_framework.response import Response
+
+PDF = "application/pdf"
+IMAGE_TYPES = ("image/jpeg", "image/png", "image/gif", "image/tiff", "image/bmp", "image/webp")
+DOCUMENT_TYPES = IMAGE_TYPES + (PDF,)
+
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+    (b"BM", "image/bmp"),
+)
+# Enough for every signature above; a PDF header may start anywhere in the
+# first 1 KB.
+_SNIFF_BYTES = 1024
+# Image dimensions are read from at most this much of the file. JPEG puts
+# them after the EXIF block, which includes a thumbnail.
+_HEADER_BYTES = 1024 * 1024
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """
+    Computes the SHA-256 of each uploaded file while its chunks stream past,
+    then lets the next handler in the chain store the file as usual.
+
+    Install it first, before the request body is read; the digests end up in
+    `request.upload_sha256`, keyed by form field name.
+    """
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.digest = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.digest.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        if not hasattr(self.request, "upload_sha256"):
+            self.request.upload_sha256 = {}
+        self.request.upload_sha256[self.field_name] = self.digest.hexdigest()
+        return None
+
+
+class UploadInfo(NamedTuple):
+    """What the screening handler learned about an upload while it streamed in."""
+
+    sha256: str
+    content_type: str
+    size: int
+    # (width, height) read from the image header; None for PDFs, and for the
+    # rare image whose header lies beyond the first megabyte.
+    image_size: Optional[Tuple[int, int]]
+
+
+class UploadRejected(Exception):
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def sniff_content_type(header: bytes) -> Optional[str]:
+    """The content type the leading bytes of a file identify, if supported."""
+    for magic, content_type in _SIGNATURES:
+        if header.startswith(magic):
+            return content_type
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    if b"%PDF-" in header[:_SNIFF_BYTES]:
+        return PDF
+    return None
+
+
+def image_dimensions(header: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Width and height from the start of an image file, without decoding any
+    pixels; None if the header is not all there yet. Raises UploadRejected
+    for sizes Pillow itself refuses to open.
+    """
+    try:
+        with warnings.catch_warnings():
+            # We apply our own limit; the warning threshold is irrelevant here.
+            warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+            with Image.open(io.BytesIO(header)) as image:
+                return image.size
+    except Image.DecompressionBombError as e:
+        raise UploadRejected(str(e), status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    except Exception:
+        return None
+
+
+class ScreeningUploadHandler(HashingUploadHandler):
+    """
+    Hashes uploads like HashingUploadHandler and screens them while they
+    stream in: files over `max_bytes`, files whose magic bytes are not one of
+    `allowed_types`, and images whose header declares more than `max_pixels`
+    (decompression bombs) are rejected before the rest of the file is
+    stored. Rejections are collected in `request.upload_rejections` and the
+    accepted files' `UploadInfo` in `request.upload_info`, both keyed by form
+    field name; see `upload_rejection_response`.
+
+    Limits default to WALLET_UPLOAD_MAX_BYTES (20 MB) and
+    WALLET_UPLOAD_MAX_PIXELS (90 megapixels).
+    """
+
+    def __init__(
+        self,
+        request=None,
+        allowed_types=DOCUMENT_TYPES,
+        max_bytes: Optional[int] = None,
+        max_pixels: Optional[int] = None,
+    ):
+        super().__init__(request)
+        self.allowed_types = allowed_types
+        self.max_bytes = max_bytes or getattr(settings, "WALLET_UPLOAD_MAX_BYTES", 20 * 1024 * 1024)
+        self.max_pixels = max_pixels or getattr(settings, "WALLET_UPLOAD_MAX_PIXELS", 90_000_000)
+        if not hasattr(request, "upload_rejections"):
+            request.upload_rejections = {}
+            request.upload_info = {}
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.size = 0
+        self.header = b""
+        self.detected_type = None
+        self.dimensions = None
+        # Set once the type and (for images) the dimensions are known.
+        self.screened = False
+
+    def reject(self, message: str, status_code: int):
+        self.request.upload_rejections[self.field_name] = UploadRejected(message, status_code)
+        # Discard the rest of this file without storing it.
+        raise SkipFile(message)
+
+    def screen(self, complete: bool):
+        if self.detected_type is None:
+            self.detected_type = sniff_content_type(self.header)
+            if self.detected_type is None:
+                if complete or len(self.header) >= _SNIFF_BYTES:
+                    self.reject("Unsupported file type; upload an image or a PDF.", status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+                return
+            if self.detected_type not in self.allowed_types:
+                self.reject(f"{self.detected_type} uploads are not accepted here.", status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        if self.detected_type == PDF:
+            # Page rendering is capped by the OCR preprocessing size anyway.
+            self.screened = True
+            return
+        try:
+            self.dimensions = image_dimensions(self.header)
+        except UploadRejected as e:
+            self.reject(str(e), e.status_code)
+        if self.dimensions is not None:
+            width, height = self.dimensions
+            if width * height > self.max_pixels:
+                self.reject(
+                    f"Image is {width}x{height} pixels; the limit is {self.max_pixels} pixels.",
+                    status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                )
+            self.screened = True
+        elif complete and len(self.header) < _HEADER_BYTES:
+            self.reject("The image could not be read.", status.HTTP_400_BAD_REQUEST)
+        elif len(self.header) >= _HEADER_BYTES:
+            # Header not found early; Pillow's own limit still applies at decode.
+            self.screened = True
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.size > self.max_bytes:
+            self.reject(
+                f"File exceeds the {self.max_bytes // (1024 * 1024)} MB upload limit.",
+                status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+        if not self.screened:
+            self.header += raw_data[: _HEADER_BYTES - len(self.header)]
+            self.screen(complete=False)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if not self.screened:
+            try:
+                self.screen(complete=True)
+            except SkipFile:
+                # Too late to skip; the rejection is recorded and the view refuses it.
+                return None
+        super().file_complete(file_size)
+        self.request.upload_info[self.field_name] = UploadInfo(
+            self.digest.hexdigest(), self.detected_type, self.size, self.dimensions
+        )
+        return None
+
+
+def screen_uploads(request, **options) -> ScreeningUploadHandler:
+    """
+    Put a ScreeningUploadHandler first in the request's handler chain. Call it
+    before anything reads `request.data` or `request.FILES`.
+    """
+    handler = ScreeningUploadHandler(request, **options)
+    request.upload_handlers.insert(0, handler)
+    return handler
+
+
+def upload_rejection_response(request) -> Optional[Response]:
+    """An error response for the first rejected upload, or None. Reads the request body."""
+    request.data  # Parse the body so the handlers run.
+    rejections: Dict[str, UploadRejected] = getattr(request, "upload_rejections", {})
+    for field_name, rejection in rejections.items():
+        return Response({field_name: [str(rejection)]}, status=rejection.status_code)
+    return None
+
+
+def file_sha256(field_file) -> str:
+    """SHA-256 of a stored file, for uploads that bypassed HashingUploadHandler."""
+    digest = hashlib.sha256()
+    field_file.open("rb")
+    try:
+        for chunk in field_file.chunks():
+            digest.update(chunk)
+    finally:
+        field_file.close()
+    return digest.hexdigest()
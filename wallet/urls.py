@@ -1,5 +1,10 @@
 from django.urls import path
-from .views import UserDocumentVerifyView, UserDocumentConfirmView
+from .views import (
+    OCRStatusView,
+    UserDocumentConfirmView,
+    UserDocumentVerifyView,
+    VerificationJobStatusView,
+)
 
 urlpatterns = [
     # Endpoint for uploading a document to start the verification process.
@@ -10,4 +15,12 @@ urlpatterns = [
         UserDocumentConfirmView.as_view(),
         name="document-verify-confirm",
     ),
+    # Endpoint for polling a queued verification.
+    path(
+        "verify/jobs/<uuid:job_id>/",
+        VerificationJobStatusView.as_view(),
+        name="document-verify-job",
+    ),
+    # Endpoint for staff to check OCR load (governor queue, cache hit rate).
+    path("ocr/status/", OCRStatusView.as_view(), name="ocr-status"),
 ]
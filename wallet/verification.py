@@ -0,0 +1,416 @@
+"""
+The document verification pipeline: OCR, parsing and matching against
+trusted credential records.
+
+`UserDocumentVerifyView` runs it inline when asynchronous verification is
+off; otherwise the `run_verification_worker` command runs it for queued
+`VerificationJob`s. Both produce the same response bodies.
+"""
+
+import hashlib
+from contextlib import closing
+from typing import Callable, NamedTuple, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db.models import Exists
+from PIL import Image
+from rest_framework import status
+from thefuzz import fuzz
+
+from institutions.bloom import get_filter
+from institutions.lookup import SUBSET_DIGESTS, credential_serial, normalize_serial, serial_shape, subset_digests
+from institutions.matching import ScoredCandidate, search_by_name
+from institutions.models import CredentialLookup, CredentialRecord
+from institutions.record_cache import invalidate, record_by_hash
+
+from . import ocr_cache
+from .card_templates import CARD_TEMPLATES, read_card, templates_enabled
+from .layout import OCRLayout, parse_layout_document
+from .models import Document
+from .ocr_cache import OCROutput
+from .ocr_engines import get_engine
+from .ocr_governor import OCRBusy, get_governor
+from .parser import GENERIC_PROFILE, ParseResult, extract_fields, finalize_fields, parse_document
+from .pdf import is_pdf, iter_pdf_pages
+from .preprocessing import PreprocessConfig, preprocess
+from .uploads import PDF
+
+
+# Records sharing a serial that the fuzzy fallback compares names against.
+MAX_SERIAL_CANDIDATES = 20
+# A name search result is suggested when its holder name scores above 90, like
+# the serial fallback, and its combined name/date/title score reaches this.
+NAME_SEARCH_MIN_SCORE = 85
+# ...and when its issue date is the parsed one, or its serial scores at least
+# this against the parsed serial with OCR confusions folded (see
+# name_search_accepts).
+PARTIAL_SERIAL_MIN_SCORE = 90
+
+
+class OCRError(Exception):
+    """Tesseract could not read the uploaded file."""
+
+
+class VerificationOutcome(NamedTuple):
+    body: dict
+    http_status: int
+
+
+def hash_parsed_fields(data: dict) -> str:
+    """SHA-256 of the canonical JSON form, matching CredentialRecord.credential_hash."""
+    return CredentialRecord.canonical_hash(data)
+
+
+def extraction_mode() -> str:
+    return getattr(settings, "WALLET_OCR_EXTRACTION_MODE", "text")
+
+
+class OCRTier(NamedTuple):
+    """One rung of the OCR ladder: an optional tighter long-edge cap and Tesseract flags."""
+
+    name: str
+    max_edge: Optional[int] = None
+    config: str = ""
+
+
+# Cheapest first. Most uploads parse from the downscaled pass; the rest
+# escalate to full resolution, then to other page segmentation modes
+# (6: one uniform block of text, 11: sparse text, good for ID cards).
+DEFAULT_OCR_TIERS = (
+    OCRTier("fast", max_edge=1200),
+    OCRTier("full"),
+    OCRTier("psm6", config="--psm 6"),
+    OCRTier("psm11", config="--psm 11"),
+)
+
+
+# Recorded when a card template read the document (see wallet.card_templates).
+TEMPLATE_TIER = "template"
+# Recorded for PDFs: every page read came from the text layer, or some were OCRed.
+PDF_TEXT_TIER = "pdf-text"
+PDF_OCR_TIER = "pdf-ocr"
+
+
+def ocr_tiers() -> Tuple[OCRTier, ...]:
+    """The ladder from WALLET_OCR_TIERS (a list of OCRTier field dicts), or the default."""
+    tiers = getattr(settings, "WALLET_OCR_TIERS", None)
+    if not tiers:
+        return DEFAULT_OCR_TIERS
+    return tuple(OCRTier(**tier) for tier in tiers)
+
+
+def ocr_engine_version() -> str:
+    """Identifies everything that changes OCR output; part of the OCR cache key."""
+    preprocessing = hashlib.sha256(PreprocessConfig.from_settings().fingerprint().encode("utf-8")).hexdigest()
+    tiers = hashlib.sha256(
+        repr((ocr_tiers(), CARD_TEMPLATES if templates_enabled() else None)).encode("utf-8")
+    ).hexdigest()
+    return f"{get_engine().version}/{extraction_mode()}/pre-{preprocessing[:12]}/tiers-{tiers[:12]}"
+
+
+def _fit(image, max_edge: Optional[int]):
+    if not max_edge or max(image.size) <= max_edge:
+        return image
+    scale = max_edge / max(image.size)
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    return image.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+
+def ocr_tiered(
+    path: str,
+    tiers: Optional[Sequence[OCRTier]] = None,
+    on_stage: Optional[Callable[[str], None]] = None,
+) -> OCROutput:
+    """
+    Preprocess an image file once, then OCR and parse it tier by tier until
+    the parser extracts the required fields. Known ID cards are read region
+    by region with their template first (tier "template"). The output
+    records the tier that succeeded and how many OCR passes ran; when every
+    tier fails, the tier is empty and the output is the longest text read. A
+    tier that would repeat an earlier pass (same pixels and flags, e.g.
+    "fast" on a small scan) is skipped. In "layout" extraction mode Tesseract returns word boxes, and
+    the text is rebuilt from them. Raises OCRError, or OCRBusy when no OCR
+    slot frees up in time.
+    """
+    tiers = ocr_tiers() if tiers is None else tiers
+    on_stage = on_stage or (lambda stage: None)
+    layout = extraction_mode() == "layout"
+    try:
+        image = preprocess(path).image
+        # The governor comes first: it sets the OpenMP thread limit that the
+        # engine's tesseract processes inherit.
+        governor = get_governor()
+        engine = get_engine()
+        seen, passes, best = set(), 0, None
+
+        def ocr_text(tier_image, config):
+            with governor.slot():
+                return engine.image_to_string(tier_image, config=config)
+
+        card = read_card(image, ocr_text) if templates_enabled() else None
+        if card is not None:
+            passes += card.passes
+            if card.parsed.fields:
+                return OCROutput(card.text, None, card.parsed, TEMPLATE_TIER, passes)
+            on_stage("ocr")
+        for tier in tiers:
+            tier_image = _fit(image, tier.max_edge)
+            if (tier_image.size, tier.config) in seen:
+                continue
+            seen.add((tier_image.size, tier.config))
+            if tier is not tiers[0]:
+                on_stage("ocr")
+            # One slot per pass, so a long ladder does not hold up other uploads.
+            with governor.slot():
+                if layout:
+                    word_data = engine.image_to_data(tier_image, config=tier.config)
+                    text = OCRLayout.from_data(word_data).text
+                else:
+                    word_data, text = None, engine.image_to_string(tier_image, config=tier.config)
+            passes += 1
+            on_stage("parsing")
+            output = OCROutput(text, word_data, parse_ocr_output(text, word_data), tier.name, passes)
+            if output.parsed.fields:
+                return output
+            if best is None or len(text.strip()) > len(best.text.strip()):
+                best = output
+    except OCRBusy:
+        raise
+    except Exception as e:
+        raise OCRError(str(e)) from e
+    if best is None:
+        raise OCRError("No OCR tiers are configured.")
+    return best._replace(tier="", passes=passes)
+
+
+def ocr_pdf(path: str, on_stage: Optional[Callable[[str], None]] = None) -> OCROutput:
+    """
+    Read a PDF page by page, from its text layer where it has one and by OCR
+    otherwise, and stop as soon as the text read so far parses to the
+    required fields. The text is parsed at most twice, whatever the page
+    count. `passes` counts OCRed pages. At most WALLET_PDF_MAX_PAGES pages
+    (default 100) are read. Pages are OCRed in text mode whatever the
+    extraction mode. Raises OCRError, or OCRBusy when no OCR slot frees up in
+    time.
+    """
+    on_stage = on_stage or (lambda stage: None)
+    config = PreprocessConfig.from_settings()
+    max_pages = getattr(settings, "WALLET_PDF_MAX_PAGES", 100)
+    texts, passes, parsed = [], 0, ParseResult(None, GENERIC_PROFILE)
+    found, parsed_at = {}, None
+    try:
+        pages = iter_pdf_pages(path, dpi=config.target_dpi, max_edge=config.max_edge, max_pages=max_pages)
+        with closing(pages):
+            for page in pages:
+                if page.text is not None:
+                    texts.append(page.text)
+                else:
+                    if passes:
+                        on_stage("ocr")
+                    image = preprocess(page.image, config).image
+                    with get_governor().slot():
+                        texts.append(get_engine().image_to_string(image))
+                    passes += 1
+                    on_stage("parsing")
+                # Fields may sit on different pages. Each page is scanned on
+                # its own, and the pages read so far are parsed together once
+                # they hold every required field, not after every page.
+                for field, value in extract_fields(texts[-1]).items():
+                    found[field] = found.get(field) or value
+                if parsed_at is None and finalize_fields(found):
+                    parsed, parsed_at = parse_document("\n\n".join(texts)), len(texts)
+                    if parsed.fields:
+                        break
+            if parsed_at != len(texts):
+                # Fields split across a page break only show in the whole text.
+                parsed = parse_document("\n\n".join(texts))
+    except OCRBusy:
+        raise
+    except Exception as e:
+        raise OCRError(str(e)) from e
+    tier = "" if not parsed.fields else PDF_OCR_TIER if passes else PDF_TEXT_TIER
+    return OCROutput("\n\n".join(texts), None, parsed, tier, passes)
+
+
+def ocr_document(
+    path: str, on_stage: Optional[Callable[[str], None]] = None, content_type: str = ""
+) -> OCROutput:
+    """
+    OCR and parse an uploaded file: PDFs page by page, images in tiers.
+    `content_type` is the type sniffed at upload; without it the file's
+    header is read.
+    """
+    try:
+        pdf = content_type == PDF if content_type else is_pdf(path)
+    except OSError as e:
+        raise OCRError(str(e)) from e
+    return ocr_pdf(path, on_stage) if pdf else ocr_tiered(path, on_stage=on_stage)
+
+
+def parse_ocr_output(text: str, word_data: Optional[dict] = None) -> ParseResult:
+    """
+    Parse OCR output into structured fields. The parser also reports which
+    document profile (certificate, ID card, ...) it used.
+    """
+    if word_data is not None:
+        return parse_layout_document(OCRLayout.from_data(word_data))
+    return parse_document(text)
+
+
+def extract(document: Document, on_stage: Callable[[str], None]) -> ParseResult:
+    """
+    OCR and parse the document, persisting text, parse result and OCR tier on
+    it. When the document has a content hash, the OCR cache is consulted
+    first, and a hit skips OCR altogether (`ocr_passes` is then 0).
+    """
+
+    def compute():
+        return ocr_document(document.document_file.path, on_stage=on_stage, content_type=document.content_type)
+
+    if document.content_hash and ocr_cache.cache_enabled():
+        output = ocr_cache.fetch_or_compute(
+            document.content_hash, ocr_engine_version(), compute, reparse=parse_ocr_output
+        )
+    else:
+        output = compute()
+    document.extracted_text = output.text
+    document.set_parse_result(output.parsed)
+    document.ocr_tier = output.tier
+    document.ocr_passes = output.passes
+    document.save()
+    return output.parsed
+
+
+def _confirmation_required(document: Document, parsed: ParseResult, record: CredentialRecord) -> VerificationOutcome:
+    return VerificationOutcome(
+        {
+            "status": "CONFIRMATION_REQUIRED",
+            "suggestion": record.credential_data,
+            "document_id": document.id,
+            "match_id": record.id,
+            "document_profile": parsed.profile,
+        },
+        status.HTTP_200_OK,
+    )
+
+
+def _link(document: Document, record: CredentialRecord, credential_hash: str) -> bool:
+    """
+    Link the document to the record if it still has this hash. One statement,
+    where saving the document would fail on a record deleted meanwhile.
+    """
+    current = CredentialRecord.objects.filter(pk=record.pk, credential_hash=credential_hash)
+    linked = Document.objects.filter(Exists(current), pk=document.pk).update(verified_credential=record)
+    if linked:
+        document.verified_credential = record
+    return bool(linked)
+
+
+def name_search_accepts(fields: dict, candidate: ScoredCandidate) -> bool:
+    """
+    Whether a name search result is suggested. The suggestion discloses the
+    record to whoever uploaded the document, and a holder's name is no proof
+    of holding the credential, so the issue date or the serial must agree too.
+    """
+    if candidate.name_score <= 90 or candidate.score < NAME_SEARCH_MIN_SCORE:
+        return False
+    if candidate.date_score == 100:
+        return True
+    serial = serial_shape(fields.get("credential_id") or fields.get("serial_number"))
+    record_serial = serial_shape(credential_serial(candidate.record.credential_data or {}))
+    return bool(serial and record_serial and fuzz.ratio(serial, record_serial) >= PARTIAL_SERIAL_MIN_SCORE)
+
+
+def match(document: Document, parsed: ParseResult) -> VerificationOutcome:
+    """
+    Match parsed fields to a trusted record: exact hash first, then exact on
+    field subsets, then fuzzy by credential id, then fuzzy by holder name.
+    """
+    parsed_data = parsed.fields
+    if not parsed_data:
+        return VerificationOutcome(
+            {
+                "status": "UNVERIFIED",
+                "detail": "Could not parse required fields.",
+                "document_profile": parsed.profile,
+            },
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+    # Keys the prefilter rules out skip their query (see institutions.bloom).
+    prefilter = get_filter()
+
+    # 1. Attempt a direct verification with a hash match (cached; see
+    # institutions.record_cache).
+    credential_hash = hash_parsed_fields(parsed_data)
+    matched_credential = None
+    if prefilter is None or prefilter.might_have_hash(credential_hash):
+        matched_credential = record_by_hash(credential_hash)
+    if matched_credential is not None and not _link(document, matched_credential, credential_hash):
+        # Deleted or edited in another process since it was cached.
+        invalidate(credential_hash)
+        matched_credential = None
+    if matched_credential is not None:
+        return VerificationOutcome(
+            {
+                "status": "VERIFIED",
+                "data": matched_credential.credential_data,
+                "document_profile": parsed.profile,
+            },
+            status.HTTP_200_OK,
+        )
+
+    # 2. Exact matches on normalized field subsets, strongest first, each one
+    # indexed equality query. A digest shared by several records (namesakes
+    # issued on the same day) decides nothing.
+    digests = subset_digests(parsed_data)
+    for column in SUBSET_DIGESTS:
+        if digests[column]:
+            matches = list(CredentialRecord.objects.filter(**{column: digests[column]})[:2])
+            if len(matches) == 1:
+                return _confirmation_required(document, parsed, matches[0])
+
+    # 3. Fuzzy matching fallback if direct hash match fails: records with the
+    # same serial, found through the lookup index, compared by holder name.
+    serial = normalize_serial(parsed_data.get("credential_id") or parsed_data.get("serial_number"))
+    if serial and (prefilter is None or prefilter.might_have_serial(serial)):
+        ocr_name = parsed_data.get("full_name", "")
+        candidates = CredentialLookup.objects.filter(serial=serial).select_related("record")[:MAX_SERIAL_CANDIDATES]
+        scored = [
+            (fuzz.ratio(lookup.record.credential_data.get("full_name", "").lower(), ocr_name.lower()), lookup.record)
+            for lookup in candidates
+        ]
+        if scored:
+            similarity_score, potential_match = max(scored, key=lambda pair: pair[0])
+            if similarity_score > 90:
+                return _confirmation_required(document, parsed, potential_match)
+
+    # 4. Search by holder name, for serials the OCR mangled past the index,
+    # corroborated by the issue date or what is left of the serial.
+    best = next(iter(search_by_name(parsed_data)), None)
+    if best and name_search_accepts(parsed_data, best):
+        return _confirmation_required(document, parsed, best.record)
+
+    # 5. If all attempts fail, return unverified.
+    return VerificationOutcome(
+        {
+            "status": "UNVERIFIED",
+            "detail": "No matching credential record found.",
+            "document_profile": parsed.profile,
+        },
+        status.HTTP_404_NOT_FOUND,
+    )
+
+
+def verify_document(document: Document, on_stage: Optional[Callable[[str], None]] = None) -> VerificationOutcome:
+    """
+    Run the whole pipeline for an uploaded document. `on_stage` is called with
+    "ocr", "parsing" and "matching" as each stage starts; "ocr" and "parsing"
+    repeat for each OCR tier tried, and "parsing" is skipped on an OCR cache
+    hit.
+    """
+    on_stage = on_stage or (lambda stage: None)
+    on_stage("ocr")
+    parsed = extract(document, on_stage)
+    on_stage("matching")
+    return match(document, parsed)
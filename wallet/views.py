@@ -1,32 +1,42 @@
-import hashlib
-import json
-import pytesseract
-from PIL import Image
-
+from django.conf import settings
+from django.urls import reverse
 from rest_framework import permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from thefuzz import fuzz
 
+from institutions.bloom import get_filter as get_credential_filter
 from institutions.models import CredentialRecord
-from .models import Document
-from .parser import parse_credential_from_text
-from .serializers import DocumentSerializer
+from institutions.record_cache import get_cache as get_credential_cache
+from .jobs import enqueue_verification
+from .ocr_cache import cache_stats
+from .ocr_engines import get_engine
+from .ocr_governor import OCRBusy, get_governor
+from .models import Document, VerificationJob
+from .serializers import DocumentSerializer, VerificationJobSerializer
+from .uploads import file_sha256, screen_uploads, upload_rejection_response
+from .verification import OCRError, verify_document
 
 
 class UserDocumentVerifyView(APIView):
     """
     Handles user document uploads for verification against trusted records.
+
+    By default the upload is only stored and queued: the response is
+    202 Accepted with a job id, and a `run_verification_worker` process does
+    the OCR, parsing and matching. Poll the job's status URL for the result.
+    Set WALLET_ASYNC_VERIFICATION = False to run the pipeline in the request.
     """
 
     permission_classes = [permissions.AllowAny]  # Temporarily allow any user for testing
 
-    def _generate_hash_from_data(self, data):
-        """Generates a SHA-256 hash from a dictionary."""
-        canonical_string = json.dumps(data, sort_keys=True)
-        return hashlib.sha256(canonical_string.encode("utf-8")).hexdigest()
-
     def post(self, request, *args, **kwargs):
+        # Hash and screen the upload as it streams in: unsupported, oversized
+        # and decompression-bomb files are refused before they are stored.
+        screen_uploads(request)
+        rejected = upload_rejection_response(request)
+        if rejected is not None:
+            return rejected
+
         # 1. Handle the file upload and create a Document instance.
         serializer = DocumentSerializer(data=request.data)
         if not serializer.is_valid():
@@ -38,73 +48,94 @@ class UserDocumentVerifyView(APIView):
             from core.models import User
             user = User.objects.first()  # Use first user for testing
         
-        document = serializer.save(user=user)
+        # The digest keys the OCR cache; the sniffed type routes PDFs.
+        upload = getattr(request, "upload_info", {}).get("document_file")
+        document = serializer.save(
+            user=user,
+            content_hash=upload.sha256 if upload else "",
+            content_type=upload.content_type if upload else "",
+        )
+        if not document.content_hash:
+            document.content_hash = file_sha256(document.document_file)
+            document.save(update_fields=["content_hash"])
+
+        # 2. Queue the OCR, parsing and matching for a worker.
+        if getattr(settings, "WALLET_ASYNC_VERIFICATION", True):
+            job = enqueue_verification(document)
+            status_url = reverse("document-verify-job", kwargs={"job_id": job.id})
+            return Response(
+                {
+                    "job_id": str(job.id),
+                    "status": job.status,
+                    "document_id": document.id,
+                    "status_url": request.build_absolute_uri(status_url),
+                },
+                status=status.HTTP_202_ACCEPTED,
+                headers={"Location": status_url},
+            )
 
-        # 2. Perform OCR on the uploaded document.
+        # 3. Or run them in the request.
         try:
-            extracted_text = pytesseract.image_to_string(
-                Image.open(document.document_file.path)
+            outcome = verify_document(document)
+        except OCRBusy as e:
+            # OCR capacity is exhausted: refuse now rather than queue behind
+            # the backlog. The client can retry the same upload.
+            document.delete()
+            return Response(
+                {"error": str(e), "retry_after": round(e.retry_after)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(round(e.retry_after))},
             )
-            document.extracted_text = extracted_text
-            document.save()
-        except Exception as e:
+        except OCRError as e:
             document.delete()  # Clean up the failed document
             return Response(
                 {"error": f"OCR processing failed: {e}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
+        return Response(outcome.body, status=outcome.http_status)
 
-        # 3. Parse the extracted text to get structured data.
-        parsed_data = parse_credential_from_text(document.extracted_text)
-        if not parsed_data:
-            return Response(
-                {"status": "UNVERIFIED", "detail": "Could not parse required fields."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
 
-        # 4. Attempt a direct verification with a hash match.
-        ocr_hash = self._generate_hash_from_data(parsed_data)
+class VerificationJobStatusView(APIView):
+    """
+    Reports the state of a queued verification and, once it is DONE, the
+    response body the synchronous endpoint would have returned.
+    """
+
+    # Matches the verify endpoint; job ids are random UUIDs.
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, job_id, *args, **kwargs):
         try:
-            matched_credential = CredentialRecord.objects.get(credential_hash=ocr_hash)
-            document.verified_credential = matched_credential
-            document.save()
+            job = VerificationJob.objects.get(id=job_id)
+        except VerificationJob.DoesNotExist:
             return Response(
-                {"status": "VERIFIED", "data": matched_credential.credential_data},
-                status=status.HTTP_200_OK,
+                {"error": "Verification job not found."},
+                status=status.HTTP_404_NOT_FOUND,
             )
-        except CredentialRecord.DoesNotExist:
-            pass  # If no direct match, proceed to fuzzy matching.
-
-        # 5. Fuzzy matching fallback if direct hash match fails.
-        credential_id = parsed_data.get("credential_id")
-        if credential_id:
-            try:
-                # Note: This is a simplified lookup. A real-world scenario might need a more robust search.
-                potential_match = CredentialRecord.objects.get(
-                    credential_data__credential_id=credential_id
-                )
-
-                trusted_name = potential_match.credential_data.get("full_name", "")
-                ocr_name = parsed_data.get("full_name", "")
-                similarity_score = fuzz.ratio(trusted_name.lower(), ocr_name.lower())
-
-                if similarity_score > 90:
-                    return Response(
-                        {
-                            "status": "CONFIRMATION_REQUIRED",
-                            "suggestion": potential_match.credential_data,
-                            "document_id": document.id,
-                            "match_id": potential_match.id,
-                        },
-                        status=status.HTTP_200_OK,
-                    )
-            except CredentialRecord.DoesNotExist:
-                pass  # No potential match found by ID.
-
-        # 6. If all attempts fail, return unverified.
+        return Response(VerificationJobSerializer(job).data, status=status.HTTP_200_OK)
+
+
+class OCRStatusView(APIView):
+    """
+    OCR load in the process serving the request: the governor's slots, queue
+    depth and wait times, the engine in use, the OCR cache and credential
+    lookup cache counters, and the credential prefilter's size and rates.
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        credential_cache = get_credential_cache()
+        credential_filter = get_credential_filter()
         return Response(
-            {"status": "UNVERIFIED", "detail": "No matching credential record found."},
-            status=status.HTTP_404_NOT_FOUND,
+            {
+                "engine": get_engine().version,
+                "governor": get_governor().snapshot(),
+                "cache": cache_stats(),
+                "credential_cache": credential_cache.snapshot() if credential_cache else None,
+                "credential_filter": credential_filter.snapshot() if credential_filter else None,
+            },
+            status=status.HTTP_200_OK,
         )
 
 
@@ -132,6 +163,7 @@ class UserDocumentConfirmView(APIView):
 
             # Link the document to the confirmed credential.
             document.verified_credential = credential
+            document.suggested_credential = None
             document.save()
 
             return Response(